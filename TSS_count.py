@@ -2,14 +2,29 @@
 
 #
 """
-塩基配列を端から８塩基ごとに区切り、各塩基の組み合わせの出現回数を数える
+塩基配列を端から８塩基（bpで指定、4～12）ごとに区切り、各塩基の組み合わせの出現回数を数える
 入力する塩基配列は-1000から始まるものでなければならない
 塩基配列はファイルの各行の末尾になければならない
+
+--shardを指定すると、出現回数をファイルごとのシャード（counts_[ファイル名].npyと.json）に保存する
+シャードは出現回数の配列か、0でない出現回数だけの（探索領域, インデックス, 出現回数）の組の小さい方で保存する
+（出現回数はuint32、足りなければuint64）
+--mergeでシャードを足し合わせ、calc_igi_pri.pyで使う出現回数のファイルを出力する
+ゲノムを追加するときは、そのゲノムのシャードだけを作って足し合わせ直せばよい
+    python3 TSS_count.py --shard --workers=8 genomeA_promoters.txt genomeB_promoters.txt
+    python3 TSS_count.py --merge --name=family counts_genomeA_promoters.npy counts_genomeB_promoters.npy
+
+--genomeと--annotationを指定すると、ゲノムのFASTAファイルとTSSを記したGFF、GTF、BEDファイルから
+プロモーター配列（-1000から+199）を切り出して数える（promoter_extract.py）
+    python3 TSS_count.py --genome=genome.fa --annotation=genes.gff3 --name=genomeA
+
+--outで出力ファイルを保存するディレクトリを指定できる（指定しなければsave_dir）
 """
 
 #----------------------------設定ここから----------------------------
 region_list=[ [-200, -60], [-750, -450] ]
 #探索領域のリスト（TSSより上流に限る）
+#コマンドラインで --region=-200:-60 のように指定することもできる
 #----------------------------設定ここまで----------------------------
 
 
@@ -17,16 +32,34 @@ import os
 save_dir = os.path.dirname(__file__) + os.sep
 #出力したファイルを保存するディレクトリ
 
-combination_file = os.path.dirname(__file__) + os.sep + r"8bp_all.txt"
-#区切る塩基の全ての組み合わせを書いたファイル
-
 bp=8
-#区切る塩基数の指定
+#区切る塩基数の指定（4～12）
+#コマンドラインで --bp=10 のように指定することもできる
+#塩基の全ての組み合わせ（8bp_all.txtと同じ順）はkmer_code.pyで生成する
+
+write_block=1<<20
+#一度に書き込む塩基の組み合わせの数
+
+batch_size=10000
+#一度に数えるプロモーターの数（メモリ使用量はこの値と4^bpに比例する）
+
+workers=1
+#並列に数えるプロセス数
+#コマンドラインで --workers=8 のように指定することもできる
+
+chunk_bytes=1<<26
+#並列に数えるとき、1プロセスが数えるプロモーターファイルの大きさ（バイト）
 
 
 from os.path import basename
-from sys import argv
 import re
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from kmer_code import seq_encode, kmer_forward, kmer_enumerate, bp_check
+import promoter_extract
+from promoter_extract import tss_read, promoter_windows
 
 def chrom_ext(promoter_file):
     """
@@ -43,100 +76,437 @@ def chrom_ext(promoter_file):
     else:
         return ""
 
-def tss_count(promoter_file,combination_file,bp,start,end, save_directory):
+def batch_count(seqlist, bp, counts):
     """
-    塩基の組み合わせがプロモーターの特定の領域に何回ずつ出現するかをファイルに出力する
-    :param promoter_file: プロモーター配列のファイル
-    :param combination_file: bp個の塩基の組み合わせを記したファイル
+    探索領域の配列をまとめて区切り、塩基の組み合わせの出現回数をcountsに加える
+    :param seqlist: 探索領域の配列のリスト
     :param bp: 塩基数
-    :param start: 探索領域の始点（上流側）
-    :param end: 探索領域の終点（下流側）
-    :param save_directory: 出力ファイルの保存場所
+    :param counts: k-merのインデックスごとの出現回数（numpy.ndarray, 大きさ4^bp+1）
     """
 
-    fn_promoter=promoter_file
-    fn_8bp=combination_file
+    codes = seq_encode("N".join(seqlist))
+    #プロモーター同士の境界をNで区切り、境界をまたぐ区切りは数えない
+    #N等を含む区切りはインデックス4^bpになる
+    fwd = kmer_forward(codes, bp)
+    #逆鎖のインデックスは使わないので計算しない
+    counts += np.bincount(fwd, minlength=4**bp+1)
 
-    chrom=chrom_ext(fn_promoter)
-    fn_save = save_directory + r"for_" + chrom+"_"+str(start)+'_'+str(end)+r'.txt'
-    #raw文字列でファイルを指定
+def region_parse(text):
+    """
+    コマンドラインで指定した探索領域を変換する
+    :param text: 探索領域（例:"-200:-60"）
+    :return: [始点, 終点]
+    """
 
-    save=open(fn_save,'w')
+    m = re.fullmatch(r"(-?\d+):(-?\d+)", text.strip())
+    if m is None or int(m.group(1)) > int(m.group(2)):
+        raise argparse.ArgumentTypeError("探索領域は始点:終点（例:-200:-60）の形式で指定してください: " + text)
+    return [int(m.group(1)), int(m.group(2))]
 
-    print(__file__, file=save)
-    print(fn_promoter, file=save)
-    print(fn_8bp, file=save)
-    save.write(str(start)+':'+str(end)+'\n')
-    #使用したファイル名を書き込む
+def promoter_seq(line):
+    """
+    プロモーターファイルの行から配列を取り出す
+    :param line: プロモーターファイルの行（bytes）
+    :return: 行の末尾の配列部分（空行ならNone）
+    """
 
+    words = line.split()
+    if len(words) == 0:
+        return None
+    return words[-1].decode("utf-8", "replace")
 
-    f8=open(fn_8bp,'r')
+def region_lengths(promoter_file, region_list):
+    """
+    先頭から８塩基ずつ区切る範囲（最初のプロモーターの探索領域の長さ）を返す
+    :param promoter_file: プロモーター配列のファイル
+    :param region_list: 探索領域のリスト [[始点（上流側）, 終点（下流側）], ...]
+    :return: 探索領域ごとの長さのリスト
+    """
 
-    baseslist = []
-    for line in f8:
-        bases = line.replace("\n", "")
-        baseslist.append(bases)
+    with open(promoter_file, 'rb') as fp:
+        for line in fp:
+            prom = promoter_seq(line)
+            if prom is not None:
+                return [len(prom[1000+start:(1000+start)+(-1*start+end)+1]) for start, end in region_list]
+    return [0]*len(region_list)
 
+def seq_count(proms, bp, region_list, lengths=None):
+    """
+    プロモーター配列について、全ての探索領域の塩基の組み合わせの出現回数を数える
+    :param proms: -1000から始まるプロモーター配列のイテラブル
+    :param bp: 塩基数
+    :param region_list: 探索領域のリスト [[始点（上流側）, 終点（下流側）], ...]
+    :param lengths: 探索領域ごとの先頭から区切る範囲の長さ（region_lengthsの戻り値、Noneなら最初のプロモーターで決める）
+    :return: 出現回数（numpy.ndarray, 大きさ 探索領域の数×(4^bp+1)）、プロモーターの数
+    """
 
-    promlist=[]
-    #空のリストを作成
+    counts = np.zeros((len(region_list), 4**bp+1), dtype=np.int64)
+    #探索領域ごと、k-merのインデックス（kmer_code.py）ごとの出現回数
+    #最後の要素はN等を含む区切りの数（出力しない）
+    #区切った配列のリストを作らず、プロモーターbatch_size個ずつ数える
+
+    n=0
+    seqlists=[[] for item in region_list]
+    for prom in proms:
+        n += 1
+        seqs = [prom[1000+start:(1000+start)+(-1*start+end)+1] for start, end in region_list]
+        #探索領域を抽出
+        if lengths is None:
+            lengths = [len(seq) for seq in seqs]
+            #先頭から８塩基ずつ区切る範囲は最初のプロモーターの探索領域の長さで決める
+        for r, seq in enumerate(seqs):
+            seqlists[r].append(seq[:lengths[r]])
+        if len(seqlists[0]) >= batch_size:
+            for r in range(len(region_list)):
+                batch_count(seqlists[r], bp, counts[r])
+            seqlists=[[] for item in region_list]
+    for r in range(len(region_list)):
+        if len(seqlists[r]) > 0:
+            batch_count(seqlists[r], bp, counts[r])
+    del seqlists
+
+    counts[:, 4**bp] = 0
+    return counts, n
+
+def range_seqs(promoter_file, first=0, last=None):
+    """
+    プロモーターファイルの一部（行の先頭がfirstバイト目からlastバイト目の前まで）のプロモーター配列を返す
+    :param promoter_file: プロモーター配列のファイル
+    :param first: 範囲の始点（バイト）
+    :param last: 範囲の終点（バイト、Noneならファイルの末尾）
+    :return: プロモーター配列のジェネレーター
+    """
 
-    fp=open(fn_promoter,'r')
+    with open(promoter_file,'rb') as fp:
+        if first > 0:
+            fp.seek(first-1)
+            fp.readline()
+            #firstバイト目より前から始まる行は前の範囲で数える
+
+        while last is None or fp.tell() < last:
+            line = fp.readline()
+            if line == b"":
+                break
+            prom = promoter_seq(line)
+            if prom is not None:
+                yield prom
+            #行の末尾の配列部分
+
+def range_count(promoter_file, bp, region_list, lengths, first=0, last=None):
+    """
+    プロモーターファイルの一部（行の先頭がfirstバイト目からlastバイト目の前まで）について、
+    全ての探索領域の塩基の組み合わせの出現回数を数える
+    :param promoter_file: プロモーター配列のファイル
+    :param bp: 塩基数
+    :param region_list: 探索領域のリスト [[始点（上流側）, 終点（下流側）], ...]
+    :param lengths: 探索領域ごとの先頭から区切る範囲の長さ（region_lengthsの戻り値）
+    :param first: 数える範囲の始点（バイト）
+    :param last: 数える範囲の終点（バイト、Noneならファイルの末尾）
+    :return: 出現回数（numpy.ndarray, 大きさ 探索領域の数×(4^bp+1)）、プロモーターの数
+    """
 
-    for line in fp:
-        line = line.replace('\n','')
-        line = filter(lambda w: len(w) > 0, re.split(r'\s', line))
-        prom = list(line)[-1]
-        promlist.append(prom)
-    #プロモーターファイルから1行ずつ読み込み
-    #改行文字の削除
-    #行の末尾の配列部分を抽出
-    #promolistの末尾に追加
+    return seq_count(range_seqs(promoter_file, first, last), bp, region_list, lengths)
 
-    fp.close()
+def file_count(promoter_file, bp, region_list, pool=None):
+    """
+    プロモーターファイル全体について、全ての探索領域の塩基の組み合わせの出現回数を数える
+    poolを指定すると、ファイルをchunk_bytesバイトずつに分けて並列に数える
+    :param promoter_file: プロモーター配列のファイル
+    :param bp: 塩基数
+    :param region_list: 探索領域のリスト [[始点（上流側）, 終点（下流側）], ...]
+    :param pool: concurrent.futures.ProcessPoolExecutor（Noneなら1プロセスで数える）
+    :return: 出現回数（numpy.ndarray, 大きさ 探索領域の数×(4^bp+1)）、プロモーターの数
+    """
 
+    lengths = region_lengths(promoter_file, region_list)
+    #ファイルを分けても、区切る範囲はファイルの最初のプロモーターで決める
+    if pool is None:
+        return range_count(promoter_file, bp, region_list, lengths)
+
+    size = os.path.getsize(promoter_file)
+    futures = [pool.submit(range_count, promoter_file, bp, region_list, lengths, first, first + chunk_bytes)
+               for first in range(0, max(size, 1), chunk_bytes)]
+    counts, n = futures[0].result()
+    for future in futures[1:]:
+        part, m = future.result()
+        counts += part
+        n += m
+    return counts, n
+
+def genome_count(sequence_file, annotation_file, bp, region_list, feature_type, down):
+    """
+    ゲノムのFASTAファイルと遺伝子のアノテーション（GFF、GTF、BED）からプロモーター配列を切り出し、
+    プロモーターファイルを作らずに出現回数を数える（promoter_extract.py）
+    :param sequence_file: ゲノムのFASTAファイル
+    :param annotation_file: GFF、GTF、BEDファイル
+    :param bp: 塩基数
+    :param region_list: 探索領域のリスト [[始点（上流側）, 終点（下流側）], ...]
+    :param feature_type: 遺伝子として使うGFF、GTFの3列目
+    :param down: 切り出す範囲のTSSより下流の塩基数
+    :return: 出現回数（numpy.ndarray, 大きさ 探索領域の数×(4^bp+1)）、プロモーターの数
+    """
 
-    seqlist=[prom[1000+start:(1000+start)+(-1*start+end)+1] for prom in promlist]
-    #プロモーターの配列から探索領域を抽出し、seqlistに追加
+    windows = promoter_windows(sequence_file, tss_read(annotation_file, feature_type), down)
+    return seq_count((seq for item, seq in windows), bp, region_list)
 
-    partlist=[seq[i:i+bp] for seq in seqlist for i in range(len(seqlist[0])-bp+1)]
-    #seqlistの要素について、先頭から８塩基ずつ抜き出してリスト化
+def count_write(counts, bp, region_list, name, save_directory, *arg):
+    """
+    塩基の組み合わせの出現回数を探索領域ごとのファイル（for_[name]_[始点]_[終点].txt）に出力する
+    :param counts: 出現回数（numpy.ndarray, 大きさ 探索領域の数×4^bp以上）
+    :param bp: 塩基数
+    :param region_list: 探索領域のリスト [[始点（上流側）, 終点（下流側）], ...]
+    :param name: 出力ファイル名に入れる名前（染色体番号など）
+    :param save_directory: 出力ファイルの保存場所
+    :param *arg: 出力ファイルに書き込む使用したファイル名
+    """
 
-    del promlist
-    del seqlist
+    for r, (start, end) in enumerate(region_list):
+        fn_save = save_directory + r"for_" + name+"_"+str(start)+'_'+str(end)+r'.txt'
+        #raw文字列でファイルを指定
 
+        save=open(fn_save,'w')
 
-    num={}
-    #空のディクショナリを作成
+        print(__file__, file=save)
+        for item in arg:
+            print(item, file=save)
+        print("{}bp_all".format(bp), file=save)
+        save.write(str(start)+':'+str(end)+'\n')
+        #使用したファイル名を書き込む
 
-    for part in partlist:
-        num[part]=num.get(part,0)+1
-    #キーに配列、要素に配列の数を追加
-    #キーが存在しなければ新たに追加され、要素は0+１となる
-    #既にキーが存在すれば、既存の要素に１足した値が要素に代入される
+        for first in range(0, 4**bp, write_block):
+            last = min(first + write_block, 4**bp)
+            baseslist = kmer_enumerate(bp, first, last)
+            save.writelines(bases + '\t' + str(n) +'\n' for bases, n in zip(baseslist, counts[r][first:last].tolist()))
+        #塩基の組み合わせの順（インデックスの順）で数を出力
 
-    for bases in baseslist:
-        save.write(bases + '\t' + str(num.get(bases,0)) +'\n')
-    #塩基の組み合わせリストの順で数を出力
-    #ディクショナリは並び順が一定でないため
+        save.close()
 
-    save.close()
+def tss_count(promoter_file,bp,region_list, save_directory, pool=None):
+    """
+    塩基の組み合わせがプロモーターの特定の領域に何回ずつ出現するかをファイルに出力する
+    プロモーターファイルは一度だけ読み込み、全ての探索領域を同時に数える
+    :param promoter_file: プロモーター配列のファイル
+    :param bp: 塩基数
+    :param region_list: 探索領域のリスト [[始点（上流側）, 終点（下流側）], ...]
+    :param save_directory: 出力ファイルの保存場所
+    :param pool: concurrent.futures.ProcessPoolExecutor（Noneなら1プロセスで数える）
+    """
+
+    counts, n = file_count(promoter_file, bp, region_list, pool)
+    count_write(counts, bp, region_list, chrom_ext(promoter_file), save_directory, promoter_file)
+
+def shard_name(promoter_file, save_directory):
+    """
+    出現回数のシャードのファイル名を返す
+    :param promoter_file: プロモーター配列のファイル（またはゲノムのFASTAファイル）
+    :param save_directory: 出力ファイルの保存場所
+    :return: シャード（.npy）、その情報を記したファイル（.json）
+    """
 
-argvs=argv
-#コマンドライン引数から処理するファイルを取得
+    base = save_directory + "counts_" + os.path.splitext(basename(promoter_file))[0]
+    return base + ".npy", base + ".json"
 
-if len(argvs)<2:
-    print(' -1000から始まるプロモーター配列ファイルをコマンドライン引数で指定してください')
-    quit()
+def shard_check(source_file, save_directory):
+    """
+    別のファイルのシャードを上書きしないか確かめる
+    シャード名はファイル名だけから作るので、別のディレクトリにある同じ名前のファイルは同じシャード名になる
+    :param source_file: 数えるファイル（プロモーター配列のファイルまたはゲノムのFASTAファイル）
+    :param save_directory: 出力ファイルの保存場所
+    """
+
+    save_shard, save_info = shard_name(source_file, save_directory)
+    if os.path.exists(save_info):
+        with open(save_info, "rt") as si:
+            source = json.load(si).get("source")
+        if source != os.path.abspath(source_file):
+            raise ValueError("{}: {}のシャード（{}）を上書きしてしまいます（ファイル名を変えるか--outで別のディレクトリを指定してください）".format(
+                source_file, source, basename(save_shard)))
+    #同じファイルを数え直すときは上書きする
+
+def shard_write(counts, n, source_file, bp, region_list, save_directory):
+    """
+    塩基の組み合わせの出現回数をシャード（バイナリ）として保存する
+    シャードはshard_mergeで足し合わせてcalc_igi_pri.pyで使うファイルにする
+    :param counts: 出現回数（file_count、genome_countの戻り値）
+    :param n: プロモーターの数
+    :param source_file: 数えたファイル（プロモーター配列のファイルまたはゲノムのFASTAファイル）
+    :param bp: 塩基数
+    :param region_list: 探索領域のリスト [[始点（上流側）, 終点（下流側）], ...]
+    :param save_directory: 出力ファイルの保存場所
+    :return: シャードのファイル名
+    """
+
+    shard_check(source_file, save_directory)
+    save_shard, save_info = shard_name(source_file, save_directory)
+    counts = counts[:, :4**bp]
+    count_type = "<u4" if counts.max() <= np.iinfo(np.uint32).max else "<u8"
+    #出現回数がuint32に収まらなければuint64にする
+    sparse_type = np.dtype([("region", "<u2"), ("index", "<u4"), ("count", count_type)])
+    nonzero = np.count_nonzero(counts)
+    if nonzero * sparse_type.itemsize < counts.size * np.dtype(count_type).itemsize:
+        region, index = np.nonzero(counts)
+        shard = np.zeros(nonzero, dtype=sparse_type)
+        shard["region"], shard["index"], shard["count"] = region, index, counts[region, index]
+        #0でない出現回数だけを探索領域、インデックスの順に保存する（k=12では密な配列よりずっと小さい）
+    else:
+        shard = counts.astype(count_type)
+    np.save(save_shard, shard)
+    info = {"bp": bp, "regions": [list(item) for item in region_list], "promoters": n,
+            "source": os.path.abspath(source_file), "chrom": chrom_ext(source_file)}
+    with open(save_info, "wt") as save:
+        json.dump(info, save, indent=1)
+    return save_shard
+
+def shard_add(counts, shard, shard_file):
+    """
+    シャードの出現回数を足し合わせる（int64に広げ、桁あふれしないか確かめる）
+    :param counts: 足し合わせた出現回数（numpy.ndarray, int64, 大きさ 探索領域の数×4^bp）
+    :param shard: シャード（shard_writeで保存したもの、以前の形式の密なint64の配列も使える）
+    :param shard_file: シャードのファイル名（エラーの表示に使う）
+    """
+
+    limit = np.iinfo(np.int64).max
+    if shard.dtype.names is None:
+        for r in range(counts.shape[0]):
+            count = np.asarray(shard[r])
+            if count.max() > limit or (counts[r] > limit - count.astype(np.int64)).any():
+                raise OverflowError("{}: 出現回数がint64に収まらない".format(shard_file))
+            counts[r] += count.astype(np.int64)
+        return
+        #出現回数の配列のシャード
+
+    bounds = np.searchsorted(shard["region"], np.arange(counts.shape[0] + 1))
+    #探索領域ごとの範囲（探索領域の順に並んでいる）
+    for r in range(counts.shape[0]):
+        part = shard[bounds[r]:bounds[r+1]]
+        if part.size == 0:
+            continue
+        index, count = part["index"].astype(np.int64), part["count"]
+        if count.max() > limit or (counts[r, index] > limit - count.astype(np.int64)).any():
+            raise OverflowError("{}: 出現回数がint64に収まらない".format(shard_file))
+        counts[r, index] += count.astype(np.int64)
+
+def shard_merge(shard_files, save_directory, name=None):
+    """
+    シャードを足し合わせ、探索領域ごとの出現回数のファイルを出力する
+    :param shard_files: シャード（.npy）のリスト
+    :param save_directory: 出力ファイルの保存場所
+    :param name: 出力ファイル名に入れる名前（Noneなら全てのシャードに共通の染色体番号）
+    :return: 探索領域のリスト、プロモーターの数
+    """
 
-print("="*50)
-print("split:", bp)
-for pfile in argvs[1:]:
-    print("-"*50)
-    print(basename(pfile))
-    for item in region_list:
-        start=item[0]
-        end=item[1]
-        tss_count(pfile,combination_file,bp,start,end, save_dir)
-        print(start,":",end,"completed")
-print("="*50)
+    counts = None
+    for shard_file in shard_files:
+        with open(os.path.splitext(shard_file)[0] + ".json", "rt") as sf:
+            info = json.load(sf)
+        if counts is None:
+            bp, region_list, n, chroms = info["bp"], info["regions"], 0, set()
+            counts = np.zeros((len(region_list), 4**bp), dtype=np.int64)
+        elif info["bp"] != bp or info["regions"] != region_list:
+            raise ValueError("{}: 塩基数と探索領域が最初のシャードと異なる".format(shard_file))
+        shard_add(counts, np.load(shard_file, mmap_mode="r"), shard_file)
+        n += info["promoters"]
+        chroms.add(info["chrom"])
+
+    if name is None:
+        name = chroms.pop() if len(chroms) == 1 else ""
+    count_write(counts, bp, region_list, name, save_directory, *shard_files)
+    return region_list, n
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="プロモーターの探索領域に塩基の組み合わせが何回ずつ出現するかを数える")
+    parser.add_argument("files", nargs="*", help="-1000から始まるプロモーター配列ファイル（--mergeではシャード）")
+    parser.add_argument("--region", action="append", type=region_parse, default=None,
+                        help="探索領域（例:--region=-200:-60）。複数指定できる。指定しなければregion_listを使う")
+    parser.add_argument("--bp", type=int, default=bp, help="区切る塩基数（4～12）")
+    parser.add_argument("--workers", type=int, default=workers, help="並列に数えるプロセス数")
+    parser.add_argument("--shard", action="store_true", help="出現回数をファイルごとのシャード（counts_[ファイル名].npy）に保存する")
+    parser.add_argument("--merge", action="store_true", help="シャードを足し合わせて出現回数のファイルを出力する")
+    parser.add_argument("--name", default=None, help="--merge、--genomeの出力ファイル名に入れる名前（for_[name]_-200_-60.txt）")
+    parser.add_argument("--genome", help="ゲノムのFASTAファイル（--annotationとともに指定し、プロモーター配列のファイルの代わりに使う）")
+    parser.add_argument("--annotation", help="TSSを記したGFF、GTF、BEDファイル")
+    parser.add_argument("--feature", default=promoter_extract.feature, help="遺伝子として使うGFF、GTFの3列目")
+    parser.add_argument("--downstream", type=int, default=promoter_extract.downstream, help="切り出す範囲のTSSより下流の塩基数")
+    parser.add_argument("--out", default=save_dir, help="出力ファイルを保存するディレクトリ")
+    args = parser.parse_args()
+    save_dir = os.path.join(args.out, "")
+    os.makedirs(save_dir, exist_ok=True)
+    bp = args.bp
+    try:
+        bp_check(bp)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.region is not None:
+        region_list = args.region
+
+    if args.genome is not None or args.annotation is not None:
+        if args.genome is None or args.annotation is None:
+            parser.error("--genomeと--annotationをともに指定してください")
+        print("="*50)
+        print("split:", bp)
+        print(basename(args.genome))
+        print(basename(args.annotation))
+        if args.shard:
+            try:
+                shard_check(args.genome, save_dir)
+            except ValueError as e:
+                parser.error(str(e))
+        counts, n = genome_count(args.genome, args.annotation, bp, region_list, args.feature, args.downstream)
+        if args.shard:
+            print(basename(shard_write(counts, n, args.genome, bp, region_list, save_dir)))
+        else:
+            name = args.name if args.name is not None else chrom_ext(args.genome)
+            count_write(counts, bp, region_list, name, save_dir, args.genome, args.annotation)
+        print(n, "promoters")
+        for start, end in region_list:
+            print(start,":",end,"completed")
+        print("="*50)
+        quit()
+
+    if len(args.files)<1:
+        print(' -1000から始まるプロモーター配列ファイルをコマンドライン引数で指定してください')
+        quit()
+
+    if args.merge:
+        print("="*50)
+        region_list, n = shard_merge(args.files, save_dir, args.name)
+        print(len(args.files), "shards,", n, "promoters")
+        for start, end in region_list:
+            print(start,":",end,"completed")
+        print("="*50)
+        quit()
+
+    if args.shard:
+        shards = {}
+        for pfile in args.files:
+            shard = shard_name(pfile, save_dir)[0]
+            if shard in shards and os.path.abspath(shards[shard]) != os.path.abspath(pfile):
+                parser.error("{}と{}のシャード名（{}）が同じです".format(shards[shard], pfile, basename(shard)))
+            shards[shard] = pfile
+            try:
+                shard_check(pfile, save_dir)
+            except ValueError as e:
+                parser.error(str(e))
+        #数え始める前に、同じ名前の別のファイルのシャードを上書きしないか確かめる
+
+    pool = None
+    if args.workers > 1:
+        pool = ProcessPoolExecutor(args.workers)
+
+    print("="*50)
+    print("split:", bp)
+    for pfile in args.files:
+        print("-"*50)
+        print(basename(pfile))
+        if args.shard:
+            counts, n = file_count(pfile, bp, region_list, pool)
+            print(basename(shard_write(counts, n, pfile, bp, region_list, save_dir)))
+        else:
+            tss_count(pfile,bp,region_list, save_dir, pool)
+        for start, end in region_list:
+            print(start,":",end,"completed")
+    print("="*50)
+
+    if pool is not None:
+        pool.shutdown()
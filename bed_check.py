@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Check of the --bed mode of tss_predict.py against the whole chromosomes.
+
+tss_predict.py is run on the whole chromosomes and with the BED file (into two temporary directories),
+and the files of each interval are compared with the files of its chromosome:
+・PRI peaks: the peaks of the whole chromosome in the interval (start < position <= end) must be the same.
+・5'UTR edges: the edges written for the interval must be edges of the whole chromosome overlapping the interval,
+  and all edges of the whole chromosome overlapping the interval must be written if both of their ends are
+  in the reach of the flanks (the flanks of tss_predict.py minus (N - 1) bases). Longer edges are counted separately.
+
+At the command prompt, enter the following.
+    python3 bed_check.py [FASTA file] [IGI file 1] [IGI file 2] [PRI file] [5'UTR file]... --bed [BED file]
+    python3 bed_check.py [FASTA file] [IGI file 1] [IGI file 2] [PRI file] [5'UTR file]... --random 300
+With --random, intervals of random positions and lengths (up to --length bases) are generated on all records.
+"""
+
+intervals = 300
+#The number of random intervals (--random).
+
+length = 3000
+#The maximum length of the random intervals (--length).
+
+seed = 0
+#The seed of the random numbers.
+
+
+
+import os
+import sys
+import tempfile
+import argparse
+import subprocess
+import numpy as np
+import tss_predict
+from fasta_io import bed_read, fasta_chunks
+
+
+def random_bed(sequence_file, bed_file, n, max_length, seed):
+    """
+    To write a BED file of random intervals.
+    :param sequence_file: FASTA file.
+    :param bed_file: The BED file to be written.
+    :param n: The number of intervals.
+    :param max_length: The maximum length of the intervals.
+    :param seed: The seed of the random numbers.
+    """
+
+    lengths = {}
+    for name, pos, seq in fasta_chunks(sequence_file, 10000000):
+        lengths[name] = pos + len(seq)
+    rng = np.random.default_rng(seed)
+    chroms = [chrom for chrom in lengths if chrom != "" and lengths[chrom] > 0]
+    #Records without a header line cannot be given in a BED file.
+    with open(bed_file, "wt") as save:
+        for i in range(n):
+            chrom = chroms[rng.integers(len(chroms))]
+            start = int(rng.integers(lengths[chrom]))
+            end = min(start + 1 + int(rng.integers(max_length)), lengths[chrom])
+            print(chrom, start, end, "b{}".format(i), sep="\t", file=save)
+
+def values_read(save_file):
+    """
+    To read the values written by tss_predict.py (the lines after the header).
+    :param save_file: The peak or edge file.
+    :return: List of tuples of the columns (str).
+    """
+
+    with open(save_file, "rt") as sf:
+        lines = sf.read().split("\n\n")[-1].splitlines()[1:]
+        #The last block after the line of the column names.
+    return [tuple(line.split("\t")) for line in lines if line != ""]
+
+def run(args, out_dir):
+    """
+    To run tss_predict.py.
+    :param args: The command line arguments.
+    :param out_dir: The output directory.
+    """
+
+    subprocess.check_call([sys.executable, tss_predict.__file__] + args + ["--out", out_dir], stdout=subprocess.DEVNULL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check of the --bed mode of tss_predict.py against the whole chromosomes.")
+    parser.add_argument("files", nargs="+", help="The FASTA file and the score files (the same as tss_predict.py).")
+    parser.add_argument("--bed", help="BED file of the intervals.")
+    parser.add_argument("--random", type=int, default=None, help="The number of random intervals (instead of --bed).")
+    parser.add_argument("--length", type=int, default=length, help="The maximum length of the random intervals.")
+    parser.add_argument("--seed", type=int, default=seed, help="The seed of the random numbers.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp:
+        bed_file = args.bed
+        if bed_file is None:
+            seqFile = [f for f in args.files if not any(key in os.path.basename(f) for key in ("IGI", "PRI", "5UTR"))][0]
+            bed_file = os.path.join(temp, "random.bed")
+            random_bed(seqFile, bed_file, args.random if args.random is not None else intervals, args.length, args.seed)
+        whole_dir = os.path.join(temp, "whole")
+        bed_dir = os.path.join(temp, "bed")
+        run(args.files, whole_dir)
+        run(args.files + ["--bed", bed_file], bed_dir)
+
+        suffixes = list(tss_predict.edgeSuffix([f for f in args.files if "5UTR" in os.path.basename(f)]).values())
+        #The suffixes of the edge files of the 5'UTR files (the same as tss_predict.py).
+        reach = tss_predict.flank_calc() - (tss_predict.ue.N - 1)
+        #The edges are searched (N - 1) bases inside the scored window.
+        peak_same = peak_total = edge_same = edge_total = long_edges = 0
+        for chrom, start, end, name in bed_read(bed_file):
+            for strand in ("forward", "reverse"):
+                whole = os.path.join(whole_dir, "{}_peak_{}.txt".format(chrom, strand))
+                part = os.path.join(bed_dir, "{}_peak_{}.txt".format(name, strand))
+                expected = [(pos, p) for pos, p in values_read(whole) if start < int(pos) <= end]
+                found = values_read(part)
+                peak_total += 1
+                if found == expected:
+                    peak_same += 1
+                else:
+                    print("peak", name, chrom, start, end, strand, "expected:", expected, "found:", found)
+
+                for suffix in suffixes:
+                    whole = tss_predict.ue.save_generate(os.path.join(whole_dir, ""), chrom, strand, suffix)
+                    part = tss_predict.ue.save_generate(os.path.join(bed_dir, ""), name, strand, suffix)
+                    overlap = [(L, R, p) for L, R, p in values_read(whole) if int(L) <= end and int(R) > start]
+                    within = [item for item in overlap if int(item[0]) >= start + 1 - reach and int(item[1]) <= end + reach]
+                    #The edges whose both ends are in the reach of the flanks.
+                    found = values_read(part)
+                    edge_total += 1
+                    long_edges += len(overlap) - len(within)
+                    if set(found) <= set(overlap) and set(within) <= set(found):
+                        edge_same += 1
+                    else:
+                        print("edge", name, chrom, start, end, strand, suffix, "expected:", within, "found:", found)
+
+    print("peak files:", peak_same, "/", peak_total, "same")
+    print("edge files:", edge_same, "/", edge_total, "same")
+    print("edges longer than the reach of the flanks (not written with --bed):", long_edges)
+    if peak_same != peak_total or edge_same != edge_total:
+        sys.exit(1)
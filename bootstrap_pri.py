@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Bootstrap confidence intervals of PRI scores.
+
+The promoters are resampled with replacement, and IGI and PRI are calculated again for each replicate
+(the same formulas as calc_igi_pri.py: PRI = IGI of the first region - IGI of the second region).
+The k-mer counts of each promoter are kept as a sparse matrix (promoters x 4 ** bp),
+so the counts of a batch of replicates are one product of the matrix and the resampling weights.
+The batches are calculated in parallel by a process pool.
+
+Input: Promoter files (the same as TSS_count.py) or a count store (count_store.py, --store)
+Output: Sequence<TAB>PRI<TAB>lower limit<TAB>upper limit<TAB>standard error (of the replicates)
+
+At the command prompt, enter the following.
+    python3 bootstrap_pri.py [Promoter file 1] [Promoter file 2]... [--replicates 1000] [--level 0.95] [--workers 8]
+    python3 bootstrap_pri.py --store [Store] [--replicates 1000]
+
+The PRI column is the same as PRI.txt of calc_igi_pri.py.
+The replicates are kept in memory as float32 (replicates x 4 ** bp, 262 MB for 1000 replicates of 8 bases).
+The results do not depend on the number of processes for the same seed.
+"""
+
+save_dir = r""
+#The directory for saving output files
+#If blank, the output file will be in the directory where this script is located.
+
+replicates = 1000
+#The number of bootstrap replicates.
+
+level = 0.95
+#The confidence level of the intervals (percentile method).
+
+batch = 50
+#The number of replicates calculated at once by one process.
+
+workers = 1
+#The number of processes.
+
+seed = 0
+#The seed of the random numbers.
+
+
+
+import os
+import time
+import math
+import argparse
+import numpy as np
+from scipy import sparse
+from concurrent.futures import ProcessPoolExecutor
+import TSS_count
+import calc_igi_pri
+import count_store
+from kmer_code import seq_encode, kmer_forward, kmer_enumerate
+
+if save_dir == "":
+    save_dir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+    #Get the absolute path of the directory where this script is located.
+
+
+def promoter_matrix(seqs, bp, start, end, length):
+    """
+    To generate the sparse matrix of the k-mer counts of each promoter in the region.
+    :param seqs: List of promoter sequences starting at -1000.
+    :param bp: The number of bases.
+    :param start: The start of the region (upstream).
+    :param end: The end of the region (downstream).
+    :param length: The length of the region to be counted (the same as TSS_count.py).
+    :return: scipy.sparse.csr_matrix (promoters x 4 ** bp) of counts.
+    """
+
+    parts = [prom[1000+start:(1000+start)+(-1*start+end)+1][:length] for prom in seqs]
+    fwd = kmer_forward(seq_encode("N".join(parts)), bp)
+    #The promoters are separated by "N" as in TSS_count.batch_count.
+    owner = np.repeat(np.arange(len(parts)), [len(part) + 1 for part in parts])[:fwd.size]
+    #The promoter of each window.
+    valid = fwd < 4 ** bp
+    fwd, owner = fwd[valid], owner[valid]
+    return sparse.csr_matrix((np.ones(fwd.size, dtype=np.float64), (owner, fwd.astype(np.int64))),
+                             shape=(len(parts), 4 ** bp))
+
+def igi_calc(count_matrix, bp):
+    """
+    To calculate IGI of the replicates (the same formula as calc_igi_pri.calc_igi, with numpy.log10).
+    :param count_matrix: numpy.ndarray (replicates x 4 ** bp) of counts.
+    :param bp: The number of bases.
+    :return: numpy.ndarray of IGI. (0 where the count is 0)
+    """
+
+    count_sum = count_matrix.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        igi = np.log10(count_matrix / count_sum) - math.log10(1 / (4 ** bp))
+    igi[count_matrix == 0] = 0
+    return igi
+
+def worker_init(matrices, k):
+    """
+    To give the transposed matrices to each process of the pool.
+    :param matrices: [sparse matrix (4 ** bp x promoters) of the first region, that of the second region]
+    :param k: The number of bases.
+    """
+
+    global promMatrices, bp
+    promMatrices = matrices
+    bp = k
+
+def replicate_pri(seed_seq, n):
+    """
+    To calculate PRI of a batch of bootstrap replicates.
+    :param seed_seq: numpy.random.SeedSequence of the batch.
+    :param n: The number of replicates.
+    :return: numpy.ndarray (n x 4 ** bp, float32) of PRI.
+    """
+
+    rng = np.random.default_rng(seed_seq)
+    promoters = promMatrices[0].shape[1]
+    weights = np.zeros((promoters, n))
+    for i in range(n):
+        weights[:, i] = np.bincount(rng.integers(0, promoters, promoters), minlength=promoters)
+    #The number of times each promoter is drawn in each replicate.
+
+    igi1 = igi_calc(np.asarray(promMatrices[0] @ weights).T, bp)
+    igi2 = igi_calc(np.asarray(promMatrices[1] @ weights).T, bp)
+    return calc_igi_pri.calc_pri(igi1, igi2).astype(np.float32)
+
+def interval_calc(pri_reps, confidence, block=4096):
+    """
+    To calculate the confidence intervals and the standard errors of the replicates.
+    :param pri_reps: numpy.ndarray (replicates x 4 ** bp) of PRI.
+    :param confidence: The confidence level.
+    :param block: The number of k-mers calculated at once.
+    :return: numpy.ndarray of the lower limits, the upper limits and the standard errors.
+    """
+
+    q = [(1 - confidence) / 2, 1 - (1 - confidence) / 2]
+    lower = np.zeros(pri_reps.shape[1])
+    upper = np.zeros(pri_reps.shape[1])
+    se = np.zeros(pri_reps.shape[1])
+    for first in range(0, pri_reps.shape[1], block):
+        part = pri_reps[:, first:first + block].astype(np.float64)
+        lower[first:first + block], upper[first:first + block] = np.quantile(part, q, axis=0)
+        se[first:first + block] = part.std(axis=0, ddof=1) if part.shape[0] > 1 else 0
+    return lower, upper, se
+
+
+if __name__ == "__main__":
+    t1 = time.time()
+    #Get start time.
+
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals of PRI scores.")
+    parser.add_argument("files", nargs="*", help="Promoter files (the same as TSS_count.py).")
+    parser.add_argument("--store", help="Count store (count_store.py) instead of promoter files.")
+    parser.add_argument("--region", action="append", type=TSS_count.region_parse, default=None,
+                        help="The two regions of PRI, e.g. --region=-200:-60 --region=-750:-450 (default: region_list of TSS_count.py).")
+    parser.add_argument("--bp", type=int, default=TSS_count.bp, help="The number of bases (with promoter files).")
+    parser.add_argument("--replicates", type=int, default=replicates, help="The number of bootstrap replicates.")
+    parser.add_argument("--level", type=float, default=level, help="The confidence level.")
+    parser.add_argument("--workers", type=int, default=workers, help="The number of processes.")
+    parser.add_argument("--seed", type=int, default=seed, help="The seed of the random numbers.")
+    parser.add_argument("--out", default=None, help="The output file (default: PRI_bootstrap.txt in save_dir).")
+    args = parser.parse_args()
+
+    if args.store is not None:
+        info, totals, proms = count_store.store_load(args.store)
+        bp = info["bp"]
+        region_list = args.region if args.region is not None else info["regions"][:2]
+        seqs = list(proms.values())
+        lengths = [end - start + 1 for start, end in region_list]
+        #The same as the totals of the store.
+        sources = [args.store]
+    elif len(args.files) > 0:
+        bp = args.bp
+        region_list = args.region if args.region is not None else TSS_count.region_list[:2]
+        seqs = []
+        for pfile in args.files:
+            seqs += list(TSS_count.range_seqs(pfile))
+        lengths = TSS_count.region_lengths(args.files[0], region_list)
+        #The same as TSS_count.py.
+        sources = args.files
+    else:
+        print("Input promoter files or a count store (--store).")
+        quit()
+
+    if len(region_list) != 2:
+        parser.error("Give two regions (--region twice).")
+    if len(seqs) == 0:
+        print("No promoter.")
+        quit()
+
+    matrices = [promoter_matrix(seqs, bp, start, end, length) for (start, end), length in zip(region_list, lengths)]
+    del seqs
+    totals = np.vstack([np.asarray(m.sum(axis=0)).ravel() for m in matrices]).round().astype(np.int64)
+    igi = calc_igi_pri.calc_igi(totals, bp)
+    pri = calc_igi_pri.calc_pri(igi[0], igi[1])
+    #The point estimates (the same as PRI.txt of calc_igi_pri.py).
+    pri_zero = (igi[0] == 0) | (igi[1] == 0)
+    print(matrices[0].shape[0], "promoters")
+
+    matrices = [m.T.tocsr() for m in matrices]
+    sizes = [min(batch, args.replicates - first) for first in range(0, args.replicates, batch)]
+    seeds = np.random.SeedSequence(args.seed).spawn(len(sizes))
+    #One seed for each batch, so the results do not depend on the number of processes.
+
+    pri_reps = np.zeros((args.replicates, 4 ** bp), dtype=np.float32)
+    if args.workers > 1:
+        with ProcessPoolExecutor(args.workers, initializer=worker_init, initargs=(matrices, bp)) as pool:
+            results = pool.map(replicate_pri, seeds, sizes)
+            for first, result in zip(range(0, args.replicates, batch), results):
+                pri_reps[first:first + result.shape[0]] = result
+    else:
+        worker_init(matrices, bp)
+        for first, seed_seq, n in zip(range(0, args.replicates, batch), seeds, sizes):
+            pri_reps[first:first + n] = replicate_pri(seed_seq, n)
+    del matrices
+
+    lower, upper, se = interval_calc(pri_reps, args.level)
+    del pri_reps
+
+    save_file = args.out if args.out is not None else save_dir + "PRI_bootstrap.txt"
+    calc_igi_pri.saveWrite(save_file, __file__, *sources)
+    with open(save_file, "at") as save:
+        print("Regions:", *["{}:{}".format(start, end) for start, end in region_list], file=save)
+        print("Replicates:", args.replicates, file=save)
+        print("Level:", args.level, file=save)
+        print("Seed:", args.seed, file=save)
+        print("\nSequence", "PRI", "Lower", "Upper", "SE", sep="\t", file=save)
+        save.writelines("{}\t{}\t{}\t{}\t{}\n".format(base, "0" if z else repr(p), repr(lo), repr(up), repr(s))
+                        for base, p, z, lo, up, s in zip(kmer_enumerate(bp), pri.tolist(), pri_zero.tolist(),
+                                                         lower.tolist(), upper.tolist(), se.tolist()))
+
+    t2 = time.time()
+    t = t2 - t1
+    if t > 60:
+        print('time:'+str(t/60)+'(min)')
+    else:
+        print('time:'+str(t)+'(s)')
+    #To display the time required for processing.
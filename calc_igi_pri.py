@@ -2,26 +2,37 @@
 
 #
 """
-塩基の出現数を記録したファイルを２つ読み込み、IGIとPRI（またはFUI）を算出する。
+塩基の出現数を記録したファイルを読み込み、IGIとPRI（またはFUI）を算出する。
 PRIの算出時には、先に読み込まれたファイルのIGIから後に読み込まれたファイルのIGIが引かれる。
 出現数はTSS_count.pyでの作成を想定している。
+
+２つのファイルを指定すると、それぞれのIGI（IGI_[ファイル名]）とPRI.txtを出力する。
+    python3 calc_igi_pri.py for_chr1_-200_-60.txt for_chr1_-750_-450.txt
+３つ以上のファイルを指定し、--pairで差をとる組み合わせ（ファイルの番号、1から）を指定することもできる。
+全てのファイルのIGIは１つの行列としてまとめて算出する。
+    python3 calc_igi_pri.py A.txt B.txt C.txt --pair 1:2 --pair FUI_AC=1:3 --out tables
+    --pair 1:2       : PRI_A-B.txt（Aのファイル名-Bのファイル名）
+    --pair FUI_AC=1:3 : FUI_AC.txt
+    --all-pairs      : 全ての組み合わせ（番号の小さいファイルから大きいファイルを引く）
 """
 
 from time import time
 import os
-from sys import argv
 import re
 import math
+import argparse
+import numpy as np
 
 t1=time()
 #開始時刻の取得
 
 save_dir = os.path.dirname(__file__) + os.sep
 #出力したファイルを保存するディレクトリ
+#コマンドラインで --out で指定することもできる
 
 def read_count_file(file_path):
     """
-    塩基の出現数を数えたファイルを読み込み、塩基の組み合わせのリストと出現数のリストを返す
+    塩基の出現数を数えたファイルを読み込み、塩基の組み合わせのリストと出現数の配列を返す
     """
 
     base_list, count_list = [], []
@@ -33,35 +44,59 @@ def read_count_file(file_path):
                 base_list.append(temp[0])
                 count_list.append(int(temp[1]))
 
-    return base_list, count_list
+    return base_list, np.array(count_list, dtype=np.int64)
 
-def calc_igi(count_list):
+def calc_igi(count_matrix, bp):
     """
-    塩基の出現数のリストを受け取り、算出したIGIのリストを返す
+    塩基の出現数の行列（ファイル×塩基の組み合わせ）を受け取り、算出したIGIの行列を返す
+    bpは塩基数（出現数のファイルの塩基の組み合わせの長さ）
+    出現数が0の要素のIGIは0とする
     """
 
-    count_sum = sum(count_list)
+    count_sum = count_matrix.sum(axis=1)
+
+    igi_matrix = np.zeros(count_matrix.shape, dtype=np.float64)
+    for i in range(count_matrix.shape[0]):
+        values, inverse = np.unique(count_matrix[i], return_inverse=True)
+        logs = np.array([math.log10(c / int(count_sum[i])) if c != 0 else 0 for c in values.tolist()])
+        #math.log10は出現数の種類ごとに１回だけ計算する（numpy.log10とは最下位の桁が異なることがあるため）
+        igi = logs[inverse.reshape(-1)] - math.log10(1 / (4 ** bp))
+        igi[count_matrix[i] == 0] = 0
+        igi_matrix[i] = igi
+    return igi_matrix
+
+def calc_pri(igi1, igi2):
+    """
+    ２つのIGIの配列を受け取り、算出したPRIの配列を返す
+    どちらかのIGIが0の要素のPRIは0とする
+    """
 
-    igi_list = []
-    for c in count_list:
-        if c == 0:
-            igi_list.append(0)
-        else:
-            igi_list.append(math.log10(c / count_sum) - math.log10(1 / (4 ** 8)))
-    return igi_list
+    return np.where((igi1 == 0) | (igi2 == 0), 0, igi1 - igi2)
 
-def calc_pri(igi_list1, igi_list2):
+def tableWrite(save_file, base_list, values, zero):
     """
-    ２つのIGIのリストを受け取り、算出したPRIのリストを返す
+    塩基の組み合わせとIGIまたはPRIを出力する
+    :param save_file: 出力ファイル
+    :param base_list: 塩基の組み合わせのリスト
+    :param values: IGIまたはPRIの配列
+    :param zero: 0と書き込む要素（出現数が0の要素など）
     """
 
-    pri_list = []
-    for igi1, igi2 in zip(igi_list1, igi_list2):
-        if igi1 == 0 or igi2 == 0:
-            pri_list.append(0)
-        else:
-            pri_list.append(igi1 - igi2)
-    return pri_list
+    with open(save_file, "w") as save:
+        save.writelines(base + "\t" + ("0" if z else repr(v)) + "\n"
+                        for base, v, z in zip(base_list, values.tolist(), zero.tolist()))
+
+def pair_parse(text):
+    """
+    コマンドラインで指定した組み合わせを変換する
+    :param text: "1:2"または"名前=1:2"
+    :return: (名前（指定しなければNone）, 引かれるファイルの番号, 引くファイルの番号)（番号は0から）
+    """
+
+    m = re.fullmatch(r"(?:([^=]+)=)?(\d+):(\d+)", text.strip())
+    if m is None:
+        raise argparse.ArgumentTypeError("組み合わせは1:2または名前=1:2の形式で指定してください: " + text)
+    return m.group(1), int(m.group(2)) - 1, int(m.group(3)) - 1
 
 
 def saveWrite(save_file, *arg):
@@ -75,43 +110,64 @@ def saveWrite(save_file, *arg):
         print("", file=save)
 
 
-argvs=argv
-#コマンドライン引数から処理するファイルを取得
-
-if len(argvs) != 3:
-    print('２つのファイルをコマンドライン引数で指定してください')
-    quit()
-
-igi_list_list = []
-for count_file in argvs[1:]:
-    base_list, count_list = read_count_file(count_file)
-
-    igi_list = calc_igi(count_list)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="塩基の出現数のファイルからIGIとPRI（またはFUI）を算出する")
+    parser.add_argument("files", nargs="*", help="TSS_count.pyで作成した出現数のファイル")
+    parser.add_argument("--pair", action="append", type=pair_parse, default=[],
+                        help="差をとる組み合わせ（例:1:2、FUI=3:1）。複数指定できる")
+    parser.add_argument("--all-pairs", action="store_true", help="全ての組み合わせのPRIを出力する")
+    parser.add_argument("--out", default=save_dir, help="出力ファイルを保存するディレクトリ")
+    args = parser.parse_args()
+    save_dir = os.path.join(args.out, "")
+
+    pairs = list(args.pair)
+    if args.all_pairs:
+        pairs += [(None, i, j) for i in range(len(args.files)) for j in range(i + 1, len(args.files))]
+    if len(pairs) == 0:
+        if len(args.files) != 2:
+            print('２つのファイルをコマンドライン引数で指定してください（３つ以上のときは--pairまたは--all-pairsを指定してください）')
+            quit()
+        pairs = [("PRI", 0, 1)]
+        #２つのファイルだけを指定したときはPRI.txtを出力する
+    if len(args.files) < 1 or any(not (0 <= i < len(args.files) and 0 <= j < len(args.files)) for name, i, j in pairs):
+        parser.error("組み合わせの番号はファイルの数（{}）以下で指定してください".format(len(args.files)))
+
+    if not os.path.isdir(save_dir):
+        os.makedirs(save_dir)
+
+    count_list = []
+    for count_file in args.files:
+        bases, counts = read_count_file(count_file)
+        if len(count_list) == 0:
+            base_list = bases
+        elif bases != base_list:
+            print(count_file, ': 塩基の組み合わせが最初のファイルと異なります')
+            quit()
+        count_list.append(counts)
+    bp = len(base_list[0])
+    #塩基数は出現数のファイルから決める（TSS_count.pyの--bp）
+
+    count_matrix = np.vstack(count_list)
     del count_list
-    igi_list_list.append(igi_list)
-
-    save_file = save_dir + "IGI_" + os.path.basename(count_file)
-    #saveWrite(save_file, __file__, count_file)
-    #with open(save_file, "a") as save:
-    with open(save_file, "w") as save:
-        for base, igi in zip(base_list, igi_list):
-            print(base, igi, sep="\t", file=save)
-
-pri_list = calc_pri(igi_list_list[0], igi_list_list[1])
-del igi_list_list
-
-save_file = save_dir + "PRI.txt"
-#saveWrite(save_file, __file__, argvs[1], argvs[2])
-#with open(save_file, "a") as save:
-with open(save_file, "w") as save:
-    for base, pri in zip(base_list, pri_list):
-        print(base, pri, sep="\t", file=save)
-
-
-t2=time()
-t=t2-t1
-if t > 60:
-    print('time:'+str(t/60)+'(min)')
-else:
-    print('time:'+str(t)+'(s)')
-#処理に要した時間を出力
+    igi_matrix = calc_igi(count_matrix, bp)
+
+    for count_file, counts, igi in zip(args.files, count_matrix, igi_matrix):
+        save_file = save_dir + "IGI_" + os.path.basename(count_file)
+        tableWrite(save_file, base_list, igi, counts == 0)
+
+    for name, i, j in pairs:
+        pri = calc_pri(igi_matrix[i], igi_matrix[j])
+        if name is None:
+            name = "PRI_{}-{}".format(*[os.path.splitext(os.path.basename(args.files[k]))[0] for k in (i, j)])
+        save_file = save_dir + name + ".txt"
+        tableWrite(save_file, base_list, pri, (igi_matrix[i] == 0) | (igi_matrix[j] == 0))
+        print(os.path.basename(save_file))
+
+
+    t2=time()
+    t=t2-t1
+    if t > 60:
+        print('time:'+str(t/60)+'(min)')
+    else:
+        print('time:'+str(t)+'(s)')
+    #処理に要した時間を出力
@@ -6,30 +6,65 @@ Author: Tosei Hiratsuka (2020.3.9)
 
 READ manual.txt BEFORE USE.
 
-Input: FASTA, IGI, PRI
-Output: The numeric sequence converted by IGI or PRI
+Input: FASTA (multi-record and gzip-compressed files are supported), IGI, PRI
+Output: The numeric sequence converted by IGI or PRI (for each record of the FASTA file)
 
 At the command prompt, enter the following.
-    python3 chrom_scan.py [FASTA file] [Score file 1] [Score file 2]...
+    python3 chrom_scan.py [FASTA file] [Score file 1] [Score file 2]... [--format text|npy|bedgraph] [--workers N]
 
 For example,
     python3 chrom_scan.py Chr1_for_test.con IGI200_60_forChr1-2.txt IGI750_450_forChr1-2.txt PRI200_60-750_450_forChr1-2.txt 5UTR-IGI750_450_forChr1-2.txt
 
+With "--format npy", the scores are saved as float32 binary arrays (.npy) with a JSON sidecar file (see track_io.py).
+With "--format bedgraph", consecutive positions with the same score (e.g. the N-gap regions) are saved as one line
+of (run length, score) (run-length encoding, see track_io.py). It is smaller than the text format, most of all with long runs.
+With "--derive-pri", the PRI table is calculated from the first two IGI tables (IGI1 - IGI2, 0 if either is 0)
+instead of being given as a file. (peak_find_SG.py --derive-pri does not need the PRI tracks at all.)
+With "--chrom Chr1", only the given records are scored (the lines of the other records are skipped).
+
 
 If a file with the same name as the output file already exists, it will be overwritten without warning.
-If you want to change the output directory, enter the variable ("save_dir") below.
+If you want to change the output directory, enter the variable ("save_dir") below, or give "--out DIR" on the command line.
 """
 
 save_dir = r""
 #The directory for saving output files
 #If blank, the output file will be in the directory where this script is located.
 
+chunk_size = 10000000
+#The number of bases scored at once.
+#The memory usage depends on this value, not on the length of the chromosome.
+
+save_format = "text"
+#The format of output files. "text" (Position<TAB>Score), "npy" (float32 binary array) or "bedgraph" (run-length encoding).
+#It can also be given with "--format" on the command line.
+
+flank = 527
+#With "--bed" or "--region", the flanks (bases) scored on both sides of each interval.
+#527 is the margin which peak_find_SG.py needs for smoothing, peak search and peak integration
+#(2 * N + 3 * (N - 1) / 2 for N = 151, see peak_margin of peak_find_SG.py), so that the peaks in the interval are the same
+#as those of the whole chromosome.
+
+workers = 1
+#The number of processes for scoring. Chunks (and chromosomes) are scored in parallel.
+#It can also be given with "--workers" on the command line.
+
 
 
 import os
 import time
-import sys
+import argparse
 import re
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+from fasta_io import fasta_chunks, bed_read, region_parse, region_extract
+from kmer_code import seq_encode, kmer_index
+from score_table import table_load, text_exceptions, index_text, pri_score_name
+from calc_igi_pri import calc_pri
+from track_io import npyWrite, npyAppend, npyClose, bedgraphWrite, bedgraphAppend
 
 t1=time.time()
 #Get start time.
@@ -62,71 +97,20 @@ def chrom_name_extract(chrom_file):
     chrom = re.search("([cC]hr\d+)\D.*", fn).group(1)
     return chrom
 
-def save_generate(save_directory, chrom, score_name):
+def save_generate(save_directory, chrom, score_name, extension=".txt"):
     """
     To generate output files (forward and reverse).
     :param save_directory: The directory for saving output files.
     :param chrom: The chromosome number.
     :param score_name: The name of score (IGI or PRI).
+    :param extension: The extension of output files.
     :return: Names of output files.
     """
     
-    save_f = save_directory + "{}_scan_{}_forward.txt".format(chrom, score_name)
-    save_r = save_f.replace("forward", "reverse")
+    save_f = save_directory + "{}_scan_{}_forward{}".format(chrom, score_name, extension)
+    save_r = save_directory + "{}_scan_{}_reverse{}".format(chrom, score_name, extension)
     return save_f, save_r
 
-def Reverse(sequence):
-    """
-    To generate the complementary sequence.
-    :param sequence: The base sequence.
-    :return: The complementary sequence to the input sequence.
-    """
-    
-    basedict={'A':'T','T':'A','G':'C','C':'G'}
-    #塩基対のディクショナリ
-    rsequence=''
-    for base in sequence[::-1]:
-        rsequence+=basedict.get(base,'X')
-    #The tail of "sequence" is equal to the head of "rsequence".
-    #This function outputs "X" for mixed base.
-    return rsequence
-
-def index_dict_generate(score_table_file):
-    """
-    To extract the dictionary and the number of bases from PRI or IGI file.
-    :param score_table_file: IGI or PRI file.
-    :return: The dictionary object (key: base sequence, value: IGI or PRI score).
-    :return: The number of bases.
-    """
-    
-    with open(score_table_file,'rt') as fi:
-        indexlist=[line.replace('\n','').split('\t') for line in fi
-                   if re.match("[ATGC][ATGC]+", line)]
-        #If the base sequence is in the line, generate the list object separating by a tab character.
-
-    bp=len(indexlist[0][0])
-    #The number of bases.
-
-    indexdict=dict(indexlist)
-    #{"base sequence": "IGI or PRI score"}
-    del indexlist
-
-    return indexdict, bp
-
-def seq_ext(sequence_file):
-    """
-    To extract the whole of sequence from the FASTA file.
-    :param sequence_file: FASTA file.
-    :return: The whole of sequence.
-    """
-    
-    seq = ""
-    with open(sequence_file, "rt") as sf:
-        for line in sf:
-            if not re.match(">", line):
-                seq += line.replace("\n", "")
-    return seq
-
 def saveWrite(save_file, chrom, score, strand, *arg):
     """
     To write basic information to the output file.
@@ -145,67 +129,352 @@ def saveWrite(save_file, chrom, score, strand, *arg):
         print("Strand:", strand, file=save)
         print("\nPosition", "Score", sep="\t", file=save)
 
+def scoreWrite(save_file, scores, offset, mode="at"):
+    """
+    To append the scores to the output file.
+    :param save_file: The output file.
+    :param scores: numpy.ndarray of scores.
+    :param offset: The position of the first score.
+    :param mode: The mode to open the output file.
+    """
+
+    with open(save_file, mode) as save:
+        lines = map("{}\t{}\n".format, range(offset, offset + scores.size), scores)
+        save.writelines(lines)
 
-argvs = sys.argv
-if len(argvs) < 3:
-    print('Input one chromosome base sequence file and one or more PRI or IGI files with command line arguments.')
-    quit()
-    #If no more than two files are entered, then exit.
 
-scoreFiles = []
+def record_index(sequence_file, splen, chunk_size):
+    """
+    To generate the k-mer indices of every record of the FASTA file (scored in memory without output files).
+    :param sequence_file: FASTA file.
+    :param splen: The number of bases of the score tables.
+    :param chunk_size: The number of bases encoded at once.
+    :return: Generator of (chromosome name, indices of the forward windows, indices of the reverse complement).
+    """
 
-for f in argvs[1:]:
-    if re.search("PRI", os.path.basename(f)) or re.search("IGI", os.path.basename(f)):
-        scoreFiles.append(f)
-    else:
-        seqFile = f
+    chrom = None
+    for name, pos, seq in fasta_chunks(sequence_file, chunk_size, splen - 1):
+        if pos == 0:
+            if chrom is not None:
+                yield chrom, np.concatenate(F_lst), np.concatenate(R_lst)
+            chrom = name if name != "" else chrom_name_extract(sequence_file)
+            F_lst = []
+            R_lst = []
+        F_idx, R_idx = kmer_index(seq_encode(seq), splen)
+        F_lst.append(F_idx)
+        R_lst.append(R_idx)
+        del seq, F_idx, R_idx
+    if chrom is not None:
+        yield chrom, np.concatenate(F_lst), np.concatenate(R_lst)
+
+def offset_calc(splen):
+    """
+    To calculate the position of the first score.
+    :param splen: The number of bases of the score table.
+    :return: The position of the center of the first window.
+    """
 
-for scfile in scoreFiles:
-    scname = score_name_extract(scfile)
-    scDict, splen = index_dict_generate(scfile)
-    #"splen" is the width to separate array when scoring. (split length)
     if splen % 2 == 0:
         offset = int(splen / 2)
     else:
         offset = int((splen +1 ) / 2)
+    return offset
 
-    print("--------------------------------")
-    print(os.path.basename(scfile))
-    print(os.path.basename(seqFile))
-
-    chrom = chrom_name_extract(seqFile)
-    saveF, saveR = save_generate(save_dir, chrom, scname)
-    saveWrite(saveF, chrom, scname, "forward", __file__, seqFile, scfile)
-    saveWrite(saveR, chrom, scname, "reverse", __file__, seqFile, scfile)
-
-    seq = seq_ext(seqFile)
-
-    F_lst = []
-    R_lst = []
-    #To store scores of sequence.
-    for i in range(len(seq) - splen + 1):
-        part = seq[i : i + splen]
-        F_lst.append(scDict.get(part,"0"))
-
-        rpart = Reverse(part)
-        R_lst.append(scDict.get(rpart, "0"))
-    del seq, scDict
-
-    with open(saveF, "at") as fsave:
-        for pos, fresult in enumerate(F_lst, offset):
-            print(pos, fresult, sep="\t", file=fsave)
-    del F_lst
-
-    with open(saveR, "at") as rsave:
-        for pos, rresult in enumerate(R_lst, offset):
-            print(pos, rresult, sep="\t", file=rsave)
-    del R_lst
-
-
-t2=time.time()
-t=t2-t1
-if t > 60:
-    print('time:'+str(t/60)+'(min)')
-else:
-    print('time:'+str(t)+'(s)')
-#To display the time required for processing.
\ No newline at end of file
+def worker_init(tables, file_format):
+    """
+    To pass the score tables to a worker process.
+    :param tables: {split length: [(score file, score name, dense array of scores), ...]}
+    :param file_format: The format of output files.
+    """
+
+    global scTables, save_format
+    scTables = tables
+    save_format = file_format
+
+def saveCreate(save_name, chrom, tables, start, *arg):
+    """
+    To generate the output files of a record (or a region) with their headers.
+    :param save_name: The name at the head of the output files (chromosome number or the name of the region).
+    :param chrom: Chromosome number.
+    :param tables: [(score file, score name, dense array of scores), ...]
+    :param start: The position of the first score.
+    :param *arg: The source files written to the output files (after this script and the score file).
+    :return: [(forward output file, reverse output file), ...]
+    """
+
+    saveFiles = []
+    for scfile, scname, scArray in tables:
+        if save_format == "npy":
+            saveF, saveR = save_generate(save_dir, save_name, scname, ".npy")
+            npyWrite(saveF, chrom, scname, "forward", start, __file__, *arg, scfile)
+            npyWrite(saveR, chrom, scname, "reverse", start, __file__, *arg, scfile)
+        elif save_format == "bedgraph":
+            saveF, saveR = save_generate(save_dir, save_name, scname, ".bedgraph")
+            bedgraphWrite(saveF, chrom, scname, "forward", start, __file__, *arg, scfile)
+            bedgraphWrite(saveR, chrom, scname, "reverse", start, __file__, *arg, scfile)
+        else:
+            saveF, saveR = save_generate(save_dir, save_name, scname)
+            saveWrite(saveF, chrom, scname, "forward", __file__, *arg, scfile)
+            saveWrite(saveR, chrom, scname, "reverse", __file__, *arg, scfile)
+        saveFiles.append((saveF, saveR))
+    return saveFiles
+
+def chunk_scan(splen, pos, seq, saveFiles, part="", track_start=0):
+    """
+    To score a chunk of the sequence by all tables with "splen" bases and write the scores to the output files.
+    :param splen: The number of bases of the score tables.
+    :param pos: The position of the chunk in the record (0-based).
+    :param seq: The sequence of the chunk.
+    :param saveFiles: [(forward output file, reverse output file), ...] in the order of scTables[splen].
+    :param part: If given, the text scores are written to "output file + part" instead of the output file.
+    :param track_start: The position of the first window of the output files in the record (0-based).
+    """
+
+    offset = offset_calc(splen)
+    F_idx, R_idx = kmer_index(seq_encode(seq), splen)
+    #The k-mer indices of the forward windows and of their reverse complements.
+    #They are computed once and shared by all tables.
+    del seq
+
+    for (saveF, saveR), (scfile, scname, scArray) in zip(saveFiles, scTables[splen]):
+        if save_format == "npy":
+            npyAppend(saveF, table_scores(scArray, F_idx), pos - track_start)
+            npyAppend(saveR, table_scores(scArray, R_idx), pos - track_start)
+            #Each chunk is written to its own slice of the track.
+        elif save_format == "bedgraph":
+            mode = "wt" if part != "" else "at"
+            bedgraphAppend(saveF + part, table_scores(scArray, F_idx), mode)
+            bedgraphAppend(saveR + part, table_scores(scArray, R_idx), mode)
+            #The runs are split at the boundaries of the chunks.
+        elif part != "":
+            scoreWrite(saveF + part, table_scores(scArray, F_idx), pos + offset, "wt")
+            scoreWrite(saveR + part, table_scores(scArray, R_idx), pos + offset, "wt")
+        else:
+            scoreWrite(saveF, table_scores(scArray, F_idx), pos + offset)
+            scoreWrite(saveR, table_scores(scArray, R_idx), pos + offset)
+
+def table_scores(scArray, idx):
+    """
+    To look up the scores of the k-mer indices in the format of the output files.
+    :param scArray: Dense float32 array of scores ("npy"), or (dense array of scores, return value of text_exceptions).
+    :param idx: numpy.ndarray of k-mer indices.
+    :return: numpy.ndarray of scores (float32 or text).
+    """
+
+    if save_format == "npy":
+        return scArray[idx]
+    return index_text(scArray[0], idx, scArray[1])
+
+def part_join(saveFiles, part):
+    """
+    To append the part files written by chunk_scan to the output files and remove them.
+    :param saveFiles: [(forward output file, reverse output file), ...]
+    :param part: The suffix of the part files.
+    """
+
+    for saveF, saveR in saveFiles:
+        for save_file in (saveF, saveR):
+            with open(save_file, "ab") as save, open(save_file + part, "rb") as pf:
+                shutil.copyfileobj(pf, save)
+            os.remove(save_file + part)
+
+def saveClose(saveFiles, length):
+    """
+    To complete the output files of a record.
+    :param saveFiles: [(forward output file, reverse output file), ...]
+    :param length: The number of scores of the record.
+    """
+
+    if save_format == "npy":
+        for saveF, saveR in saveFiles:
+            npyClose(saveF, length)
+            npyClose(saveR, length)
+
+def pending_wait(pending, limit):
+    """
+    To wait for the submitted chunks in order until at most "limit" of them remain.
+    :param pending: deque of (future or None, function to call after the future is done or None).
+    :param limit: The number of chunks which may remain.
+    """
+
+    while len(pending) > limit:
+        future, finish = pending.popleft()
+        if future is not None:
+            future.result()
+        if finish is not None:
+            finish()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scoring base sequence by IGI or PRI. READ manual.txt BEFORE USE.")
+    parser.add_argument("files", nargs="*", help="One FASTA file and one or more PRI or IGI files.")
+    parser.add_argument("--format", choices=["text", "npy", "bedgraph"], default=save_format, help="The format of output files.")
+    parser.add_argument("--workers", type=int, default=workers, help="The number of processes for scoring.")
+    parser.add_argument("--bed", help="BED file of the intervals to be scored (instead of the whole chromosomes).")
+    parser.add_argument("--region", action="append", default=[],
+                        help="Region to be scored, chromosome:start-end (1-based, both ends included). Can be given more than once.")
+    parser.add_argument("--flank", type=int, default=flank, help="With --bed or --region, the bases scored on both sides of each interval.")
+    parser.add_argument("--chunk-size", type=int, default=chunk_size, help="The number of bases scored at once (by one process).")
+    parser.add_argument("--derive-pri", action="store_true",
+                        help="Score PRI by the table derived from the first two IGI tables (IGI1 - IGI2) instead of a PRI file.")
+    parser.add_argument("--chrom", action="append", default=[],
+                        help="Record to be scored (the first word of the header line). Can be given more than once. (default: all records)")
+    parser.add_argument("--out", default=save_dir, help="The directory for saving output files.")
+    args = parser.parse_args()
+    save_dir = os.path.join(args.out, "")
+    os.makedirs(save_dir, exist_ok=True)
+    save_format = args.format
+    workers = args.workers
+    chunk_size = args.chunk_size
+    flank = args.flank
+
+    if len(args.files) < 2:
+        print('Input one chromosome base sequence file and one or more PRI or IGI files with command line arguments.')
+        quit()
+        #If no more than two files are entered, then exit.
+
+    scoreFiles = []
+
+    for f in args.files:
+        if re.search("PRI", os.path.basename(f)) or re.search("IGI", os.path.basename(f)):
+            scoreFiles.append(f)
+        else:
+            seqFile = f
+
+    scTables = {}
+    #{split length: [(score file, score name, dense array of scores), ...]}
+    #Tables with the same number of bases are scored with the same k-mer indices.
+    igiTables = []
+    #The first two IGI tables for --derive-pri: [(score file, score name, split length, dense array of scores), ...]
+    for scfile in scoreFiles:
+        scValues, splen, scHeader = table_load(scfile)
+        #Dense array of scores indexed by the k-mer index. Windows with mixed bases get 0.
+        #The table is compiled (or recompiled if the source has changed) and cached next to the source.
+        #"splen" is the width to separate array when scoring. (split length)
+        scname = score_name_extract(scfile)
+        if args.derive_pri and scname.startswith("IGI") and len(igiTables) < 2:
+            igiTables.append((scfile, scname, splen, np.asarray(scValues)))
+        if save_format == "npy":
+            scArray = scValues.astype(np.float32)
+        else:
+            scArray = (scValues, text_exceptions(scHeader))
+            #The scores are converted into text chunk by chunk (see table_scores), the same text as in the source.
+        del scValues
+        scTables.setdefault(splen, []).append((scfile, scname, scArray))
+
+    if args.derive_pri:
+        if len(igiTables) < 2 or igiTables[0][2] != igiTables[1][2]:
+            parser.error("--derive-pri needs two IGI tables with the same number of bases.")
+        (igifile1, iginame1, splen, igiValues1), (igifile2, iginame2, splen, igiValues2) = igiTables
+        scValues = calc_pri(igiValues1, igiValues2)
+        #The same as the PRI table of calc_igi_pri.py (IGI1 - IGI2, 0 if either is 0), k-mer by k-mer.
+        del igiTables, igiValues1, igiValues2
+        scfile = "{} - {}".format(os.path.basename(igifile1), os.path.basename(igifile2))
+        #The source written to the output files.
+        if save_format == "npy":
+            scArray = scValues.astype(np.float32)
+        else:
+            scArray = (scValues, text_exceptions({}))
+        del scValues
+        scTables[splen].append((scfile, pri_score_name(iginame1, iginame2), scArray))
+
+    if args.bed is not None or len(args.region) > 0:
+        regions = []
+        source = []
+        #The BED file and the regions written to the output files.
+        if args.bed is not None:
+            regions += bed_read(args.bed)
+            source.append(args.bed)
+        for region_text in args.region:
+            regions.append(region_parse(region_text))
+            source.append(region_text)
+        for splen, tables in scTables.items():
+            offset = offset_calc(splen)
+
+            print("--------------------------------")
+            for scfile, scname, scArray in tables:
+                print(os.path.basename(scfile))
+            print(os.path.basename(seqFile))
+            for item in source:
+                print(os.path.basename(item))
+
+            expanded = [(chrom, start + 1 - flank - offset, end + flank - offset + splen, name)
+                        for chrom, start, end, name in regions]
+            #The windows of the positions from (start + 1 - flank) to (end + flank).
+            count = 0
+            for region, pos, seq in region_extract(seqFile, expanded, chunk_size):
+                #Each region is read with a seek using the index of the FASTA file (.fai), which is built at the first use.
+                saveFiles = saveCreate(region[3], region[0], tables, pos + offset, seqFile, *source)
+                chunk_scan(splen, pos, seq, saveFiles, track_start=pos)
+                saveClose(saveFiles, max(len(seq) - splen + 1, 0))
+                count += 1
+            print(count, "/", len(regions), "regions")
+            #Regions on chromosomes which are not in the FASTA file are skipped.
+
+    else:
+        pool = None
+        if workers > 1:
+            pool = ProcessPoolExecutor(workers, initializer=worker_init, initargs=(scTables, save_format))
+        pending = deque()
+        #Chunks submitted to the pool, in the order of the sequence.
+        #The text scores of a chunk are joined to the output files after all preceding chunks.
+        limit = 2 * workers if pool is not None else 0
+        #The number of chunks which may be held at once.
+        records = None
+        if len(args.chrom) > 0:
+            records = set(args.chrom)
+            try:
+                if chrom_name_extract(seqFile) in records:
+                    records.add("")
+                    #A sequence without a header line is named after the FASTA file.
+            except AttributeError:
+                pass
+
+        for splen, tables in scTables.items():
+            offset = offset_calc(splen)
+
+            print("--------------------------------")
+            for scfile, scname, scArray in tables:
+                print(os.path.basename(scfile))
+            print(os.path.basename(seqFile))
+
+            saveFiles = []
+            for name, pos, seq in fasta_chunks(seqFile, chunk_size, splen - 1, records):
+                #Consecutive chunks share (splen - 1) bases, so every window is scored once.
+                if pos == 0:
+                    if len(saveFiles) > 0:
+                        pending.append((None, partial(saveClose, saveFiles, length)))
+                        #The tracks of the previous record are complete after its chunks.
+
+                    chrom = name if name != "" else chrom_name_extract(seqFile)
+                    print(chrom)
+                    saveFiles = saveCreate(chrom, chrom, tables, offset, seqFile)
+
+                length = pos + max(len(seq) - splen + 1, 0)
+                #The number of scores of the record so far.
+                if pool is None:
+                    chunk_scan(splen, pos, seq, saveFiles)
+                elif save_format == "npy":
+                    pending.append((pool.submit(chunk_scan, splen, pos, seq, saveFiles), None))
+                else:
+                    part = ".part{}".format(pos)
+                    pending.append((pool.submit(chunk_scan, splen, pos, seq, saveFiles, part),
+                                    partial(part_join, saveFiles, part)))
+                del seq
+                pending_wait(pending, limit)
+
+            if len(saveFiles) > 0:
+                pending.append((None, partial(saveClose, saveFiles, length)))
+            pending_wait(pending, limit)
+        pending_wait(pending, 0)
+
+        if pool is not None:
+            pool.shutdown()
+
+    t2=time.time()
+    t=t2-t1
+    if t > 60:
+        print('time:'+str(t/60)+'(min)')
+    else:
+        print('time:'+str(t)+'(s)')
+    #To display the time required for processing.
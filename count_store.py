@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Persistent store of k-mer counts of promoters, updated incrementally.
+
+The store is a directory with the totals of the counts and the promoters counted in them:
+    info.json      ({"bp": 8, "regions": [[-200, -60], [-750, -450]], "promoters": 27000})
+    totals.npy     (int64, regions x 4 ** bp, the same counts as the output of TSS_count.py)
+    promoters.db   (SQLite table of promoter ID and promoter sequence starting at -1000, keyed by the ID)
+Adding promoters adds their counts to the totals, and removing promoters subtracts them,
+so the other promoters are not counted again. A promoter added with an ID already in the store replaces it.
+Only the rows of the added or removed promoters are read and written, so the time of an update depends on
+the number of the promoters changed, not on the size of the store.
+(A store of the older version with promoters.tsv is converted at the first update.)
+Lines of the promoter files with only the sequence get the file name and the line number as the ID,
+and an ID given twice in one file is an error, so that no promoter counted by TSS_count.py is lost.
+The IGI and PRI tables are generated from the totals only (the same files as calc_igi_pri.py).
+
+Unlike TSS_count.py, every window of each region is counted (the range is not taken from the first promoter).
+
+At the command prompt, enter the following.
+    python3 count_store.py init [Store] [--bp 8] [--region=-200:-60 --region=-750:-450]
+    python3 count_store.py add [Store] [Promoter file 1] [Promoter file 2]...
+    python3 count_store.py add [Store] --genome genome.fa --annotation genes.gff3
+    python3 count_store.py remove [Store] [Promoter ID or file of IDs]...
+    python3 count_store.py tables [Store] [--pair 1:2] [--all-pairs] [--counts] [--out DIR]
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+import numpy as np
+import TSS_count
+import calc_igi_pri
+import promoter_extract
+from kmer_code import bp_check, kmer_enumerate
+from promoter_extract import tss_read, promoter_windows
+
+
+def store_files(store_dir):
+    """
+    To generate the names of the files of the store.
+    :param store_dir: The directory of the store.
+    :return: info.json, totals.npy, promoters.db
+    """
+
+    return (os.path.join(store_dir, "info.json"), os.path.join(store_dir, "totals.npy"),
+            os.path.join(store_dir, "promoters.db"))
+
+def promoter_db(store_dir):
+    """
+    To open the table of the promoters (keyed by the promoter ID).
+    The promoters.tsv of a store of the older version is converted into the table.
+    :param store_dir: The directory of the store.
+    :return: sqlite3.Connection
+    """
+
+    save_promoters = store_files(store_dir)[2]
+    db = sqlite3.connect(save_promoters)
+    db.execute("CREATE TABLE IF NOT EXISTS promoters (id TEXT PRIMARY KEY, seq TEXT NOT NULL)")
+    legacy = os.path.join(store_dir, "promoters.tsv")
+    if os.path.exists(legacy):
+        with open(legacy, "rt") as sp, db:
+            db.executemany("INSERT OR REPLACE INTO promoters VALUES (?, ?)",
+                           (line.rstrip("\r\n").split("\t") for line in sp))
+        os.remove(legacy)
+    return db
+
+def promoter_get(db, ids):
+    """
+    To read the sequences of the promoters in the store.
+    :param db: The table of the promoters (return value of promoter_db).
+    :param ids: Iterable of promoter IDs.
+    :return: {promoter ID: promoter sequence} of the IDs in the store.
+    """
+
+    proms = {}
+    for pid in ids:
+        row = db.execute("SELECT seq FROM promoters WHERE id = ?", (pid,)).fetchone()
+        if row is not None:
+            proms[pid] = row[0]
+    return proms
+
+def store_init(store_dir, bp, region_list):
+    """
+    To generate an empty store.
+    :param store_dir: The directory of the store.
+    :param bp: The number of bases.
+    :param region_list: [[start, end], ...] of the regions (upstream of the TSS).
+    """
+
+    bp_check(bp)
+    os.makedirs(store_dir, exist_ok=True)
+    info = {"bp": bp, "regions": [list(item) for item in region_list], "promoters": 0}
+    db = promoter_db(store_dir)
+    with db:
+        db.execute("DELETE FROM promoters")
+        store_save(store_dir, info, np.zeros((len(region_list), 4 ** bp), dtype=np.int64))
+    db.close()
+
+def store_load(store_dir, promoters=True):
+    """
+    To read the store.
+    :param store_dir: The directory of the store.
+    :param promoters: If False, the promoters are not read (for generating the tables and for updating the store).
+    :return: The information (dict), the totals (numpy.ndarray), {promoter ID: promoter sequence}
+    """
+
+    save_info, save_totals, save_promoters = store_files(store_dir)
+    with open(save_info, "rt") as si:
+        info = json.load(si)
+    totals = np.load(save_totals)
+
+    proms = {}
+    if promoters:
+        db = promoter_db(store_dir)
+        proms = dict(db.execute("SELECT id, seq FROM promoters"))
+        db.close()
+    return info, totals, proms
+
+def replace_write(save_file, write, mode="wt"):
+    """
+    To write the file through a temporary file, so that an interrupted update does not break the store.
+    :param save_file: The file.
+    :param write: The function which writes to the file object.
+    :param mode: The mode to open the temporary file.
+    """
+
+    temp = save_file + ".tmp"
+    with open(temp, mode) as save:
+        write(save)
+    os.replace(temp, save_file)
+
+def store_save(store_dir, info, totals):
+    """
+    To write the totals and the information of the store (the promoters are written to the table by the caller).
+    :param store_dir: The directory of the store.
+    :param info: The information (dict).
+    :param totals: The totals (numpy.ndarray).
+    """
+
+    save_info, save_totals, save_promoters = store_files(store_dir)
+    replace_write(save_totals, lambda save: np.save(save, totals), "wb")
+    replace_write(save_info, lambda save: json.dump(info, save, indent=1))
+
+def delta_count(seqs, info):
+    """
+    To count the promoters for the store.
+    :param seqs: List of promoter sequences.
+    :param info: The information of the store.
+    :return: numpy.ndarray (regions x 4 ** bp) of counts.
+    """
+
+    bp, region_list = info["bp"], info["regions"]
+    lengths = [end - start + 1 for start, end in region_list]
+    #Every window of each region.
+    counts, n = TSS_count.seq_count(seqs, bp, region_list, lengths)
+    return counts[:, :4 ** bp]
+
+def store_add(store_dir, items):
+    """
+    To add the promoters to the store. A promoter with an ID already in the store is replaced.
+    :param store_dir: The directory of the store.
+    :param items: Iterable of (promoter ID, promoter sequence starting at -1000).
+    :return: The number of added promoters, the number of replaced promoters.
+    :raises ValueError: If the same ID is given more than once (the store is not changed).
+    """
+
+    info, totals, proms = store_load(store_dir, promoters=False)
+    new = {}
+    for pid, seq in items:
+        if pid in new:
+            raise ValueError("The promoter ID " + pid + " is given more than once.")
+        new[pid] = seq
+        #A promoter given twice would be counted once, fewer than with TSS_count.py.
+
+    db = promoter_db(store_dir)
+    old = promoter_get(db, new)
+    totals += delta_count(list(new.values()), info)
+    if len(old) > 0:
+        totals -= delta_count(list(old.values()), info)
+    info["promoters"] += len(new) - len(old)
+    with db:
+        db.executemany("INSERT OR REPLACE INTO promoters VALUES (?, ?)", new.items())
+        store_save(store_dir, info, totals)
+        #The promoters are committed after the totals are written (rolled back if the totals cannot be written).
+    db.close()
+    return len(new) - len(old), len(old)
+
+def store_remove(store_dir, ids):
+    """
+    To remove the promoters from the store.
+    :param store_dir: The directory of the store.
+    :param ids: Iterable of promoter IDs. IDs which are not in the store are ignored.
+    :return: The number of removed promoters.
+    """
+
+    info, totals, proms = store_load(store_dir, promoters=False)
+    db = promoter_db(store_dir)
+    old = promoter_get(db, set(ids))
+    if len(old) > 0:
+        totals -= delta_count(list(old.values()), info)
+    info["promoters"] -= len(old)
+    with db:
+        db.executemany("DELETE FROM promoters WHERE id = ?", ((pid,) for pid in old))
+        store_save(store_dir, info, totals)
+    db.close()
+    return len(old)
+
+def promoter_items(promoter_file):
+    """
+    To read the promoters with their IDs from the promoter file of TSS_count.py.
+    A line with only the sequence gets the ID of the file name and the line number (e.g. promoters.txt:12).
+    :param promoter_file: The promoter file (ID in the first column, sequence starting at -1000 at the end of each line).
+    :return: Generator of (promoter ID, promoter sequence).
+    """
+
+    with open(promoter_file, "rb") as fp:
+        for number, line in enumerate(fp, 1):
+            words = line.split()
+            if len(words) == 1:
+                yield "{}:{}".format(os.path.basename(promoter_file), number), words[0].decode("utf-8", "replace")
+            elif len(words) > 1:
+                yield words[0].decode("utf-8", "replace"), words[-1].decode("utf-8", "replace")
+
+def id_read(args):
+    """
+    To collect the promoter IDs from the command line.
+    :param args: List of promoter IDs or files of IDs (one ID in the first column of each line).
+    :return: List of promoter IDs.
+    """
+
+    ids = []
+    for item in args:
+        if os.path.isfile(item):
+            with open(item, "rt") as fi:
+                ids += [line.split()[0] for line in fi if line.strip() != ""]
+        else:
+            ids.append(item)
+    return ids
+
+def store_tables(store_dir, save_directory, pairs, name, counts_write=False):
+    """
+    To generate the IGI and PRI tables from the totals of the store.
+    :param store_dir: The directory of the store.
+    :param save_directory: The directory for saving the tables.
+    :param pairs: [(name of the table or None, index of the region, index of the region subtracted), ...]
+    :param name: The name in the file names (for_[name]_-200_-60.txt).
+    :param counts_write: If True, the counts are also written (the same files as TSS_count.py).
+    :return: List of the written tables.
+    """
+
+    info, totals, proms = store_load(store_dir, promoters=False)
+    bp, region_list = info["bp"], info["regions"]
+    stems = ["for_{}_{}_{}".format(name, start, end) for start, end in region_list]
+    #The names of the count files of TSS_count.py.
+    if counts_write:
+        TSS_count.count_write(totals, bp, region_list, name, save_directory, store_dir)
+
+    base_list = kmer_enumerate(bp)
+    igi_matrix = calc_igi_pri.calc_igi(totals, bp)
+    saved = []
+    for stem, counts, igi in zip(stems, totals, igi_matrix):
+        save_file = save_directory + "IGI_" + stem + ".txt"
+        calc_igi_pri.tableWrite(save_file, base_list, igi, counts == 0)
+        saved.append(save_file)
+    for table, i, j in pairs:
+        pri = calc_igi_pri.calc_pri(igi_matrix[i], igi_matrix[j])
+        if table is None:
+            table = "PRI_{}-{}".format(stems[i], stems[j])
+        save_file = save_directory + table + ".txt"
+        calc_igi_pri.tableWrite(save_file, base_list, pri, (igi_matrix[i] == 0) | (igi_matrix[j] == 0))
+        saved.append(save_file)
+    return saved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental store of k-mer counts of promoters.")
+    parser.add_argument("command", choices=["init", "add", "remove", "tables"])
+    parser.add_argument("store", help="The directory of the store.")
+    parser.add_argument("files", nargs="*", help="add: promoter files. remove: promoter IDs or files of IDs.")
+    parser.add_argument("--bp", type=int, default=TSS_count.bp, help="init: the number of bases (4 to 12).")
+    parser.add_argument("--region", action="append", type=TSS_count.region_parse, default=None,
+                        help="init: region to be counted (e.g. --region=-200:-60). Can be given more than once.")
+    parser.add_argument("--genome", help="add: FASTA file of the genome (with --annotation) instead of promoter files.")
+    parser.add_argument("--annotation", help="add: GFF, GTF or BED file of the TSSs.")
+    parser.add_argument("--feature", default=promoter_extract.feature, help="add: the feature of GFF or GTF files used as genes.")
+    parser.add_argument("--downstream", type=int, default=promoter_extract.downstream,
+                        help="add: the number of bases from the TSS to the end of the promoter.")
+    parser.add_argument("--pair", action="append", type=calc_igi_pri.pair_parse, default=[],
+                        help="tables: regions (numbers from 1) for PRI, e.g. 1:2 or FUI=3:1. Can be given more than once.")
+    parser.add_argument("--all-pairs", action="store_true", help="tables: PRI of all pairs of regions.")
+    parser.add_argument("--counts", action="store_true", help="tables: also write the counts (the same files as TSS_count.py).")
+    parser.add_argument("--name", default=None, help="tables: the name in the file names (default: the name of the store).")
+    parser.add_argument("--out", default=TSS_count.save_dir, help="tables: the directory for saving the tables.")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        region_list = args.region if args.region is not None else TSS_count.region_list
+        try:
+            store_init(args.store, args.bp, region_list)
+        except ValueError as e:
+            parser.error(str(e))
+        print(args.store, ": bp =", args.bp, ", regions =", region_list)
+
+    elif args.command == "add":
+        if args.genome is not None and args.annotation is not None:
+            items = ((item[3], seq) for item, seq in
+                     promoter_windows(args.genome, tss_read(args.annotation, args.feature), args.downstream))
+            try:
+                added, replaced = store_add(args.store, items)
+            except ValueError as e:
+                parser.error(str(e))
+        else:
+            added, replaced = 0, 0
+            for pfile in args.files:
+                try:
+                    a, r = store_add(args.store, promoter_items(pfile))
+                except ValueError as e:
+                    parser.error(pfile + ": " + str(e))
+                added += a
+                replaced += r
+        print(added, "promoters added,", replaced, "promoters replaced")
+
+    elif args.command == "remove":
+        print(store_remove(args.store, id_read(args.files)), "promoters removed")
+
+    else:
+        info, totals, proms = store_load(args.store, promoters=False)
+        pairs = list(args.pair)
+        if args.all_pairs:
+            n = len(info["regions"])
+            pairs += [(None, i, j) for i in range(n) for j in range(i + 1, n)]
+        if len(pairs) == 0 and len(info["regions"]) == 2:
+            pairs = [("PRI", 0, 1)]
+            #The same as calc_igi_pri.py with two count files.
+        if any(not (0 <= i < len(info["regions"]) and 0 <= j < len(info["regions"])) for table, i, j in pairs):
+            parser.error("The numbers of the regions must be from 1 to {}.".format(len(info["regions"])))
+
+        save_directory = os.path.join(args.out, "")
+        os.makedirs(save_directory, exist_ok=True)
+        name = args.name if args.name is not None else os.path.basename(os.path.normpath(args.store))
+        for save_file in store_tables(args.store, save_directory, pairs, name, args.counts):
+            print(os.path.basename(save_file))
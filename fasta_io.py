@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Streaming reader of FASTA files.
+
+Multi-record files and gzip-compressed files are supported.
+Each record is read in chunks of a fixed number of bases, so the memory usage does not depend on the length of the record.
+The sequences of the intervals in a BED file can be extracted in one pass.
+Only some records can be read (e.g. chrom_scan.py --chrom), with seeks if the file can be indexed (below).
+
+An uncompressed FASTA file can also be read at random with a line-offset index (the .fai format of samtools),
+so a slice of a chromosome is read with one seek without reading the rest of the file:
+    Chr1.fa -> Chr1.fa.fai (name<TAB>length<TAB>offset of the sequence<TAB>bases per line<TAB>bytes per line)
+The index is built at the first use and rebuilt when the FASTA file is newer than the index.
+"""
+
+import os
+import re
+import gzip
+
+
+def fasta_open(sequence_file):
+    """
+    To open the FASTA file (plain text or gzip) in text mode.
+    :param sequence_file: FASTA file.
+    :return: File object.
+    """
+
+    with open(sequence_file, "rb") as sf:
+        magic = sf.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(sequence_file, "rt")
+    return open(sequence_file, "rt")
+
+def record_name(header):
+    """
+    To extract the name of the record from the header line.
+    :param header: The header line (">Chr1 description").
+    :return: The name of the record (the first word after ">").
+    """
+
+    words = header[1:].split()
+    if len(words) == 0:
+        return ""
+    return words[0]
+
+def fasta_chunks(sequence_file, chunk_size, overlap=0, records=None):
+    """
+    To read the FASTA file record by record in chunks.
+    Consecutive chunks of a record share "overlap" bases,
+    so every window of (overlap + 1) bases is contained in exactly one chunk.
+    At least one chunk (possibly empty) is generated for each record.
+    :param sequence_file: FASTA file.
+    :param chunk_size: The maximum number of bases in a chunk.
+    :param overlap: The number of bases shared by consecutive chunks. (less than chunk_size)
+    :param records: Set of the record names to be read ("" for a sequence without a header line). (None for all records)
+                    If the FASTA file can be indexed, the records are read with seeks (index_chunks).
+                    Otherwise the lines of the other records are skipped, and the reading stops after the last of the records.
+    :return: Generator of (record name, position of the chunk in the record (0-based), sequence of the chunk).
+             The record name is "" for a sequence without a header line.
+    """
+
+    if chunk_size <= overlap:
+        raise ValueError("chunk_size must be larger than overlap.")
+
+    if records is not None:
+        try:
+            index = fai_read(sequence_file)
+        except ValueError:
+            index = None
+            #gzip-compressed files and sequences without a header line.
+        if index is not None:
+            yield from index_chunks(sequence_file, index, chunk_size, overlap, records)
+            return
+        remaining = set(records)
+        #The records which have not been read to the end.
+
+    name = None
+    skip = False
+    with fasta_open(sequence_file) as sf:
+        for line in sf:
+            if line.startswith(">"):
+                if name is not None and not skip:
+                    if first or size > overlap:
+                        yield name, start, "".join(pieces)
+                    if records is not None:
+                        remaining.discard(name)
+                        if len(remaining) == 0:
+                            return
+                            #The rest of the file has none of the records.
+                name = record_name(line)
+                skip = records is not None and name not in records
+                pieces, size, start, first = [], 0, 0, True
+                continue
+
+            if name is None:
+                name = ""
+                skip = records is not None and name not in records
+                pieces, size, start, first = [], 0, 0, True
+                #Sequence without a header line.
+
+            if skip:
+                continue
+            line = line.rstrip("\r\n")
+            pieces.append(line)
+            size += len(line)
+            while size >= chunk_size:
+                seq = "".join(pieces)
+                yield name, start, seq[:chunk_size]
+                seq = seq[chunk_size - overlap:]
+                start += chunk_size - overlap
+                pieces, size, first = [seq], len(seq), False
+
+        if name is not None and not skip:
+            if first or size > overlap:
+                yield name, start, "".join(pieces)
+            #The rest of the last record.
+
+def index_chunks(sequence_file, index, chunk_size, overlap, records):
+    """
+    fasta_chunks of the records with the index: each chunk is read with a seek (fasta_fetch),
+    so the other records are not read at all. The chunks are the same as those of fasta_chunks.
+    :param sequence_file: FASTA file (uncompressed).
+    :param index: The index of the FASTA file (return value of fai_read).
+    :param chunk_size: The maximum number of bases in a chunk.
+    :param overlap: The number of bases shared by consecutive chunks. (less than chunk_size)
+    :param records: Set of the record names to be read. Records which are not in the FASTA file are skipped.
+    :return: Generator of (record name, position of the chunk in the record (0-based), sequence of the chunk)
+             in the order of the file.
+    """
+
+    names = sorted((name for name in records if name in index), key=lambda name: index[name][1])
+    with open(sequence_file, "rb") as sf:
+        for name in names:
+            length = index[name][0]
+            pos = 0
+            while True:
+                start, seq = fasta_fetch(sf, index, name, pos, pos + chunk_size)
+                yield name, pos, seq
+                if pos + chunk_size >= length:
+                    break
+                pos += chunk_size - overlap
+
+def record_names(sequence_file):
+    """
+    To list the names of the records of the FASTA file, from the index if the file can be indexed.
+    :param sequence_file: FASTA file.
+    :return: List of the record names in the order of the file ("" for a sequence without a header line).
+    """
+
+    try:
+        return list(fai_read(sequence_file))
+    except ValueError:
+        pass
+        #gzip-compressed files and sequences without a header line.
+
+    names = []
+    with fasta_open(sequence_file) as sf:
+        for line in sf:
+            if line.startswith(">"):
+                names.append(record_name(line))
+            elif len(names) == 0 and line.strip() != "":
+                names.append("")
+    return names
+
+def bed_read(bed_file):
+    """
+    To read the intervals from the BED file.
+    :param bed_file: BED file (chromosome, start (0-based), end, name (optional), ...).
+    :return: List of (chromosome, start, end, name). The name is "chromosome_start-end" if the BED file has no name column.
+    """
+
+    regions = []
+    with open(bed_file, "rt") as bf:
+        for line in bf:
+            if line.strip() == "" or line.startswith(("#", "track", "browser")):
+                continue
+            cols = line.rstrip("\r\n").split("\t")
+            chrom, start, end = cols[0], int(cols[1]), int(cols[2])
+            if len(cols) > 3 and cols[3] not in ("", "."):
+                name = cols[3]
+            else:
+                name = "{}_{}-{}".format(chrom, start, end)
+            regions.append((chrom, start, end, name))
+    return regions
+
+def region_seqs(sequence_file, regions, chunk_size):
+    """
+    To extract the sequences of the regions in one pass over the FASTA file.
+    :param sequence_file: FASTA file.
+    :param regions: List of (chromosome, start (0-based), end, ...). The start may be negative and the end may exceed the chromosome.
+    :param chunk_size: The number of bases read at once.
+    :return: Generator of (region, start of the sequence, sequence) in the order of the FASTA file.
+             The sequence is clipped at both ends of the chromosome (the same as region_fetch),
+             so a region after the end of the chromosome gets an empty sequence starting at the end.
+             Regions on chromosomes which are not in the FASTA file are not generated.
+    """
+
+    by_chrom = {}
+    for region in regions:
+        by_chrom.setdefault(region[0], []).append(region)
+    for lst in by_chrom.values():
+        lst.sort(key=lambda region: region[1])
+
+    waiting = []
+    active = []
+    #[[region, start of the sequence, pieces of the sequence], ...]
+    end = 0
+    for name, pos, seq in fasta_chunks(sequence_file, chunk_size):
+        if pos == 0:
+            for region, start, pieces in active:
+                yield region, start, "".join(pieces)
+            #The regions which exceed the end of the previous chromosome.
+            for region in reversed(waiting):
+                yield region, end, ""
+            #The regions which start after the end of the previous chromosome (empty, as fasta_fetch).
+            waiting = list(reversed(by_chrom.get(name, [])))
+            active = []
+
+        end = pos + len(seq)
+        while len(waiting) > 0 and waiting[-1][1] < end:
+            region = waiting.pop()
+            active.append([region, max(region[1], 0), []])
+
+        rest = []
+        for item in active:
+            region, start, pieces = item
+            pieces.append(seq[max(start - pos, 0) : max(min(region[2], end) - pos, 0)])
+            if region[2] <= end:
+                yield region, start, "".join(pieces)
+            else:
+                rest.append(item)
+        active = rest
+
+    for region, start, pieces in active:
+        yield region, start, "".join(pieces)
+    for region in reversed(waiting):
+        yield region, end, ""
+
+def region_parse(region_text):
+    """
+    To convert a region given as text into the form of bed_read.
+    :param region_text: "chromosome:start-end" (1-based, both ends included, as samtools).
+    :return: (chromosome, start (0-based), end, name). The name is "chromosome_start-end".
+    """
+
+    m = re.fullmatch(r"(.+):([\d,]+)-([\d,]+)", region_text)
+    if m is None:
+        raise ValueError("Invalid region: " + region_text)
+    start, end = int(m.group(2).replace(",", "")), int(m.group(3).replace(",", ""))
+    if start < 1 or end < start:
+        raise ValueError("Invalid region: " + region_text)
+    return m.group(1), start - 1, end, "{}_{}-{}".format(m.group(1), start, end)
+
+def fai_name(sequence_file):
+    """
+    To generate the name of the index of the FASTA file.
+    :param sequence_file: FASTA file.
+    :return: The name of the index (.fai).
+    """
+
+    return sequence_file + ".fai"
+
+def fai_build(sequence_file, save=True):
+    """
+    To build the line-offset index of the FASTA file.
+    :param sequence_file: FASTA file (uncompressed).
+    :param save: If True, the index is saved next to the FASTA file.
+    :return: {record name: (length, offset of the sequence (bytes), bases per line, bytes per line)}
+    """
+
+    with open(sequence_file, "rb") as sf:
+        if sf.read(2) == b"\x1f\x8b":
+            raise ValueError("A gzip-compressed FASTA file cannot be indexed.")
+        sf.seek(0)
+
+        index = {}
+        name = None
+        offset = 0
+        for line in sf:
+            if line.startswith(b">"):
+                name = record_name(line.decode())
+                if name in index:
+                    raise ValueError("Duplicate record name: " + name)
+                index[name] = [0, offset + len(line), 0, 0]
+                short = False
+                #Only the last line of a record may be shorter than the others.
+            elif name is None:
+                if line.strip() != b"":
+                    raise ValueError("A FASTA file without a header line cannot be indexed.")
+            else:
+                entry = index[name]
+                bases = len(line.rstrip(b"\r\n"))
+                if bases > 0 and short:
+                    raise ValueError("The lines of {} have different lengths.".format(name))
+                if entry[2] == 0:
+                    entry[2], entry[3] = bases, len(line)
+                entry[0] += bases
+                short = bases == 0 or bases != entry[2] or len(line) != entry[3]
+            offset += len(line)
+
+    index = {name: tuple(entry) for name, entry in index.items()}
+    if save:
+        try:
+            temp = "{}.{}".format(fai_name(sequence_file), os.getpid())
+            with open(temp, "wt") as save_index:
+                for name, entry in index.items():
+                    print(name, *entry, sep="\t", file=save_index)
+            os.replace(temp, fai_name(sequence_file))
+            #Written under another name first, so that other processes never read a part of the index.
+        except OSError:
+            pass
+            #If the directory of the FASTA file is not writable, the index is built every time.
+    return index
+
+def fai_read(sequence_file):
+    """
+    To read the index of the FASTA file. If it does not exist or is older than the FASTA file, it is built.
+    :param sequence_file: FASTA file (uncompressed).
+    :return: {record name: (length, offset of the sequence (bytes), bases per line, bytes per line)}
+    """
+
+    index_file = fai_name(sequence_file)
+    if not os.path.exists(index_file) or os.path.getmtime(index_file) < os.path.getmtime(sequence_file):
+        return fai_build(sequence_file)
+
+    index = {}
+    with open(index_file, "rt") as fi:
+        for line in fi:
+            cols = line.rstrip("\r\n").split("\t")
+            index[cols[0]] = tuple(int(col) for col in cols[1:5])
+    return index
+
+def fasta_fetch(sf, index, chrom, start, end):
+    """
+    To read a slice of the record with a seek.
+    :param sf: The FASTA file opened in binary mode.
+    :param index: The index of the FASTA file (return value of fai_read).
+    :param chrom: The record name.
+    :param start: The start of the slice (0-based). It is clipped at 0.
+    :param end: The end of the slice. It is clipped at the end of the record. (None for the end of the record)
+    :return: The start of the sequence (after clipping), the sequence.
+    """
+
+    length, offset, linebases, linewidth = index[chrom]
+    start = min(max(start, 0), length)
+    end = length if end is None else min(max(end, start), length)
+    if end == start:
+        return start, ""
+
+    first = offset + start // linebases * linewidth + start % linebases
+    last = offset + (end - 1) // linebases * linewidth + (end - 1) % linebases
+    sf.seek(first)
+    seq = sf.read(last - first + 1)
+    return start, seq.decode().replace("\r", "").replace("\n", "")
+
+def region_fetch(sequence_file, regions):
+    """
+    To extract the sequences of the regions with the index (the same results as region_seqs).
+    :param sequence_file: FASTA file (uncompressed).
+    :param regions: List of (chromosome, start (0-based), end, ...). The start may be negative and the end may exceed the chromosome.
+    :return: Generator of (region, start of the sequence, sequence) in the order of the regions.
+             Regions on chromosomes which are not in the FASTA file are not generated.
+    """
+
+    index = fai_read(sequence_file)
+    with open(sequence_file, "rb") as sf:
+        for region in regions:
+            if region[0] in index:
+                start, seq = fasta_fetch(sf, index, region[0], region[1], region[2])
+                yield region, start, seq
+
+def region_extract(sequence_file, regions, chunk_size):
+    """
+    To extract the sequences of the regions, with the index (region_fetch) if the FASTA file can be indexed,
+    otherwise in one pass over the file (region_seqs, e.g. gzip-compressed files).
+    :param sequence_file: FASTA file.
+    :param regions: List of (chromosome, start (0-based), end, ...).
+    :param chunk_size: The number of bases read at once (without the index).
+    :return: Generator of (region, start of the sequence, sequence).
+    """
+
+    try:
+        fai_read(sequence_file)
+    except ValueError:
+        return region_seqs(sequence_file, regions, chunk_size)
+    return region_fetch(sequence_file, regions)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+"""
+2-bit coding of base sequences and rolling k-mer indices.
+
+The bases are coded in the order used by 8bp_all.txt and the score tables (A, T, G, C),
+so the index of a k-mer is equal to its line number in the enumeration of all k-mers.
+Mixed bases (N, lowercase letters, etc.) are coded as MIXED,
+and a window containing one of them gets the index 4 ** bp (the "no score" entry).
+"""
+
+import numpy as np
+
+BASES = "ATGC"
+#The order of bases in the k-mer enumeration.
+
+MIXED = 4
+#The code for mixed bases.
+
+MIN_BP = 4
+MAX_BP = 12
+#The range of the number of bases supported by the counting and scoring tools.
+#The dense arrays have 4 ** bp + 1 entries (16.7 M for 12 bases).
+
+code_table = np.full(256, MIXED, dtype=np.uint8)
+for code, base in enumerate(BASES):
+    code_table[ord(base)] = code
+#ASCII code -> 2-bit code
+#The complement of a code is "code ^ 1" (A <-> T, G <-> C).
+
+
+def seq_encode(sequence):
+    """
+    To convert the base sequence into an array of 2-bit codes.
+    :param sequence: The base sequence (str).
+    :return: numpy.ndarray of codes (A: 0, T: 1, G: 2, C: 3, others: MIXED).
+    """
+
+    return code_table[np.frombuffer(sequence.encode("ascii", "replace"), dtype=np.uint8)]
+
+def bp_check(bp):
+    """
+    To check the number of bases.
+    :param bp: The number of bases.
+    """
+
+    if not MIN_BP <= bp <= MAX_BP:
+        raise ValueError("The number of bases must be from {} to {} (given: {}).".format(MIN_BP, MAX_BP, bp))
+
+def kmer_enumerate(bp, start=0, stop=None):
+    """
+    To generate the k-mers in the order of their indices (the same order as 8bp_all.txt for 8 bases).
+    :param bp: The number of bases.
+    :param start: The first index.
+    :param stop: The index after the last one. (None for 4 ** bp)
+    :return: List of k-mers (str) with the indices from start to stop - 1.
+    """
+
+    if stop is None:
+        stop = 4 ** bp
+    index = np.arange(start, stop, dtype=np.int64)
+    codes = (index[:, None] >> (2 * np.arange(bp - 1, -1, -1, dtype=np.int64))) & 3
+    letters = np.frombuffer(BASES.encode("ascii"), dtype=np.uint8)[codes]
+    return letters.view("S{}".format(bp)).ravel().astype(str).tolist()
+
+def index_dtype(bp):
+    """
+    To choose the integer type which can hold every k-mer index and the "no score" entry.
+    :param bp: The number of bases.
+    :return: numpy dtype.
+    """
+
+    if 4 ** bp < 2 ** 32:
+        return np.uint32
+    return np.uint64
+
+def kmer_index(codes, bp):
+    """
+    To generate the k-mer indices of every window on both strands.
+    :param codes: numpy.ndarray of 2-bit codes (return value of seq_encode).
+    :param bp: The number of bases.
+    :return: numpy.ndarray of indices of the forward windows.
+    :return: numpy.ndarray of indices of the reverse complement of the windows.
+    """
+
+    dtype = index_dtype(bp)
+    n = codes.size - bp + 1
+    if n <= 0:
+        return np.zeros(0, dtype), np.zeros(0, dtype)
+
+    c = (codes & 3).astype(dtype)
+    fwd = np.zeros(n, dtype)
+    rev = np.zeros(n, dtype)
+    for j in range(bp):
+        fwd *= 4
+        fwd += c[j : j + n]
+        rev *= 4
+        rev += c[bp - 1 - j : bp - 1 - j + n] ^ 1
+    #The head of the reverse complement is the complement of the tail of the window.
+
+    mixed = np.concatenate(([0], np.cumsum(codes == MIXED)))
+    invalid = mixed[bp:] - mixed[:-bp] > 0
+    #Windows which contain mixed bases.
+    fwd[invalid] = 4 ** bp
+    rev[invalid] = 4 ** bp
+    return fwd, rev
+
+def kmer_forward(codes, bp):
+    """
+    To generate the k-mer indices of every forward window (without the reverse complement, for counting).
+    :param codes: numpy.ndarray of 2-bit codes (return value of seq_encode).
+    :param bp: The number of bases.
+    :return: numpy.ndarray of indices of the forward windows (the same as the first return value of kmer_index).
+    """
+
+    dtype = index_dtype(bp)
+    n = codes.size - bp + 1
+    if n <= 0:
+        return np.zeros(0, dtype)
+
+    c = (codes & 3).astype(dtype)
+    fwd = np.zeros(n, dtype)
+    for j in range(bp):
+        fwd *= 4
+        fwd += c[j : j + n]
+
+    mixed = np.concatenate(([0], np.cumsum(codes == MIXED)))
+    fwd[mixed[bp:] - mixed[:-bp] > 0] = 4 ** bp
+    #Windows which contain mixed bases.
+    return fwd
+
+def kmer_to_index(kmers, bp):
+    """
+    To convert k-mer strings into their indices.
+    :param kmers: List of k-mers (str).
+    :param bp: The number of bases.
+    :return: numpy.ndarray of indices. (4 ** bp for k-mers with mixed bases or a different length)
+    """
+
+    index = np.full(len(kmers), 4 ** bp, dtype=np.int64)
+    same = np.array([len(kmer) == bp for kmer in kmers], dtype=bool)
+    if not same.any():
+        return index
+
+    codes = seq_encode("".join(kmer for kmer in kmers if len(kmer) == bp)).reshape(-1, bp)
+    valid = (codes != MIXED).all(axis=1)
+    weight = 4 ** np.arange(bp - 1, -1, -1, dtype=np.int64)
+    part = (codes.astype(np.int64) * weight).sum(axis=1)
+    part[~valid] = 4 ** bp
+    index[same] = part
+    return index
+
+def index_array_generate(indexdict, bp, default="0"):
+    """
+    To convert the dictionary of scores into a dense array indexed by the k-mer index.
+    :param indexdict: The dictionary object (key: base sequence, value: score). (return value of index_dict_generate)
+    :param bp: The number of bases.
+    :param default: The value for k-mers which are not in the dictionary and for windows with mixed bases.
+    :return: numpy.ndarray (size: 4 ** bp + 1) of the values of the dictionary.
+    """
+
+    kmers = list(indexdict)
+    array = np.full(4 ** bp + 1, default, dtype=object)
+    index = kmer_to_index(kmers, bp)
+    valid = index < 4 ** bp
+    array[index[valid]] = np.array([indexdict[kmer] for kmer in kmers], dtype=object)[valid]
+    array[4 ** bp] = default
+    return array
@@ -9,7 +9,7 @@ Input: The scoring data of the base sequence
 Output: The position and value of the detected peak
 
 At the command prompt, enter the following.
-    python3 peak_find_SG.py [Scored by IGI1] [Scored by IGI2] [Scored by PRI]...
+    python3 peak_find_SG.py [Scored by IGI1] [Scored by IGI2] [Scored by PRI]... [--block 1000000]
 
 For example,
     python3 peak_find_SG.py Chr1_scan_IGI200_60_forward.txt Chr1_scan_IGI750_450_forward.txt Chr1_scan_PRI200_60-750_450_forward.txt
@@ -22,10 +22,15 @@ The peak is filtered by
 ・ Integration of peaks at close distances
 
 The scored file is assumed to be generated by chrom_scan.py.
+With --block, the tracks are read and smoothed block by block (the same peaks with less memory).
+With --N, --D, --th-PRI, --th-IGI or --tougou (comma-separated values), the peaks are detected for all combinations
+of the parameters (sweep mode), and the numbers of peaks are written to peak_sweep_summary.txt.
+With --derive-pri, only the IGI files are given, and PRI is calculated from them (IGI1 - IGI2, 0 if either is 0):
+    python3 peak_find_SG.py Chr1_scan_IGI200_60_forward.txt Chr1_scan_IGI750_450_forward.txt --derive-pri
 
 
 If a file with the same name as the output file already exists, it will be overwritten without warning.
-If you want to change the output directory, enter the variable ("save_dir") below.
+If you want to change the output directory, enter the variable ("save_dir") below, or give "--out DIR" on the command line.
 """
 
 save_dir = r""
@@ -36,9 +41,14 @@ save_dir = r""
 
 import os
 import sys
-import re
+import argparse
+import itertools
+from collections import deque
 import numpy as np 
 from scipy import signal
+from track_io import trackInfo, trackRead, trackBlocks
+from score_table import pri_score_name
+from calc_igi_pri import calc_pri
 import time
 
 t1=time.time()
@@ -60,44 +70,33 @@ th_IGI = 0
 tougou = 100
 #The width for peak integration (bp).
 
-def infoExt(scanFile):
-    """
-    To extract information from the file scored by chrom_scan.py.
-    :param scanFile: The file scored by chrom_scan.py.
-    :return: Chromosome number, Direction, Score name.
-    """
+search_block = 100000
+#The number of provisional peaks whose smoothed ranges are searched at once.
+
+stream_block = 0
+#If > 0, the tracks are read and smoothed in blocks of this number of positions (streaming mode, --block),
+#so that the whole tracks are not kept in memory. It must be N or more.
 
-    with open(scanFile, "rt") as sf:
-        for line in sf:
-            if re.match("Chromosome", line):
-                chrom = re.search("([cC]hr\d+)\D?", line).group(1)
-            elif re.match("Score", line):
-                scName = re.search("Score:\s(.+)\n", line).group(1)
-            elif re.match("Strand", line):
-                strand = re.search("Strand:\s(.+)\n", line).group(1)
-            elif re.match("\d+", line):
-                break
-    return chrom, scName, strand
-
-def scoreExt(scanFile):
+def tracksRead(priFile, igiFile1, igiFile2, info=None):
     """
-    To generate an array of scores from the file scored by chrom_scan.py.
-    Also returns the top location.
-    :param scanFile: The file scored by chrom_scan.py.
-    :return: numpy.ndarray of locations and values.
+    To read the PRI track and the two IGI tracks.
+    If priFile is None, PRI is derived from the IGI tracks position by position (calc_igi_pri.calc_pri:
+    IGI1 - IGI2, or 0 if either is 0), which is the same as the track scored by the PRI table calculated from the IGI tables.
+    :param priFile: The file scored by PRI, or None.
+    :param igiFile1: The file scored by IGI Part 1
+    :param igiFile2: The file scored by IGI Part 2
+    :param info: The header of the PRI file (or of igiFile1 if priFile is None) (return value of trackInfo).
+    :return: First PRI location, numpy.ndarray of PRI, IGI1 and IGI2 (raw data).
     """
 
-    start = ""
-    score = []
-    with open(scanFile, "rt") as sf:
-        for line in sf:
-            if re.match("\d", line):
-                line = line.replace("\n", "").split("\t")
-                score.append(float(line[1]))
-                if start == "":
-                    start = int(line[0])
-    score = np.array(score)
-    return start, score
+    if priFile is None:
+        start, IGI1 = trackRead(igiFile1, info)
+        start, IGI2 = trackRead(igiFile2)
+        return start, calc_pri(IGI1, IGI2), IGI1, IGI2
+    start, PRI = trackRead(priFile, info)
+    start, IGI1 = trackRead(igiFile1)
+    start, IGI2 = trackRead(igiFile2)
+    return start, PRI, IGI1, IGI2
 
 def sgfilter(ndarray, window, degree):
     """
@@ -114,6 +113,21 @@ def sgfilter(ndarray, window, degree):
     #smoothed data
     return ys
 
+def peak_margin(window, integration):
+    """
+    To calculate the margin (bases) which peakFind and peakUnite need on both sides of an interval,
+    so that the peaks in the interval are the same as those of the whole chromosome.
+    The provisional peaks are searched (q*2) bases inside the track, the peak is within q bases of the provisional peak,
+    and a peak after peakUnite depends on the peaks within (integration * 2) bases of it.
+    :param window: Smoothing width (odd number)
+    :param integration: Range to combine peaks (the window of peakUnite)
+    :return: The margin (bases).
+    """
+
+    q = int((window - 1) / 2)
+    #Peak search range (one side)
+    return integration * 2 + q * 3
+
 def peakFind(rawPRI, IGI1, IGI2, window, degree, threshold_PRI, threshold_IGI, start):
     """
     Apply an SG-filter to the input data and return the position of the peak
@@ -124,7 +138,7 @@ def peakFind(rawPRI, IGI1, IGI2, window, degree, threshold_PRI, threshold_IGI, s
     :param degree: Order used for smoothing
     :param threshold_PRI: PRI threshold at peak detection
     :param threshold_IGI: IGI threshold at peak detection
-    :param start: First PRI location (return value of scoreExt)
+    :param start: First PRI location (return value of trackRead)
     :return: numpy.ndarray of peak positions and values
     """
 
@@ -137,29 +151,132 @@ def peakFind(rawPRI, IGI1, IGI2, window, degree, threshold_PRI, threshold_IGI, s
     q = int((window - 1) / 2)
     #Peak search range (one side)
 
-    peakI = []
-    #To store indexes of peaks.
-    for i in range(q*2, ps.size - 1 - q*2 + 1):
-        #Search for peaks only in indexes with valid smoothing values.
-        if pd[i] >= 0 and pd[i+1] < 0:
-            #"i" is the provisional position of peak.
-            peak_index = ps[i-q : i+q+1].argmax() + i - q
-            #Put the maximum value in the smoothed range as the peak.
-            #The index of peak in original array.
-            if ps[peak_index] > threshold_PRI and IGI1[peak_index] > threshold_IGI and IGI2[peak_index] > threshold_IGI:
-                if len(peakI) == 0 or peak_index != peakI[-1]:
-                    peakI.append(peak_index)
-                    #If the index of peak does not overlap with the previous one, add it to the list.
-    del IGI1, IGI2
+    peakI = peakSearch(ps, pd, IGI1, IGI2, q, q*2, ps.size - q*2, threshold_PRI, threshold_IGI)
+    #Search for peaks only in indexes with valid smoothing values.
+    del pd, IGI1, IGI2
     peak = ps[peakI]
     del ps
-    peakPos = np.array(peakI) + start
+    peakPos = peakI + start
     return peakPos, peak
 
-def peakUnite(peak_x, peak_y, window):
+def peakSearch(ps, pd, IGI1, IGI2, q, first, last, threshold_PRI, threshold_IGI):
+    """
+    To search for the peaks of the smoothed PRI between the indexes "first" and "last" - 1.
+    :param ps: Smoothed PRI (numpy.ndarray)
+    :param pd: First derivative of smoothed PRI (numpy.ndarray)
+    :param IGI1: Smoothed IGI (numpy.ndarray) Part 1
+    :param IGI2: Smoothed IGI (numpy.ndarray) Part 2
+    :param q: Peak search range (one side)
+    :param first: The first index searched (q*2 or more).
+    :param last: The end of indexes searched (ps.size - q*2 or less).
+    :param threshold_PRI: PRI threshold at peak detection
+    :param threshold_IGI: IGI threshold at peak detection
+    :return: numpy.ndarray of indexes of peaks.
+    """
+
+    candI = peakCandidates(ps, pd, q, first, last)
+    select = peakFilter(candI, ps[candI], IGI1[candI], IGI2[candI], threshold_PRI, threshold_IGI)
+    return candI[select]
+
+def peakCandidates(ps, pd, q, first, last):
+    """
+    To search for the provisional peaks of the smoothed PRI (before the thresholds).
+    :param ps: Smoothed PRI (numpy.ndarray)
+    :param pd: First derivative of smoothed PRI (numpy.ndarray)
+    :param q: Peak search range (one side)
+    :param first: The first index searched (q*2 or more).
+    :param last: The end of indexes searched (ps.size - q*2 or less).
+    :return: numpy.ndarray of indexes of the maximum values in the smoothed ranges of the provisional peaks.
+    """
+
+    if last > first:
+        candI = np.flatnonzero((pd[first:last] >= 0) & (pd[first+1:last+1] < 0)) + first
+        #"candI" are the provisional positions of peaks.
+    else:
+        candI = np.zeros(0, dtype=np.int64)
+
+    peakI = np.zeros(candI.size, dtype=np.int64)
+    if candI.size > 0:
+        windows = np.lib.stride_tricks.sliding_window_view(ps, q*2 + 1)
+        #windows[i - q] is the smoothed range ps[i-q : i+q+1] (a view, not a copy).
+    for b in range(0, candI.size, search_block):
+        part = candI[b:b + search_block]
+        peakI[b:b + search_block] = windows[part - q].argmax(axis=1) + part - q
+    #Put the maximum value in the smoothed range as the peak.
+    #The index of peak in original array.
+    return peakI
+
+def peakFilter(peakI, peak, IGI1, IGI2, threshold_PRI, threshold_IGI):
+    """
+    To filter the provisional peaks by the thresholds.
+    :param peakI: numpy.ndarray of indexes of provisional peaks (return value of peakCandidates)
+    :param peak: Smoothed PRI at the provisional peaks
+    :param IGI1: Smoothed IGI at the provisional peaks Part 1
+    :param IGI2: Smoothed IGI at the provisional peaks Part 2
+    :param threshold_PRI: PRI threshold at peak detection
+    :param threshold_IGI: IGI threshold at peak detection
+    :return: numpy.ndarray of the numbers (in peakI) of the peaks.
+    """
+
+    select = np.flatnonzero((peak > threshold_PRI) & (IGI1 > threshold_IGI) & (IGI2 > threshold_IGI))
+    if select.size > 0:
+        select = select[np.r_[True, peakI[select[1:]] != peakI[select[:-1]]]]
+        #If the index of peak overlaps with the previous one, it is removed.
+    return select
+
+def peakFind_stream(priFile, igiFile1, igiFile2, window, degree, threshold_PRI, threshold_IGI, start, block, info=None):
+    """
+    peakFind reading the tracks in blocks (streaming mode). The result is the same as peakFind.
+    Each block is smoothed with (window - 1) bases on both sides, so that the smoothed values and the peak search range
+    of the positions in the block are the same as those of the whole track.
+    :param priFile: The file scored by PRI. If None, PRI is derived from the IGI files (see tracksRead).
+    :param igiFile1: The file scored by IGI Part 1
+    :param igiFile2: The file scored by IGI Part 2
+    :param window: Smoothing width (odd number)
+    :param degree: Order used for smoothing
+    :param threshold_PRI: PRI threshold at peak detection
+    :param threshold_IGI: IGI threshold at peak detection
+    :param start: First PRI location (return value of trackInfo)
+    :param block: The number of positions in a block ("window" or more).
+    :param info: The header of the PRI file (return value of trackInfo). Not used if priFile is None.
+    :return: numpy.ndarray of peak positions and values
+    """
+
+    q = int((window - 1) / 2)
+    #Peak search range (one side)
+
+    peakI = []
+    peak = []
+    #To store indexes and values of peaks of each block.
+    previous = -1
+    #The index of the last peak (a peak can be found again in the next block).
+    priBlocks = trackBlocks(priFile, block, q*2, info) if priFile is not None else itertools.repeat(None)
+    blocks = zip(priBlocks, trackBlocks(igiFile1, block, q*2), trackBlocks(igiFile2, block, q*2))
+    for priBlock, (lower, first, last, rawIGI1), (_, _, _, rawIGI2) in blocks:
+        rawPRI = priBlock[3] if priBlock is not None else calc_pri(rawIGI1, rawIGI2)
+        ps = signal.savgol_filter(rawPRI, window, degree)
+        pd = signal.savgol_filter(rawPRI, window, degree, deriv=1)
+        IGI1 = sgfilter(rawIGI1, window, degree)
+        IGI2 = sgfilter(rawIGI2, window, degree)
+        index = peakSearch(ps, pd, IGI1, IGI2, q, max(first, q*2) - lower, min(last, lower + ps.size - q*2) - lower,
+                           threshold_PRI, threshold_IGI)
+        #Only the indexes in the block (and in the valid range of the whole track) are searched.
+        if index.size > 0 and index[0] + lower == previous:
+            index = index[1:]
+        if index.size > 0:
+            peakI.append(index + lower)
+            peak.append(ps[index])
+            previous = index[-1] + lower
+
+    if len(peakI) == 0:
+        return np.zeros(0, dtype=np.int64) + start, np.zeros(0)
+    return np.concatenate(peakI) + start, np.concatenate(peak)
+
+def peakUnite_pairwise(peak_x, peak_y, window):
     """
     Input: peak position
     Output: merges and returns peaks at close distances
+    (compares every peak with all peaks, for peak positions which are not sorted)
     :param peak_x: Peak position (generated by peakFind)
     :param peak_y: Peak value (generated by peakFind)
     :param window: Range to combine peaks
@@ -187,23 +304,121 @@ def peakUnite(peak_x, peak_y, window):
                 #When there is no overlap, add the peak to the list.
     return np.array(resultX), np.array(resultY)
 
-def save_generate(save_directory, chrom, orientation):
+def peakUnite(peak_x, peak_y, window):
+    """
+    Input: peak position
+    Output: merges and returns peaks at close distances
+    The peaks sorted by position (output of peakFind) are merged in one sweep, with the same result as peakUnite_pairwise.
+    :param peak_x: Peak position (generated by peakFind)
+    :param peak_y: Peak value (generated by peakFind)
+    :param window: Range to combine peaks
+    :return: Integrated peak position (numpy.ndarray)
+    """
+
+    if peak_x.size > 1 and (np.diff(peak_x) < 0).any():
+        return peakUnite_pairwise(peak_x, peak_y, window)
+        #Not sorted.
+
+    lower = np.searchsorted(peak_x, peak_x - window, side="left").tolist()
+    upper = np.searchsorted(peak_x, peak_x + window, side="right").tolist()
+    #The peaks within a distance of "window" bases from each peak are lower[i] to upper[i] - 1.
+    ys = peak_y.tolist()
+
+    resultI = []
+    #To store indexes of integrated peaks.
+    candidates = deque()
+    #Indexes in the range whose values are decreasing. The first one is the maximum (the leftmost one of the same values).
+    j = 0
+    for i in range(len(ys)):
+        while j < upper[i]:
+            while len(candidates) > 0 and ys[candidates[-1]] < ys[j]:
+                candidates.pop()
+            candidates.append(j)
+            j += 1
+        while candidates[0] < lower[i]:
+            candidates.popleft()
+        m = candidates[0]
+        #Choose only the maximum value of peaks within the range.
+        if len(resultI) == 0 or peak_x[m] != peak_x[resultI[-1]]:
+            resultI.append(m)
+            #The maximum moves only forward, so an overlap is always with the last peak.
+    return np.array([peak_x[m] for m in resultI]), np.array([peak_y[m] for m in resultI])
+
+def peakSweep(rawPRI, rawIGI1, rawIGI2, start, windows, degrees, thresholds_PRI, thresholds_IGI, integrations=None):
+    """
+    peakFind and peakUnite for all combinations of the parameters (sweep mode).
+    The tracks are smoothed once for each (window, degree), and only the provisional peaks and the smoothed values at them
+    are kept for the thresholds and the integration.
+    :param rawPRI: Raw data of PRI value (numpy.ndarray)
+    :param rawIGI1: Raw data of IGI value (numpy.ndarray) Part 1
+    :param rawIGI2: Raw data of IGI value (numpy.ndarray) Part 2
+    :param start: First PRI location (return value of trackRead)
+    :param windows: List of smoothing widths (odd numbers)
+    :param degrees: List of orders used for smoothing
+    :param thresholds_PRI: List of PRI thresholds
+    :param thresholds_IGI: List of IGI thresholds
+    :param integrations: List of widths for peak integration. If None, the smoothing width (the same as the normal mode).
+    :return: Generator of ((window, degree, threshold_PRI, threshold_IGI, integration), peak positions, peak values)
+    """
+
+    for window in windows:
+        q = int((window - 1) / 2)
+        #Peak search range (one side)
+        for degree in degrees:
+            ps = signal.savgol_filter(rawPRI, window, degree)
+            pd = signal.savgol_filter(rawPRI, window, degree, deriv=1)
+            candI = peakCandidates(ps, pd, q, q*2, ps.size - q*2)
+            candP = ps[candI]
+            del ps, pd
+            candIGI1 = sgfilter(rawIGI1, window, degree)[candI]
+            candIGI2 = sgfilter(rawIGI2, window, degree)[candI]
+            #The smoothed values at the provisional peaks.
+
+            for threshold_PRI in thresholds_PRI:
+                for threshold_IGI in thresholds_IGI:
+                    select = peakFilter(candI, candP, candIGI1, candIGI2, threshold_PRI, threshold_IGI)
+                    peakPos = candI[select] + start
+                    peak = candP[select]
+                    for integration in (integrations if integrations is not None else [window]):
+                        yield ((window, degree, threshold_PRI, threshold_IGI, integration),) + peakUnite(peakPos, peak, integration)
+
+def grid_int(text):
+    """
+    To parse the comma-separated integers of the command line (e.g. 101,151,201).
+    :param text: The argument.
+    :return: List of integers.
+    """
+
+    return [int(item) for item in text.split(",")]
+
+def grid_float(text):
+    """
+    To parse the comma-separated numbers of the command line (e.g. 0,0.1,0.2).
+    :param text: The argument.
+    :return: List of numbers.
+    """
+
+    return [float(item) for item in text.split(",")]
+
+def save_generate(save_directory, chrom, orientation, suffix=""):
     """
     To generate output files (forward and reverse).
     :param save_directory: The directory for saving output files.
     :param chrom: The chromosome number.
     :param orientation: forward or reverse.
+    :param suffix: Added to the names (the parameters in the sweep mode).
     :return: Names of output files.
     """
     
-    saveFile = save_directory + "{}_peak_{}.txt".format(chrom, orientation)
+    saveFile = save_directory + "{}_peak_{}{}.txt".format(chrom, orientation, suffix)
     return saveFile
 
-def saveWrite(save_file, chrom, strand, window, degree, threshold_PRI, threshold_IGI, integration, *arg):
+def saveWrite(save_file, chrom, score, strand, window, degree, threshold_PRI, threshold_IGI, integration, *arg):
     """
     To write basic information to the output file.
     :param save_file: The output file.
     :param chrom: Chromosome number.
+    :param score: The name of score.
     :param strand: The chain.（forward or reverse）
     :param window: The width for smoothing.
     :param degree: Order used for smoothing
@@ -223,77 +438,143 @@ def saveWrite(save_file, chrom, strand, window, degree, threshold_PRI, threshold
         print("PRI threshold: {}\nIGI threshold: {}\nPeak Integration: {}".format(threshold_PRI, threshold_IGI, integration), file=save)
         print("\nPosition", "Score", sep="\t", file=save)
 
-inputs = sys.argv
-if len(inputs) < 4 or (len(inputs) - 1) % 3 != 0:
-    print('Input scored chromosome file, (one PRI file, two IGI files) * n as command line arguments.')
-    quit()
-
-PRI_F = []
-PRI_R = []
-IGI_F = []
-IGI_R = []
-for f in inputs[1:]:
-    fn = os.path.basename(f)
-    if "PRI" in fn:
-        if "forward" in fn:
-            PRI_F.append(f)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extraction of PRI peaks. READ manual.txt BEFORE USE.")
+    parser.add_argument("files", nargs="*", help="Scored chromosome files, (one PRI file, two IGI files) * n.")
+    parser.add_argument("--block", type=int, default=stream_block,
+                        help="Read and smooth the tracks in blocks of this number of positions (0: the whole tracks at once).")
+    parser.add_argument("--N", type=grid_int, default=None, help="Sweep mode: smoothing widths, e.g. 101,151,201.")
+    parser.add_argument("--D", type=grid_int, default=None, help="Sweep mode: orders used for smoothing, e.g. 1,2.")
+    parser.add_argument("--th-PRI", type=grid_float, default=None, help="Sweep mode: PRI thresholds, e.g. 0,0.1.")
+    parser.add_argument("--th-IGI", type=grid_float, default=None, help="Sweep mode: IGI thresholds, e.g. 0,0.1.")
+    parser.add_argument("--tougou", type=grid_int, default=None,
+                        help="Sweep mode: widths for peak integration (default: the smoothing width, the same as the normal mode).")
+    parser.add_argument("--derive-pri", action="store_true",
+                        help="Input (two IGI files) * n, and PRI is derived from them (IGI1 - IGI2) instead of reading the PRI file.")
+    parser.add_argument("--out", default=save_dir, help="The directory for saving output files.")
+    args = parser.parse_args()
+    save_dir = os.path.join(args.out, "")
+    os.makedirs(save_dir, exist_ok=True)
+    inputs = [__file__] + args.files
+    if args.derive_pri:
+        if len(inputs) < 3 or (len(inputs) - 1) % 2 != 0 or any("PRI" in os.path.basename(f) for f in args.files):
+            print('Input scored chromosome file, (two IGI files) * n as command line arguments.')
+            quit()
+    elif len(inputs) < 4 or (len(inputs) - 1) % 3 != 0:
+        print('Input scored chromosome file, (one PRI file, two IGI files) * n as command line arguments.')
+        quit()
+    if 0 < args.block < N:
+        parser.error("--block must be {} (N) or more.".format(N))
+
+    sweep = any(item is not None for item in (args.N, args.D, args.th_PRI, args.th_IGI, args.tougou))
+    if sweep:
+        grid = [args.N or [N], args.D or [D], args.th_PRI or [th_PRI], args.th_IGI or [th_IGI]]
+        if args.block > 0:
+            parser.error("The sweep mode (--N, --D, --th-PRI, --th-IGI, --tougou) reads the whole tracks (without --block).")
+        if any(window % 2 == 0 or degree >= window for window in grid[0] for degree in grid[1]):
+            parser.error("The smoothing widths must be odd numbers larger than the orders.")
+        summary = save_dir + "peak_sweep_summary.txt"
+        with open(summary, "wt") as s:
+            print(__file__, *args.files, sep="\n", file=s)
+            print("\nChromosome", "Strand", "Window Size", "Degree", "PRI threshold", "IGI threshold", "Peak Integration", "Peaks",
+                  sep="\t", file=s)
+
+    PRI_F = []
+    PRI_R = []
+    IGI_F = []
+    IGI_R = []
+    for f in inputs[1:]:
+        fn = os.path.basename(f)
+        if "PRI" in fn:
+            if "forward" in fn:
+                PRI_F.append(f)
+            else:
+                PRI_R.append(f)
+        elif "IGI" in fn:
+            if "forward" in fn:
+                IGI_F.append(f)
+            else:
+                IGI_R.append(f)
+
+    if args.derive_pri:
+        PRI_F = [None] * (len(IGI_F) // 2)
+        PRI_R = [None] * (len(IGI_R) // 2)
+        #PRI is derived from the IGI files.
+
+    flst = []
+    for i in range(len(PRI_F)):
+        flst.append(PRI_F[i])
+        flst.append(IGI_F[i*2])
+        flst.append(IGI_F[i*2+1])
+    for i in range(len(PRI_R)):
+        flst.append(PRI_R[i])
+        flst.append(IGI_R[i*2])
+        flst.append(IGI_R[i*2+1])
+
+    del inputs, PRI_F, PRI_R, IGI_F, IGI_R
+
+    for i in range(0, len(flst), 3):
+        pri = flst[i]
+        igi1 = flst[i+1]
+        igi2 = flst[i+2]
+        print("-"*50)
+        print(os.path.basename(pri) if pri is not None else "PRI = IGI1 - IGI2")
+        print(os.path.basename(igi1))
+        print(os.path.basename(igi2))
+    
+        if pri is not None:
+            info = trackInfo(pri)
+            chrom, score, ori = info["chromosome"], info["score"], info["strand"]
         else:
-            PRI_R.append(f)
-    elif "IGI" in fn:
-        if "forward" in fn:
-            IGI_F.append(f)
+            info = trackInfo(igi1)
+            chrom, score, ori = info["chromosome"], pri_score_name(info["score"], trackInfo(igi2)["score"]), info["strand"]
+        sources = [item for item in (pri, igi1, igi2) if item is not None]
+
+        if sweep:
+            start, PRI, IGI1, IGI2 = tracksRead(pri, igi1, igi2, info)
+            print('"trackRead complete"')
+
+            for (window, degree, thP, thI, integration), peakPos, peak in peakSweep(PRI, IGI1, IGI2, start, *grid, args.tougou):
+                suffix = "_N{}_D{}_PRI{:g}_IGI{:g}_U{}".format(window, degree, thP, thI, integration)
+                save = save_generate(save_dir, chrom, ori, suffix)
+                saveWrite(save, chrom, score, ori, window, degree, thP, thI, integration, __file__, *sources)
+                with open(save, "at") as s:
+                    s.writelines("{}\t{}\n".format(pos, p) for pos, p in zip(peakPos, peak))
+                with open(summary, "at") as s:
+                    print(chrom, ori, window, degree, "{:g}".format(thP), "{:g}".format(thI), integration, peakPos.size, sep="\t", file=s)
+                print(os.path.basename(save), peakPos.size)
+            del PRI, IGI1, IGI2
+            continue
+
+        save = save_generate(save_dir, chrom, ori)
+        saveWrite(save, chrom, score, ori, N, D, th_PRI, th_IGI, tougou, __file__, *sources)
+
+        if args.block > 0:
+            peakPos, peak = peakFind_stream(pri, igi1, igi2, N, D, th_PRI, th_IGI, info.get("start", 0), args.block, info)
+            print('"peakFind complete"')
         else:
-            IGI_R.append(f)
-
-flst = []
-for i in range(len(PRI_F)):
-    flst.append(PRI_F[i])
-    flst.append(IGI_F[i*2])
-    flst.append(IGI_F[i*2+1])
-for i in range(len(PRI_R)):
-    flst.append(PRI_R[i])
-    flst.append(IGI_R[i*2])
-    flst.append(IGI_R[i*2+1])
-
-del inputs, PRI_F, PRI_R, IGI_F, IGI_R
-
-for i in range(0, len(flst), 3):
-    pri = flst[i]
-    igi1 = flst[i+1]
-    igi2 = flst[i+2]
-    print("-"*50)
-    print(os.path.basename(pri))
-    print(os.path.basename(igi1))
-    print(os.path.basename(igi2))
-    
-    chrom, score, ori = infoExt(pri)
-    save = save_generate(save_dir, chrom, ori)
-    saveWrite(save, chrom, ori, N, D, th_PRI, th_IGI, tougou, __file__, pri, igi1, igi2)
-
-    start, PRI = scoreExt(pri)
-    start, IGI1 = scoreExt(igi1)
-    start, IGI2 = scoreExt(igi2)
-    print('"scoreExt complete"')
-
-    IGI1 = sgfilter(IGI1, N, D)
-    IGI2 = sgfilter(IGI2, N, D)
-    print('"S-G filter complete"')
-
-    peakPos, peak = peakFind(PRI, IGI1, IGI2, N, D, th_PRI, th_IGI, start)
-    del PRI, IGI1, IGI2
-    print('"peakFind complete"')
-
-    peakPos, peak = peakUnite(peakPos, peak, N)
-    print('"peakUnite complete"')
-
-    for pos, p in zip(peakPos, peak):
-        with open(save, "at") as s:
-            print(pos, p, sep="\t", file=s)
-
-t2=time.time()
-t=t2-t1
-if t > 60:
-    print('time:'+str(t/60)+'(min)')
-else:
-    print('time:'+str(t)+'(s)')
-#To display the time required for processing.
\ No newline at end of file
+            start, PRI, IGI1, IGI2 = tracksRead(pri, igi1, igi2, info)
+            print('"trackRead complete"')
+
+            IGI1 = sgfilter(IGI1, N, D)
+            IGI2 = sgfilter(IGI2, N, D)
+            print('"S-G filter complete"')
+
+            peakPos, peak = peakFind(PRI, IGI1, IGI2, N, D, th_PRI, th_IGI, start)
+            del PRI, IGI1, IGI2
+            print('"peakFind complete"')
+
+        peakPos, peak = peakUnite(peakPos, peak, N)
+        print('"peakUnite complete"')
+
+        for pos, p in zip(peakPos, peak):
+            with open(save, "at") as s:
+                print(pos, p, sep="\t", file=s)
+
+    t2=time.time()
+    t=t2-t1
+    if t > 60:
+        print('time:'+str(t/60)+'(min)')
+    else:
+        print('time:'+str(t)+'(s)')
+    #To display the time required for processing.
\ No newline at end of file
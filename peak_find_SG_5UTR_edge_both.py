@@ -9,16 +9,18 @@ Input: The file obtained by scoring the nucleotide sequence with a 5UTR score (g
 Output: The position and value of both ends of the detected peak.
 
 At the command prompt, enter the following.
-    python3 peak_find_SG_5UTR_edge_both.py [Scored by 5'UTR score 1] [Scored by 5'UTR score 2]...
+    python3 peak_find_SG_5UTR_edge_both.py [Scored by 5'UTR score 1] [Scored by 5'UTR score 2]... [--block 1000000]
 
 For example,
     python3 peak_find_SG_5UTR_edge_both.py Chr1_scan_5UTR-IGI750_450_forward.txt
 
 The peak is filtered by threshold of peak value.
+With --block, the tracks are read and smoothed block by block (the same peaks with less memory).
+With --partial, for the tracks of chrom_scan.py --bed or --region, the peaks whose left end is before the track are not written.
 
 
 If a file with the same name as the output file already exists, it will be overwritten without warning.
-If you want to change the output directory, enter the variable ("save_dir") below.
+If you want to change the output directory, enter the variable ("save_dir") below, or give "--out DIR" on the command line.
 """
 
 save_dir = r""
@@ -29,9 +31,10 @@ save_dir = r""
 
 import os
 import sys
-import re
+import argparse
 import numpy as np 
 from scipy import signal
+from track_io import trackInfo, trackRead, trackBlocks
 import time
 
 t1=time.time()
@@ -50,42 +53,29 @@ th = 0    #The threshold of peak value.
 
 #tougou = 50 #The width for peak integration (bp).
 
-def infoExt(scanFile):
-    """
-    To extract information from the file scored by chrom_scan.py.
-    :param scanFile: The file scored by chrom_scan.py.
-    :return: Chromosome number, Direction, Score name.
-    """
+stream_block = 0
+#If > 0, the tracks are read and smoothed in blocks of this number of positions (streaming mode, --block),
+#so that the whole tracks are not kept in memory. It must be N or more.
 
-    with open(scanFile, "rt") as sf:
-        for line in sf:
-            if re.match("Chromosome", line):
-                chrom = re.search("([cC]hr\d+)\D*", line).group(1)
-            elif re.match("Score", line):
-                scName = re.search("Score:\s(.+)\n", line).group(1)
-            elif re.match("Strand", line):
-                strand = re.search("Strand:\s(.+)\n", line).group(1)
-            elif re.match("\d+", line):
-                break
-    return chrom, scName, strand
-
-def save_generate(save_directory, chrom, orientation):
+def save_generate(save_directory, chrom, orientation, suffix=""):
     """
     To generate output files (forward and reverse).
     :param save_directory: The directory for saving output files.
     :param chrom: The chromosome number.
     :param orientation: Scoring direction（forward or reverse）
+    :param suffix: Added to the names (the name of the 5'UTR score in tss_predict.py).
     :return: Name of output files.
     """
     
-    saveFile = save_directory + "{}_5UTRedge_both_{}.txt".format(chrom, orientation)
+    saveFile = save_directory + "{}_5UTRedge_both_{}{}.txt".format(chrom, orientation, suffix)
     return saveFile
 
-def saveWrite(save_file, chrom, strand, window, degree, threshold, *arg):
+def saveWrite(save_file, chrom, score, strand, window, degree, threshold, *arg):
     """
     To write basic information to the output file.
     :param save_file: The output file.
     :param chrom: Chromosome number.
+    :param score: The name of score.
     :param strand: The chain.（forward or reverse）
     :param window: Smoothing width
     :param degree: Order used for smoothing
@@ -104,33 +94,15 @@ def saveWrite(save_file, chrom, strand, window, degree, threshold, *arg):
         print("Threshold: {}".format(threshold), file=save)
         print("\nEdge Left", "Edge Right", "Peak Height", sep="\t", file=save)
 
-def scoreExt(scanFile):
-    """
-    To generate an array of scores from the file scored by chrom_scan.py.
-    Also returns the top location.
-    :param scanFile: The file scored by chrom_scan.py.
-    :return: numpy.ndarray of locations and values.
-    """
-
-    start = ""
-    score = []
-    with open(scanFile, "rt") as sf:
-        for line in sf:
-            if re.match("\d", line):
-                line = line.replace("\n", "").split("\t")
-                score.append(float(line[1]))
-                if start == "":
-                    start = int(line[0])
-    score = np.array(score)
-    return start, score
-
-def edgeFind(raw_array, threshold, start):
+def edgeFind(raw_array, threshold, start, partial=False):
     """
     Apply the SG-filter to the input data.
     Then, detect the position of both ends of the peak and the maximum value of the peak.
     :param raw_array: raw data（numpy.ndarray）
     :param threshold: The threshold of 5'UTR score.
-    :param start: Location of the first 5UTR score (return value of scoreExt).
+    :param start: Location of the first 5UTR score (return value of trackRead).
+    :param partial: If True, the track is a part of the chromosome (an interval with flanks), and a peak whose left end
+                    is before the searched indexes is not detected (instead of being detected from the first index).
     :return: numpy.ndarray of peak position（both ends） and value.
     """
 
@@ -142,13 +114,13 @@ def edgeFind(raw_array, threshold, start):
     edgeL = []    #To store indexes of the left end of peak.
     edgeR = []    #To store indexes of the right end of peak.
     peaks = []    #To store peak values.
-    up = 0        #The start point of peak.
+    up = None if partial else 0    #The start point of peak.
     down = 0      #The end point of peak.
     for i in range(N - 1, sd.size - 1 - (N - 1) + 1):
         #Search for peaks only in indexes with valid smoothing values.
         if sd[i] < 0 and sd[i+1] >= 0:
             up = i
-        elif sd[i] >= 0 and sd[i+1] < 0:
+        elif sd[i] >= 0 and sd[i+1] < 0 and up is not None:
             down = i+1
             peak_max = sd[up : down].max()    #The max value of peak.
             if peak_max > threshold:
@@ -160,36 +132,104 @@ def edgeFind(raw_array, threshold, start):
     posR = np.array(edgeR) + start
     return posL, posR, np.array(peaks)
 
+def edgeFind_stream(scanFile, threshold, start, block, info=None, partial=False):
+    """
+    edgeFind reading the track in blocks (streaming mode). The result is the same as edgeFind.
+    Each block is smoothed with (N - 1) bases on both sides, so that the smoothed values of the positions in the block
+    are the same as those of the whole track. The max value of a peak spanning blocks is carried over to the next block.
+    :param scanFile: The file scored by 5'UTR score.
+    :param threshold: The threshold of 5'UTR score.
+    :param start: Location of the first 5UTR score (return value of trackInfo).
+    :param block: The number of positions in a block (N or more).
+    :param info: The header of the file (return value of trackInfo).
+    :param partial: The same as edgeFind.
+    :return: numpy.ndarray of peak position（both ends） and value.
+    """
+
+    edgeL = []    #To store indexes of the left end of peak.
+    edgeR = []    #To store indexes of the right end of peak.
+    peaks = []    #To store peak values.
+    up = None if partial else 0    #The start point of peak.
+    carry = None  #The max value from "up" to the end of the previous block.
+    for lower, first, last, raw_array in trackBlocks(scanFile, block, N - 1, info):
+        sd = signal.savgol_filter(raw_array, N, D)
+        #Smoothed data (valid from "first" to "last" - 1, and the next index).
+        begin, end = max(first, N - 1) - lower, min(last, lower + sd.size - (N - 1)) - lower
+        #Search for peaks only in indexes with valid smoothing values.
+        if end > begin:
+            ups = np.flatnonzero((sd[begin:end] < 0) & (sd[begin+1:end+1] >= 0)) + begin
+            downs = np.flatnonzero((sd[begin:end] >= 0) & (sd[begin+1:end+1] < 0)) + begin
+        else:
+            ups = downs = np.zeros(0, dtype=np.int64)
+
+        for i, is_up in sorted([(i, True) for i in ups.tolist()] + [(i, False) for i in downs.tolist()]):
+            if is_up:
+                up = i + lower
+                carry = None
+            elif up is not None:
+                down = i + 1 + lower
+                part = sd[max(up, first) - lower : down - lower].max()
+                peak_max = part if carry is None else max(carry, part)    #The max value of peak.
+                if peak_max > threshold:
+                    peaks.append(peak_max)
+                    edgeL.append(up)
+                    edgeR.append(down)
+        if up is not None:
+            part = sd[max(up, first) - lower : last - lower].max()
+            carry = part if carry is None else max(carry, part)
+            #The max value from "up" to the end of the block.
+
+    posL = np.array(edgeL) + start    #To convert the index to the position of DNA.
+    posR = np.array(edgeR) + start
+    return posL, posR, np.array(peaks)
+
 
-inputs = sys.argv
-if len(inputs) < 2:
-    print("Input the file which scored the whole chromosome by 5'UTR score as the command line argument.")
-    quit()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extraction of 5'UTR peaks. READ manual.txt BEFORE USE.")
+    parser.add_argument("files", nargs="*", help="Files scored by 5'UTR score.")
+    parser.add_argument("--block", type=int, default=stream_block,
+                        help="Read and smooth the tracks in blocks of this number of positions (0: the whole tracks at once).")
+    parser.add_argument("--out", default=save_dir, help="The directory for saving output files.")
+    parser.add_argument("--partial", action="store_true",
+                        help="The tracks are intervals with flanks (chrom_scan.py --bed or --region). "
+                             "Peaks whose left end is before the track are not detected.")
+    args = parser.parse_args()
+    save_dir = os.path.join(args.out, "")
+    os.makedirs(save_dir, exist_ok=True)
+    if len(args.files) < 1:
+        print("Input the file which scored the whole chromosome by 5'UTR score as the command line argument.")
+        quit()
+    if 0 < args.block < N:
+        parser.error("--block must be {} (N) or more.".format(N))
+
+    for f in args.files:
+        print("-"*50)
+        print(os.path.basename(f))
+
+        info = trackInfo(f)
+        chrom, score, ori = info["chromosome"], info["score"], info["strand"]
+        save = save_generate(save_dir, chrom, ori)
+        saveWrite(save, chrom, score, ori, N, D, th, __file__, f)
+
+        if args.block > 0:
+            posL, posR, peaks = edgeFind_stream(f, th, info.get("start", 0), args.block, info, args.partial)
+        else:
+            start, score = trackRead(f, info)
+            print('"trackRead complete"')
+
+            posL, posR, peaks = edgeFind(score, th, start, args.partial)
+            del score
+        print('"edgeFind complete"')
+
+        for L, R, peak in zip(posL, posR, peaks):
+            with open(save, "at") as s:
+                print(L, R, peak, sep="\t", file=s)
 
-for f in inputs[1:]:
     print("-"*50)
-    print(os.path.basename(f))
-
-    chrom, score, ori = infoExt(f)
-    save = save_generate(save_dir, chrom, ori)
-    saveWrite(save, chrom, ori, N, D, th, __file__, f)
-
-    start, score = scoreExt(f)
-    print('"scoreExt complete"')
-
-    posL, posR, peaks = edgeFind(score, th, start)
-    del score
-    print('"edgeFind complete"')
-
-    for L, R, peak in zip(posL, posR, peaks):
-        with open(save, "at") as s:
-            print(L, R, peak, sep="\t", file=s)
-
-print("-"*50)
-t2=time.time()
-t=t2-t1
-if t > 60:
-    print('time:'+str(t/60)+'(min)')
-else:
-    print('time:'+str(t)+'(s)')
-#To display the time required for processing.
\ No newline at end of file
+    t2=time.time()
+    t=t2-t1
+    if t > 60:
+        print('time:'+str(t/60)+'(min)')
+    else:
+        print('time:'+str(t)+'(s)')
+    #To display the time required for processing.
\ No newline at end of file
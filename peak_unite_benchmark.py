@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Benchmark of peakUnite (peak_find_SG.py).
+
+Random candidate peaks (sorted positions, as generated by peakFind) are merged by peakUnite (one sweep)
+and, up to "pairwise_max" peaks, by peakUnite_pairwise (every peak compared with all peaks).
+The results of both are checked to be the same.
+
+At the command prompt, enter the following.
+    python3 peak_unite_benchmark.py [number of peaks 1] [number of peaks 2]...
+For example,
+    python3 peak_unite_benchmark.py 1000 10000 100000 1000000 3000000
+"""
+
+sizes = [1000, 10000, 100000, 1000000]
+#The numbers of candidate peaks (if not given on the command line).
+
+pairwise_max = 20000
+#peakUnite_pairwise is measured only up to this number of peaks (it is quadratic).
+
+spacing = 50
+#The mean distance between candidate peaks (bases). Smaller than the window (N = 151), so many peaks are merged.
+
+
+
+import sys
+import time
+import numpy as np
+from peak_find_SG import N, peakUnite, peakUnite_pairwise
+
+
+def candidate_generate(size, seed=0):
+    """
+    To generate random candidate peaks.
+    :param size: The number of peaks.
+    :param seed: The seed of the random numbers.
+    :return: numpy.ndarray of peak positions (sorted, no duplication) and values.
+    """
+
+    rng = np.random.default_rng(seed)
+    peak_x = np.cumsum(rng.integers(1, 2 * spacing, size))
+    peak_y = np.round(rng.random(size), 3)
+    #Rounded, so that some peaks in the same range have the same value.
+    return peak_x, peak_y
+
+def timeit(func, *arg):
+    """
+    To measure the time of the function.
+    :param func: The function.
+    :param *arg: The arguments.
+    :return: The return value, the time (s).
+    """
+
+    t1 = time.perf_counter()
+    result = func(*arg)
+    return result, time.perf_counter() - t1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sizes = [int(item) for item in sys.argv[1:]]
+
+    print("peaks", "merged", "sweep (s)", "pairwise (s)", "same", sep="\t")
+    for size in sizes:
+        peak_x, peak_y = candidate_generate(size)
+        (resultX, resultY), t_sweep = timeit(peakUnite, peak_x, peak_y, N)
+        if size <= pairwise_max:
+            (pairX, pairY), t_pair = timeit(peakUnite_pairwise, peak_x, peak_y, N)
+            same = np.array_equal(resultX, pairX) and np.array_equal(resultY, pairY)
+            print(size, resultX.size, "{:.3f}".format(t_sweep), "{:.3f}".format(t_pair), same, sep="\t")
+        else:
+            print(size, resultX.size, "{:.3f}".format(t_sweep), "-", "-", sep="\t")
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Extraction of promoter sequences from a genome FASTA file and an annotation of TSSs (GFF, GTF or BED).
+
+Each promoter is cut from -1000 to +(downstream - 1) around the TSS on the strand of the gene
+(reverse complement for the "-" strand), so it is the same as a line of the promoter file of TSS_count.py:
+    AT1G01010<TAB>Chr1:3631<TAB>+<TAB>[sequence starting at -1000]
+Positions beyond the ends of the chromosome are filled with "N" (not counted by TSS_count.py).
+The chromosomes are read one region at a time (see fasta_io.region_extract), not as a whole.
+
+At the command prompt, enter the following to write the promoter file.
+    python3 promoter_extract.py [FASTA file] [GFF, GTF or BED file] [--feature gene] [--downstream 200] > promoters.txt
+TSS_count.py can also count the promoters directly (--genome, --annotation) without the promoter file.
+"""
+
+import os
+import argparse
+from fasta_io import region_extract
+
+upstream = 1000
+#The position of the TSS in the promoter sequence (the promoter sequence starts at -1000).
+
+downstream = 200
+#The number of bases from the TSS (+0) to the end of the promoter sequence.
+
+feature = "gene"
+#The feature of GFF or GTF files whose start (end for the "-" strand) is the TSS.
+
+chunk_size = 10000000
+#The number of bases read at once (for FASTA files which cannot be indexed).
+
+complement = str.maketrans("ATGCatgc", "TACGtacg")
+#Other letters (N etc.) are left as they are.
+
+
+def reverse_complement(sequence):
+    """
+    To generate the reverse complement of the base sequence.
+    :param sequence: The base sequence.
+    :return: The reverse complement.
+    """
+
+    return sequence.translate(complement)[::-1]
+
+def gff_name(attributes):
+    """
+    To extract the name of the feature from the 9th column of GFF or GTF.
+    :param attributes: The 9th column ("ID=AT1G01010;Name=..." or 'gene_id "AT1G01010"; ...').
+    :return: The name (ID, gene_id, transcript_id or Name). "" if not found.
+    """
+
+    fields = {}
+    for item in attributes.strip().split(";"):
+        item = item.strip()
+        if "=" in item:
+            key, value = item.split("=", 1)
+        elif " " in item:
+            key, value = item.split(" ", 1)
+        else:
+            continue
+        fields.setdefault(key.strip(), value.strip().strip('"'))
+    for key in ("ID", "gene_id", "transcript_id", "Name"):
+        if key in fields:
+            return fields[key]
+    return ""
+
+def tss_read(annotation_file, feature_type=feature):
+    """
+    To read the TSSs from the annotation file.
+    GFF and GTF (1-based): the start of the feature for the "+" strand and the end for the "-" strand.
+    BED (0-based, 6 columns): the start for the "+" strand and (end - 1) for the "-" strand. Without the strand column, "+".
+    :param annotation_file: GFF, GTF or BED file (recognized by the extension, ".gz" is not supported).
+    :param feature_type: The feature (3rd column) of GFF or GTF used as genes.
+    :return: List of (chromosome, position of the TSS (0-based), strand, name).
+    """
+
+    ext = os.path.splitext(annotation_file)[1].lower()
+    bed = ext == ".bed"
+    tss = []
+    with open(annotation_file, "rt") as af:
+        for line in af:
+            if line.strip() == "" or line.startswith(("#", "track", "browser")):
+                continue
+            cols = line.rstrip("\r\n").split("\t")
+            if bed:
+                chrom, start, end = cols[0], int(cols[1]), int(cols[2])
+                strand = cols[5] if len(cols) > 5 and cols[5] in ("+", "-") else "+"
+                name = cols[3] if len(cols) > 3 else "{}_{}-{}".format(chrom, start, end)
+                tss.append((chrom, start if strand == "+" else end - 1, strand, name))
+            else:
+                if len(cols) < 9 or cols[2] != feature_type:
+                    continue
+                chrom, start, end, strand = cols[0], int(cols[3]), int(cols[4]), cols[6]
+                if strand not in ("+", "-"):
+                    continue
+                    #Features without the strand have no direction of the promoter.
+                tss.append((chrom, start - 1 if strand == "+" else end - 1, strand, gff_name(cols[8])))
+    return tss
+
+def promoter_windows(sequence_file, tss, down=downstream):
+    """
+    To cut the promoter sequences from the genome.
+    :param sequence_file: FASTA file of the genome.
+    :param tss: List of (chromosome, position of the TSS (0-based), strand, name). (return value of tss_read)
+    :param down: The number of bases from the TSS (+0) to the end of the promoter sequence.
+    :return: Generator of ((chromosome, position of the TSS, strand, name), promoter sequence starting at -1000).
+             TSSs on chromosomes which are not in the FASTA file are not generated.
+    """
+
+    regions = []
+    for item in tss:
+        chrom, pos, strand = item[0], item[1], item[2]
+        if strand == "+":
+            regions.append((chrom, pos - upstream, pos + down, item))
+        else:
+            regions.append((chrom, pos - down + 1, pos + upstream + 1, item))
+    #The promoter of the "-" strand is the reverse complement of the region from +(down - 1) to -1000.
+
+    for region, start, seq in region_extract(sequence_file, regions, chunk_size):
+        seq = "N" * (start - region[1]) + seq
+        seq = seq + "N" * (region[2] - region[1] - len(seq))
+        #The ends of the chromosome.
+        if region[3][2] == "-":
+            seq = reverse_complement(seq)
+        yield region[3], seq
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extraction of promoter sequences from the genome and the annotation of TSSs.")
+    parser.add_argument("files", nargs=2, help="FASTA file of the genome and GFF, GTF or BED file.")
+    parser.add_argument("--feature", default=feature, help="The feature of GFF or GTF files used as genes.")
+    parser.add_argument("--downstream", type=int, default=downstream, help="The number of bases from the TSS to the end of the promoter.")
+    args = parser.parse_args()
+
+    seqFile, annotationFile = args.files
+    for (chrom, pos, strand, name), seq in promoter_windows(seqFile, tss_read(annotationFile, args.feature), args.downstream):
+        print(name, "{}:{}".format(chrom, pos + 1), strand, seq, sep="\t")
@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Incremental runner of the whole pipeline (TSS_count.py -> calc_igi_pri.py -> chrom_scan.py
+-> peak_find_SG.py and peak_find_SG_5UTR_edge_both.py).
+
+The pipeline is divided into jobs, and each job runs one script into its own directory of the run directory:
+    count/[promoter file]/, count/merge/ (or count/genome/ with --annotation)   TSS_count.py
+    tables/                                                                    calc_igi_pri.py
+    scan/[chromosome]/                                                         chrom_scan.py --chrom
+    peak/[chromosome]_[strand]/                                                peak_find_SG.py
+    edge/[5'UTR score]/[chromosome]_[strand]/                                  peak_find_SG_5UTR_edge_both.py
+The key of a job is the SHA-256 checksum of its command line, the contents of its input files
+and the script (with the modules of this directory imported by it).
+The keys and the checksums of the output files are recorded in pipeline_state.json of the run directory,
+and a job is run again only if its key has changed or its output files have been changed or removed.
+Independent jobs (e.g. the chromosomes and the strands) are run concurrently (--jobs).
+The output of each script is written to logs/[job].log.
+
+At the command prompt, enter the following.
+    python3 run_pipeline.py [FASTA file] [Promoter file 1] [Promoter file 2]... --out run1 [--jobs 8]
+    python3 run_pipeline.py [FASTA file] --annotation genes.gff3 --out run1
+    python3 run_pipeline.py [FASTA file] --tables IGI200_60_forChr1-2.txt IGI750_450_forChr1-2.txt [PRI200_60-750_450_forChr1-2.txt] --out run1
+For example,
+    python3 run_pipeline.py Chr1_for_test.con --tables IGI200_60_forChr1-2.txt IGI750_450_forChr1-2.txt PRI200_60-750_450_forChr1-2.txt --utr 5UTR-IGI750_450_forChr1-2.txt --out run1
+
+Running the same command again only checks the files. After changing a parameter of peak_find_SG.py
+(or giving other --peak-args), only the peak jobs are run again.
+"""
+
+save_dir = r""
+#The directory of the run directory without "--out" (pipeline_run in this directory).
+#If blank, the run directory will be in the directory where this script is located.
+
+jobs = 1
+#The number of jobs run at once.
+
+scan_format = "text"
+#The format of the scan tracks (chrom_scan.py --format). "text", "npy" or "bedgraph".
+
+
+
+import os
+import sys
+import ast
+import json
+import time
+import shlex
+import shutil
+import hashlib
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import TSS_count
+from fasta_io import record_names
+from score_table import table_load, file_checksum, pri_score_name
+from chrom_scan import score_name_extract, chrom_name_extract, save_generate
+from count_store import replace_write
+
+if save_dir == "":
+    save_dir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+    #Get the absolute path of the directory where this script is located.
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def script_modules(script, found=None):
+    """
+    To collect the script and the modules of this directory imported by it (recursively).
+    :param script: The script file.
+    :param found: The set of the files collected so far.
+    :return: The set of the files.
+    """
+
+    if found is None:
+        found = set()
+    found.add(script)
+    with open(script, "rb") as sf:
+        tree = ast.parse(sf.read(), script)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module is not None:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            module = os.path.join(script_dir, name.split(".")[0] + ".py")
+            if os.path.exists(module) and module not in found:
+                script_modules(module, found)
+    return found
+
+def script_hash(script, cache={}):
+    """
+    To calculate the checksum of the script and the modules of this directory imported by it.
+    :param script: The script file.
+    :param cache: The checksums calculated before (shared by all calls).
+    :return: The checksum (hex).
+    """
+
+    if script not in cache:
+        sha = hashlib.sha256()
+        for module in sorted(script_modules(script)):
+            sha.update("{}\t{}\n".format(os.path.basename(module), file_checksum(module)).encode())
+        cache[script] = sha.hexdigest()
+    return cache[script]
+
+def file_record(path, files, lock):
+    """
+    To get the checksum of the file, from the records if the size and the modification time have not changed.
+    :param path: The file (absolute path).
+    :param files: The records of the files {path: {"size", "mtime_ns", "sha256"}} (updated).
+    :param lock: The lock of the records.
+    :return: The checksum (hex).
+    """
+
+    stat = os.stat(path)
+    with lock:
+        record = files.get(path)
+    if record is not None and record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+        return record["sha256"]
+    checksum = file_checksum(path)
+    with lock:
+        files[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": checksum}
+    return checksum
+
+def state_load(run_dir):
+    """
+    To read the state of the run directory.
+    :param run_dir: The run directory.
+    :return: {"files": records of the files, "jobs": {job name: {"key", "outputs": {file: checksum}}}}
+    """
+
+    state_file = os.path.join(run_dir, "pipeline_state.json")
+    if not os.path.exists(state_file):
+        return {"files": {}, "jobs": {}}
+    with open(state_file, "rt") as sf:
+        return json.load(sf)
+
+def state_save(run_dir, state):
+    """
+    To write the state of the run directory (through a temporary file).
+    :param run_dir: The run directory.
+    :param state: The state.
+    """
+
+    replace_write(os.path.join(run_dir, "pipeline_state.json"), lambda save: json.dump(state, save, indent=1))
+
+def job_add(job_list, name, script, arg, inputs, deps=(), finish=None):
+    """
+    To add a job to the list.
+    :param job_list: {job name: job} in the order of execution (updated).
+    :param name: The name of the job (the directory of the output files in the run directory, separated by "/").
+    :param script: The script file.
+    :param arg: The command line arguments of the script (without --out).
+    :param inputs: The input files (including the files which are not in the command line, e.g. the .json of npy tracks).
+    :param deps: The names of the jobs which write the input files.
+    :param finish: The function run after the script with the output directory (or None).
+    """
+
+    if name in job_list:
+        raise ValueError("Duplicate job: " + name)
+    job_list[name] = {"name": name, "script": os.path.join(script_dir, script), "arg": [str(item) for item in arg],
+                      "inputs": [os.path.abspath(item) for item in inputs], "deps": list(deps), "finish": finish}
+
+def job_key(job, files, lock):
+    """
+    To calculate the key of the job.
+    :param job: The job.
+    :param files: The records of the files.
+    :param lock: The lock of the records.
+    :return: The key (hex).
+    """
+
+    sha = hashlib.sha256()
+    sha.update(json.dumps(job["arg"]).encode())
+    sha.update(script_hash(job["script"]).encode())
+    if job["finish"] is not None:
+        sha.update(script_hash(os.path.abspath(__file__)).encode())
+        #The function run after the script is in this file.
+    for path in job["inputs"]:
+        sha.update("{}\t{}\n".format(path, file_record(path, files, lock)).encode())
+    return sha.hexdigest()
+
+def outputs_valid(outputs, out_dir, files, lock):
+    """
+    To check whether the output files recorded for the job are unchanged.
+    :param outputs: {file (relative to the output directory): checksum}
+    :param out_dir: The output directory of the job.
+    :param files: The records of the files.
+    :param lock: The lock of the records.
+    :return: True if all output files exist with the recorded contents.
+    """
+
+    for rel, checksum in outputs.items():
+        path = os.path.join(out_dir, rel)
+        if not os.path.isfile(path) or file_record(path, files, lock) != checksum:
+            return False
+    return True
+
+def job_run(job, run_dir, futures, state, lock, force=False):
+    """
+    To run the job after the jobs it depends on, unless its outputs are up to date.
+    :param job: The job.
+    :param run_dir: The run directory.
+    :param futures: {job name: concurrent.futures.Future}
+    :param state: The state of the run directory (updated and saved).
+    :param lock: The lock of the state.
+    :param force: If True, the job is run even if it is up to date.
+    :return: True if the script was run, False if it was skipped.
+    """
+
+    for dep in job["deps"]:
+        try:
+            futures[dep].result()
+        except Exception:
+            raise RuntimeError("not run (failed: {})".format(dep))
+
+    name = job["name"]
+    out_dir = os.path.join(run_dir, *name.split("/"))
+    key = job_key(job, state["files"], lock)
+    with lock:
+        record = state["jobs"].get(name)
+    if not force and record is not None and record["key"] == key and \
+       outputs_valid(record["outputs"], out_dir, state["files"], lock):
+        with lock:
+            print("up to date:", name)
+        return False
+
+    with lock:
+        state["jobs"].pop(name, None)
+        state_save(run_dir, state)
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    #The outputs of the previous run are removed, so only the files written by this run are recorded.
+    log_file = os.path.join(run_dir, "logs", name.replace("/", "_") + ".log")
+
+    with lock:
+        print("run:", name)
+    t1 = time.time()
+    with open(log_file, "wt") as log:
+        returncode = subprocess.call([sys.executable, job["script"]] + job["arg"] + ["--out", out_dir],
+                                     stdout=log, stderr=subprocess.STDOUT, cwd=out_dir)
+    if returncode != 0:
+        raise RuntimeError("failed (see {})".format(log_file))
+    if job["finish"] is not None:
+        job["finish"](out_dir)
+
+    outputs = {}
+    for root, dirs, fns in os.walk(out_dir):
+        for fn in fns:
+            path = os.path.join(root, fn)
+            outputs[os.path.relpath(path, out_dir)] = file_record(path, state["files"], lock)
+    with lock:
+        state["jobs"][name] = {"key": key, "outputs": outputs}
+        state_save(run_dir, state)
+        print("done: {} ({:.1f} s)".format(name, time.time() - t1))
+    return True
+
+def igi_name(region):
+    """
+    To generate the name of IGI score of the region (the same form as the score tables, e.g. IGI200_60).
+    :param region: [start, end] of the region (upstream of the TSS).
+    :return: The name of IGI score.
+    """
+
+    return "IGI{}_{}".format(-region[0], -region[1])
+
+def tables_finish(region_list, name):
+    """
+    To generate the function which renames the tables of calc_igi_pri.py (IGI_for_[name]_-200_-60.txt, PRI.txt)
+    into the names recognized by chrom_scan.py (IGI200_60_for[name].txt, PRI200_60-750_450_for[name].txt)
+    and compiles them (score_table.py) before the scan jobs use them at once.
+    :param region_list: The two regions.
+    :param name: The name in the file names.
+    :return: The function of the output directory.
+    """
+
+    def finish(out_dir):
+        igi1, igi2 = [igi_name(region) for region in region_list]
+        renames = [("IGI_for_{}_{}_{}.txt".format(name, *region_list[0]), igi1 + "_for" + name + ".txt"),
+                   ("IGI_for_{}_{}_{}.txt".format(name, *region_list[1]), igi2 + "_for" + name + ".txt"),
+                   ("PRI.txt", pri_score_name(igi1, igi2) + "_for" + name + ".txt")]
+        for old, new in renames:
+            os.replace(os.path.join(out_dir, old), os.path.join(out_dir, new))
+            table_load(os.path.join(out_dir, new))
+    return finish
+
+def pipeline_jobs(args, run_dir):
+    """
+    To generate the jobs of the pipeline.
+    :param args: The command line arguments.
+    :param run_dir: The run directory.
+    :return: {job name: job} in the order of execution, the names of the final jobs.
+    """
+
+    job_list = {}
+    genome = os.path.abspath(args.files[0])
+    promoters = args.files[1:]
+    name = args.name
+    if name is None:
+        name = os.path.basename(genome)
+        if name.endswith(".gz"):
+            name = name[:-len(".gz")]
+        name = os.path.splitext(name)[0]
+    derive = args.derive_pri
+
+    if args.tables is not None:
+        if len(args.tables) not in (2, 3):
+            raise ValueError("Give two IGI tables and one PRI table (or only the two IGI tables) to --tables.")
+        tables = [os.path.abspath(item) for item in args.tables]
+        for table in tables + args.utr:
+            table_load(table)
+            #Compiled before the scan jobs use them at once.
+        if len(tables) == 2:
+            derive = True
+        table_deps = []
+    else:
+        region_list = args.region if args.region is not None else TSS_count.region_list[:2]
+        if len(region_list) != 2:
+            raise ValueError("Give two regions (--region twice).")
+        region_arg = ["--region={}:{}".format(start, end) for start, end in region_list] + ["--bp", args.bp]
+        count_dir = os.path.join(run_dir, "count")
+        counts = ["for_{}_{}_{}.txt".format(name, start, end) for start, end in region_list]
+
+        if args.annotation is not None:
+            job_add(job_list, "count/genome", "TSS_count.py",
+                    ["--genome", genome, "--annotation", os.path.abspath(args.annotation), "--name", name] + region_arg,
+                    [genome, args.annotation])
+            counts = [os.path.join(count_dir, "genome", item) for item in counts]
+            count_deps = ["count/genome"]
+        elif len(promoters) > 0:
+            shards = []
+            for pfile in promoters:
+                stem = os.path.splitext(os.path.basename(pfile))[0]
+                job_add(job_list, "count/" + stem, "TSS_count.py", ["--shard", os.path.abspath(pfile)] + region_arg, [pfile])
+                shards.append(os.path.join(count_dir, stem, "counts_" + stem))
+            #One shard for each promoter file, so only the changed files are counted again.
+            job_add(job_list, "count/merge", "TSS_count.py", ["--merge", "--name", name] + [item + ".npy" for item in shards],
+                    [item + ext for item in shards for ext in (".npy", ".json")], list(job_list))
+            counts = [os.path.join(count_dir, "merge", item) for item in counts]
+            count_deps = ["count/merge"]
+        else:
+            raise ValueError("Give promoter files, --annotation or --tables.")
+
+        job_add(job_list, "tables", "calc_igi_pri.py", counts, counts, count_deps, tables_finish(region_list, name))
+        igi1, igi2 = [igi_name(region) for region in region_list]
+        tables = [os.path.join(run_dir, "tables", item + "_for" + name + ".txt")
+                  for item in (igi1, igi2, pri_score_name(igi1, igi2))]
+        table_deps = ["tables"]
+        for table in args.utr:
+            table_load(table)
+
+    score_tables = tables[:2] if derive else tables
+    #With --derive-pri, the PRI tracks are not scored.
+    utr_tables = [os.path.abspath(item) for item in args.utr]
+    extension = {"text": [".txt"], "npy": [".npy", ".json"], "bedgraph": [".bedgraph"]}[args.format]
+    scan_arg = shlex.split(args.scan_args) + ["--format", args.format]
+    peak_arg = shlex.split(args.peak_args) + (["--derive-pri"] if derive else [])
+    edge_arg = shlex.split(args.edge_args)
+
+    finals = []
+    for record in record_names(genome):
+        #record_names also builds the index of the FASTA file (if it can be indexed) before the scan jobs,
+        #which read only their own record with seeks (chrom_scan.py --chrom).
+        chrom = record if record != "" else chrom_name_extract(genome)
+        scan = "scan/" + chrom
+        job_add(job_list, scan, "chrom_scan.py",
+                [genome] + score_tables + utr_tables + ["--chrom", chrom] + scan_arg,
+                [genome] + score_tables + utr_tables, table_deps)
+        scan_dir = os.path.join(run_dir, "scan", chrom, "")
+
+        for strand in (0, 1):
+            ori = ("forward", "reverse")[strand]
+            tracks = [save_generate(scan_dir, chrom, score_name_extract(table), extension[0])[strand] for table in score_tables]
+            if not derive:
+                tracks = [tracks[2], tracks[0], tracks[1]]
+                #PRI, IGI1, IGI2 as the input example of peak_find_SG.py.
+            sidecars = [os.path.splitext(track)[0] + ext for track in tracks for ext in extension[1:]]
+            job_add(job_list, "peak/{}_{}".format(chrom, ori), "peak_find_SG.py", tracks + peak_arg, tracks + sidecars, [scan])
+            finals.append("peak/{}_{}".format(chrom, ori))
+
+            for table in utr_tables:
+                track = save_generate(scan_dir, chrom, score_name_extract(table), extension[0])[strand]
+                sidecars = [os.path.splitext(track)[0] + ext for ext in extension[1:]]
+                edge = "edge/{}/{}_{}".format(score_name_extract(table), chrom, ori)
+                job_add(job_list, edge, "peak_find_SG_5UTR_edge_both.py", [track] + edge_arg, [track] + sidecars, [scan])
+                finals.append(edge)
+    return job_list, finals
+
+
+if __name__ == "__main__":
+    t1 = time.time()
+    #Get start time.
+
+    parser = argparse.ArgumentParser(description="Incremental runner of the whole pipeline. READ manual.txt BEFORE USE.")
+    parser.add_argument("files", nargs="+", help="One FASTA file of the genome and promoter files (the same as TSS_count.py).")
+    parser.add_argument("--out", default=save_dir + "pipeline_run", help="The run directory. The same directory is given to run again.")
+    parser.add_argument("--annotation", help="GFF, GTF or BED file of the TSSs, to count the promoters of the genome instead of promoter files.")
+    parser.add_argument("--tables", nargs="+", help="IGI1, IGI2 (and PRI) tables, instead of counting the promoters.")
+    parser.add_argument("--utr", action="append", default=[], help="5'UTR score table. Can be given more than once.")
+    parser.add_argument("--name", default=None, help="The name in the file names of the tables (default: the name of the FASTA file).")
+    parser.add_argument("--region", action="append", type=TSS_count.region_parse, default=None,
+                        help="The two regions of PRI, e.g. --region=-200:-60 --region=-750:-450 (default: region_list of TSS_count.py).")
+    parser.add_argument("--bp", type=int, default=TSS_count.bp, help="The number of bases (4 to 12).")
+    parser.add_argument("--format", choices=["text", "npy", "bedgraph"], default=scan_format, help="The format of the scan tracks.")
+    parser.add_argument("--derive-pri", action="store_true", help="PRI is derived from the IGI tracks by peak_find_SG.py instead of being scored.")
+    parser.add_argument("--scan-args", default="", help='Other arguments of chrom_scan.py, e.g. "--workers 4".')
+    parser.add_argument("--peak-args", default="", help='Other arguments of peak_find_SG.py, e.g. "--block 1000000".')
+    parser.add_argument("--edge-args", default="", help="Other arguments of peak_find_SG_5UTR_edge_both.py.")
+    parser.add_argument("--jobs", type=int, default=jobs, help="The number of jobs run at once.")
+    parser.add_argument("--force", action="store_true", help="Run all jobs even if they are up to date.")
+    args = parser.parse_args()
+
+    run_dir = os.path.abspath(args.out)
+    os.makedirs(os.path.join(run_dir, "logs"), exist_ok=True)
+    try:
+        job_list, finals = pipeline_jobs(args, run_dir)
+    except ValueError as e:
+        parser.error(str(e))
+
+    state = state_load(run_dir)
+    lock = threading.Lock()
+    futures = {}
+    with ThreadPoolExecutor(max(args.jobs, 1)) as pool:
+        for name, job in job_list.items():
+            futures[name] = pool.submit(job_run, job, run_dir, futures, state, lock, args.force)
+        #The jobs are submitted after the jobs they depend on, so a job waits only for jobs already started.
+
+    ran, failed = 0, 0
+    for name, future in futures.items():
+        try:
+            ran += future.result()
+        except Exception as e:
+            print("{}: {}".format(name, e))
+            failed += 1
+    print("-"*50)
+    print(len(job_list), "jobs:", ran, "run,", len(job_list) - ran - failed, "up to date,", failed, "failed")
+    for name in finals:
+        if name in state["jobs"]:
+            for rel in sorted(state["jobs"][name]["outputs"]):
+                print(os.path.join(run_dir, *name.split("/"), rel))
+
+    t2 = time.time()
+    t = t2 - t1
+    if t > 60:
+        print('time:'+str(t/60)+'(min)')
+    else:
+        print('time:'+str(t)+'(s)')
+    #To display the time required for processing.
+    if failed > 0:
+        sys.exit(1)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Compiled score tables (IGI, PRI, 5'UTR).
+
+A score table (text, "base sequence<TAB>score" per line) is compiled into a dense float64 array indexed by the k-mer index
+(see kmer_code.py), saved as .npy next to the source with a JSON header file and a table of the text exceptions (below):
+    PRI200_60-750_450_riceAll.txt -> PRI200_60-750_450_riceAll.npy, PRI200_60-750_450_riceAll.json,
+                                     PRI200_60-750_450_riceAll.text.npy
+k is from 4 to 12 (16.7 M entries), and the source is read in blocks without a dictionary of all k-mers.
+The header records k, the source file, its size, modification time and SHA-256 checksum.
+table_load uses the compiled table through a memory map and recompiles it automatically when the source has changed.
+
+The scores whose text is not reproduced by score_text (e.g. "9.47371E-05") are kept with their indexes in the .text.npy file,
+so the text tracks of chrom_scan.py are the same as those scored with the source table.
+It is also used through a memory map, so the loading time does not depend on the number of the exceptions.
+
+At the command prompt, enter the following to compile tables in advance.
+    python3 score_table.py [Score file 1] [Score file 2]...
+"""
+
+import os
+import sys
+import re
+import json
+import hashlib
+import numpy as np
+from kmer_code import kmer_to_index, bp_check
+
+parse_block = 1 << 20
+#The number of lines of the score table converted at once.
+
+
+def index_dict_generate(score_table_file):
+    """
+    To extract the dictionary and the number of bases from PRI or IGI file.
+    :param score_table_file: IGI or PRI file.
+    :return: The dictionary object (key: base sequence, value: IGI or PRI score).
+    :return: The number of bases.
+    """
+
+    with open(score_table_file,'rt') as fi:
+        indexlist=[line.replace('\n','').split('\t') for line in fi
+                   if re.match("[ATGC][ATGC]+", line)]
+        #If the base sequence is in the line, generate the list object separating by a tab character.
+
+    bp=len(indexlist[0][0])
+    #The number of bases.
+
+    indexdict=dict(indexlist)
+    #{"base sequence": "IGI or PRI score"}
+    del indexlist
+
+    return indexdict, bp
+
+def score_text(value):
+    """
+    To convert a score into text.
+    :param value: The score (float).
+    :return: The shortest text which gives the score ("0" for zero).
+    """
+
+    if value == 0:
+        return "0"
+    return repr(float(value))
+
+def compiled_name(score_table_file):
+    """
+    To generate the names of the compiled table and its header.
+    :param score_table_file: IGI or PRI file (text).
+    :return: The name of the compiled table (.npy), the name of the header (.json),
+             the name of the table of the text exceptions (.text.npy).
+    """
+
+    base = os.path.splitext(score_table_file)[0]
+    return base + ".npy", base + ".json", base + ".text.npy"
+
+def file_checksum(file_path):
+    """
+    To calculate the SHA-256 checksum of the file.
+    :param file_path: The file.
+    :return: The checksum (hex).
+    """
+
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def table_compile(score_table_file, save=True):
+    """
+    To compile the score table into a dense array.
+    :param score_table_file: IGI or PRI file (text).
+    :param save: If True, the compiled table and its header are saved next to the source.
+    :return: numpy.ndarray (size: 4 ** k + 1) of scores, the header (dict).
+    """
+
+    stat = os.stat(score_table_file)
+    checksum = file_checksum(score_table_file)
+
+    values = None
+    exception = {}
+    #Scores whose text is not reproduced by score_text.
+    with open(score_table_file, "rt") as fi:
+        lines = (line.replace("\n", "").split("\t") for line in fi if re.match("[ATGC][ATGC]+", line))
+        #The lines with the base sequence, in the same way as index_dict_generate.
+        while True:
+            block = [cols for _, cols in zip(range(parse_block), lines)]
+            if len(block) == 0:
+                break
+            if values is None:
+                bp = len(block[0][0])
+                bp_check(bp)
+                values = np.zeros(4 ** bp + 1, dtype=np.float64)
+                #Dense array of scores. Missing k-mers and windows with mixed bases get 0.
+
+            index = kmer_to_index([cols[0] for cols in block], bp)
+            texts = np.array([cols[1] for cols in block], dtype=object)
+            del block
+            valid = index < 4 ** bp
+            index, texts = index[valid], texts[valid]
+            values[index] = texts.astype(np.float64)
+            for i, text in zip(index.tolist(), texts.tolist()):
+                if text != score_text(values[i]):
+                    exception[i] = text
+                else:
+                    exception.pop(i, None)
+            #A k-mer written twice gets the last score, as with a dictionary.
+
+    if values is None:
+        raise ValueError("No score in " + score_table_file)
+    header = {"k": bp, "source": os.path.abspath(score_table_file), "size": stat.st_size,
+              "mtime_ns": stat.st_mtime_ns, "sha256": checksum, "text": len(exception)}
+    #"text" is the number of the text exceptions.
+    exceptions = exception_array(exception)
+    del exception
+
+    if save:
+        save_table, save_header, save_text = compiled_name(score_table_file)
+        try:
+            np.save(save_table, values)
+            np.save(save_text, exceptions)
+            with open(save_header, "wt") as sh:
+                json.dump(header, sh, indent=1)
+                #The header is written last, so that a table without the header is compiled again.
+        except OSError:
+            pass
+            #If the directory of the source is not writable, the table is compiled every time.
+    header["exceptions"] = exceptions["index"], exceptions["text"]
+    return values, header
+
+def exception_array(exception):
+    """
+    To convert the text exceptions into a structured array sorted by index.
+    :param exception: {index: text of the score}
+    :return: numpy.ndarray of (index, text (bytes)).
+    """
+
+    width = max([len(text) for text in exception.values()] + [1])
+    array = np.zeros(len(exception), dtype=[("index", "<i8"), ("text", "S{}".format(width))])
+    array["index"] = sorted(exception)
+    array["text"] = [exception[i].encode("ascii") for i in array["index"].tolist()]
+    return array
+
+def compiled_load(save_table, header):
+    """
+    To load the compiled table and the table of the text exceptions through memory maps.
+    :param save_table: The compiled table (.npy).
+    :param header: The header of the compiled table. The text exceptions are added as "exceptions".
+    :return: numpy.ndarray (memory map) of scores.
+    """
+
+    exceptions = np.load(os.path.splitext(save_table)[0] + ".text.npy", mmap_mode="r" if header["text"] > 0 else None)
+    #An empty array cannot be memory-mapped.
+    header["exceptions"] = exceptions["index"], exceptions["text"]
+    return np.load(save_table, mmap_mode="r")
+
+def header_valid(header, score_table_file):
+    """
+    To check whether the compiled table was made from the current source.
+    :param header: The header of the compiled table.
+    :param score_table_file: IGI or PRI file (text).
+    :return: True if the source has not changed.
+    """
+
+    if not isinstance(header.get("text"), int):
+        return False
+        #Compiled with the text exceptions in the header (by an older version).
+    stat = os.stat(score_table_file)
+    if header["size"] != stat.st_size:
+        return False
+    if header["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    return header["sha256"] == file_checksum(score_table_file)
+    #The file was touched but may have the same contents.
+
+def table_load(score_table_file):
+    """
+    To load the compiled score table. If it does not exist or is older than the source, the source is compiled.
+    :param score_table_file: IGI or PRI file (text), or the compiled table (.npy).
+    :return: numpy.ndarray (size: 4 ** k + 1) of scores, k (the number of bases), the header (dict).
+    """
+
+    if score_table_file.endswith(".npy"):
+        save_table = score_table_file
+        save_header = os.path.splitext(score_table_file)[0] + ".json"
+        with open(save_header, "rt") as sh:
+            header = json.load(sh)
+        source = header["source"]
+        if not os.path.exists(source) or header_valid(header, source):
+            return compiled_load(save_table, header), header["k"], header
+        score_table_file = source
+        #The source has changed after compiling.
+    else:
+        save_table, save_header, save_text = compiled_name(score_table_file)
+        if os.path.exists(save_table) and os.path.exists(save_header) and os.path.exists(save_text):
+            with open(save_header, "rt") as sh:
+                header = json.load(sh)
+            if header["source"] == os.path.abspath(score_table_file) and header_valid(header, score_table_file):
+                return compiled_load(save_table, header), header["k"], header
+
+    values, header = table_compile(score_table_file)
+    return values, header["k"], header
+
+def pri_score_name(igi_name1, igi_name2):
+    """
+    To generate the name of PRI score from the names of the two IGI scores.
+    :param igi_name1: The name of IGI score (e.g. IGI200_60).
+    :param igi_name2: The name of IGI score subtracted (e.g. IGI750_450).
+    :return: The name of PRI score (e.g. PRI200_60-750_450).
+    """
+
+    return "PRI" + igi_name1[len("IGI"):] + "-" + igi_name2[len("IGI"):]
+
+def text_exceptions(header):
+    """
+    To get the scores whose text is not reproduced by score_text.
+    :param header: The header (return value of table_load). If it has no text exceptions (e.g. {}), there are none.
+    :return: numpy.ndarray of the sorted indexes, numpy.ndarray (bytes) of their text.
+    """
+
+    if "exceptions" in header:
+        return header["exceptions"]
+    return np.zeros(0, dtype=np.int64), np.zeros(0, dtype="S1")
+
+def index_text(values, idx, exceptions):
+    """
+    To generate the text of the scores of the k-mer indices.
+    Only the distinct indices are converted, so the text of the whole table (4 ** k + 1 scores) is never generated.
+    :param values: numpy.ndarray of scores (return value of table_load).
+    :param idx: numpy.ndarray of k-mer indices.
+    :param exceptions: The scores whose text is not reproduced by score_text (return value of text_exceptions).
+    :return: numpy.ndarray (dtype: object) of the text of the scores of idx.
+    """
+
+    unique, inverse = np.unique(idx, return_inverse=True)
+    texts = np.array([score_text(value) for value in values[unique].tolist()], dtype=object)
+    index, exception = exceptions
+    if index.size > 0 and unique.size > 0:
+        where = np.minimum(np.searchsorted(index, unique), index.size - 1)
+        found = index[where] == unique
+        texts[found] = np.char.decode(exception[where[found]], "ascii")
+        #The text in the source table.
+    return texts[inverse]
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Input one or more score tables (IGI, PRI or 5UTR) with command line arguments.")
+        quit()
+
+    for scfile in sys.argv[1:]:
+        values, header = table_compile(scfile)
+        print(os.path.basename(scfile), "->", os.path.basename(compiled_name(scfile)[0]), "(k = {})".format(header["k"]))
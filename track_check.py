@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Check of the formats of the scan tracks (track_io.py).
+
+The FASTA file is scored by chrom_scan.py in each format (text, npy and bedgraph) into a temporary directory.
+Each track is read back (trackRead) and compared with the track of the text format (round trip),
+and the sizes of the files are compared. The run-length encoded track (.bedgraph) must not be larger than the text track.
+
+At the command prompt, enter the following.
+    python3 track_check.py [FASTA file] [Score file 1] [Score file 2]...
+For example,
+    python3 track_check.py Chr1_for_test.con IGI200_60_forChr1-2.txt PRI200_60-750_450_forChr1-2.txt
+"""
+
+formats = ["text", "npy", "bedgraph"]
+#The formats of chrom_scan.py compared.
+
+extensions = {"text": [".txt"], "npy": [".npy", ".json"], "bedgraph": [".bedgraph"]}
+#The files of a track of each format.
+
+
+
+import os
+import sys
+import glob
+import tempfile
+import subprocess
+import numpy as np
+import chrom_scan
+from track_io import trackInfo, trackRead
+
+
+def scan(files, file_format, out_dir):
+    """
+    To run chrom_scan.py.
+    :param files: The FASTA file and the score files.
+    :param file_format: The format of the tracks.
+    :param out_dir: The output directory.
+    :return: {name of the track (without the extension): size of its files (bytes)}
+    """
+
+    subprocess.check_call([sys.executable, chrom_scan.__file__] + files + ["--format", file_format, "--out", out_dir],
+                          stdout=subprocess.DEVNULL)
+    sizes = {}
+    for track in glob.glob(os.path.join(out_dir, "*" + extensions[file_format][0])):
+        name = os.path.splitext(os.path.basename(track))[0]
+        sizes[name] = sum(os.path.getsize(os.path.join(out_dir, name + ext)) for ext in extensions[file_format])
+    return sizes
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Input the FASTA file and the score files as command line arguments.")
+        quit()
+
+    fail = False
+    with tempfile.TemporaryDirectory() as temp:
+        sizes = {}
+        for file_format in formats:
+            sizes[file_format] = scan(sys.argv[1:], file_format, os.path.join(temp, file_format))
+
+        print("track", *formats, sep="\t")
+        for name in sorted(sizes["text"]):
+            text = os.path.join(temp, "text", name + ".txt")
+            start, score = trackRead(text, trackInfo(text))
+            for file_format in formats[1:]:
+                track = os.path.join(temp, file_format, name + extensions[file_format][0])
+                other_start, other = trackRead(track, trackInfo(track))
+                tolerance = 1e-6 if file_format == "npy" else 0
+                #The npy format is float32.
+                if other_start != start or other.size != score.size or not np.allclose(other, score, rtol=tolerance, atol=0):
+                    print("DIFFERENT:", name, file_format)
+                    fail = True
+            if sizes["bedgraph"][name] > sizes["text"][name]:
+                print("LARGER THAN TEXT:", name, "bedgraph")
+                fail = True
+            print(name, *[sizes[file_format][name] for file_format in formats], sep="\t")
+
+    if fail:
+        sys.exit(1)
+    print("All tracks are the same, and no run-length encoded track is larger than the text track.")
@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+#
+"""
+Binary and run-length encoded formats of the scan tracks (output of chrom_scan.py).
+
+A track is saved as a float32 .npy file (one score per position) and a JSON sidecar file with the same name:
+    Chr1_scan_IGI200_60_forward.npy
+    Chr1_scan_IGI200_60_forward.json ({"chromosome": "Chr1", "score": "IGI200_60", "strand": "forward", "start": 4, ...})
+"start" is the position of the first score, the same as the first "Position" of the text format.
+
+The .npy header has a fixed size, so the scores can be written chunk by chunk before the length of the track is known.
+
+A run-length encoded track is saved as a .bedgraph file. Under the header lines (starting with "#", with the position
+of the first score), consecutive positions with the same score are written as one line of (run length, score):
+    3<TAB>0.0123
+so a position without a neighbour of the same score takes "1<TAB>score", shorter than "Position<TAB>Score" of the text format.
+The chromosome and the positions are not repeated on each line (unlike the bedGraph format of the genome browsers).
+Long runs (the N-gap regions, sparse or constant tracks) take one line. track_check.py compares the sizes of the formats.
+
+trackInfo and trackRead read a track of any of the formats (chosen by the extension),
+including the text format (Position<TAB>Score) of chrom_scan.py.
+trackBlocks reads a track block by block with overlaps (for smoothing without the whole track in memory).
+"""
+
+import json
+import itertools
+import numpy as np
+
+NPY_HEADER_SIZE = 128
+#The size of the .npy header (bytes). The scores are written from this offset.
+
+TEXT_CHUNK_SIZE = 1 << 24
+#The number of bytes of the text format parsed at once.
+
+
+def npy_header(length):
+    """
+    To generate the .npy header of a 1-dimensional float32 array.
+    :param length: The number of scores.
+    :return: The header (bytes, NPY_HEADER_SIZE).
+    """
+
+    header = "{{'descr': '<f4', 'fortran_order': False, 'shape': ({},), }}".format(length)
+    header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + "\n"
+    #magic string (6 bytes) + version (2 bytes) + header length (2 bytes) + header
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode("latin-1")
+
+def sidecar_name(track_file):
+    """
+    To generate the name of the JSON sidecar file of the track.
+    :param track_file: The .npy file of the track.
+    :return: The name of the JSON file.
+    """
+
+    return track_file[:-len(".npy")] + ".json"
+
+def npyWrite(save_file, chrom, score, strand, start, *arg):
+    """
+    To generate an empty track and its sidecar file.
+    :param save_file: The output file (.npy).
+    :param chrom: Chromosome number.
+    :param score: The name of IGI or PRI score.
+    :param strand: The chain.（forward or reverse）
+    :param start: The position of the first score.
+    :param *arg: The source files of the track.
+    """
+
+    with open(save_file, "wb") as save:
+        save.write(npy_header(0))
+
+    info = {"chromosome": chrom, "score": score, "strand": strand, "start": start, "length": 0,
+            "source": [str(item) for item in arg]}
+    with open(sidecar_name(save_file), "wt") as save:
+        json.dump(info, save, indent=1)
+
+def npyAppend(save_file, scores, index):
+    """
+    To write the scores to the track.
+    :param save_file: The output file (.npy, generated by npyWrite).
+    :param scores: numpy.ndarray of scores.
+    :param index: The index of the first score in the track. (position - start)
+    """
+
+    with open(save_file, "r+b") as save:
+        save.seek(NPY_HEADER_SIZE + 4 * index)
+        save.write(np.asarray(scores, dtype="<f4").tobytes())
+
+def npyClose(save_file, length):
+    """
+    To write the length of the track to the header and the sidecar file.
+    :param save_file: The output file (.npy).
+    :param length: The number of scores.
+    """
+
+    with open(save_file, "r+b") as save:
+        save.write(npy_header(length))
+        save.truncate(NPY_HEADER_SIZE + 4 * length)
+
+    info = npyInfo(save_file)
+    info["length"] = length
+    with open(sidecar_name(save_file), "wt") as save:
+        json.dump(info, save, indent=1)
+
+def npyInfo(track_file):
+    """
+    To read the sidecar file of the track.
+    :param track_file: The .npy file of the track.
+    :return: dict of chromosome, score, strand, start, length and source.
+    """
+
+    with open(sidecar_name(track_file), "rt") as sf:
+        return json.load(sf)
+
+def npyRead(track_file):
+    """
+    To read the track through a memory map.
+    :param track_file: The .npy file of the track.
+    :return: The position of the first score, numpy.ndarray (memory map) of scores.
+    """
+
+    info = npyInfo(track_file)
+    if info["length"] == 0:
+        return info["start"], np.zeros(0, dtype=np.float32)
+        #An empty file cannot be memory-mapped.
+    score = np.load(track_file, mmap_mode="r")
+    return info["start"], score
+
+def bedgraphWrite(save_file, chrom, score, strand, start, *arg):
+    """
+    To generate a run-length encoded track with its header.
+    The header lines start with "#", and consecutive positions with the same score are written as one line:
+        run length<TAB>score
+    :param save_file: The output file (.bedgraph).
+    :param chrom: Chromosome number.
+    :param score: The name of IGI or PRI score.
+    :param strand: The chain.（forward or reverse）
+    :param start: The position of the first score.
+    :param *arg: Others that you want to write to the output file. These are written at the beginning of the file.
+    """
+
+    with open(save_file, "wt") as save:
+        for item in arg:
+            print("#" + str(item), file=save)
+        print("#Chromosome:", chrom, file=save)
+        print("#Score:", score, file=save)
+        print("#Strand:", strand, file=save)
+        print("#Start:", start, file=save)
+
+def bedgraphAppend(save_file, scores, mode="at"):
+    """
+    To append the scores to the run-length encoded track.
+    Runs are not joined with the last run of the file.
+    :param save_file: The output file (.bedgraph).
+    :param scores: numpy.ndarray of scores.
+    :param mode: The mode to open the output file.
+    """
+
+    if scores.size == 0:
+        open(save_file, mode).close()
+        return
+
+    bounds = np.flatnonzero(scores[1:] != scores[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    lengths = np.diff(np.concatenate((starts, [scores.size])))
+    with open(save_file, mode) as save:
+        save.writelines(map("{}\t{}\n".format, lengths.tolist(), scores[starts]))
+
+def bedgraphInfo(track_file):
+    """
+    To read the header of the run-length encoded track.
+    :param track_file: The .bedgraph file of the track.
+    :return: dict of chromosome, score, strand, start (the position of the first score)
+             and offset (the byte offset of the first run).
+    """
+
+    info = {}
+    keys = {b"#Chromosome:": "chromosome", b"#Score:": "score", b"#Strand:": "strand", b"#Start:": "start"}
+    offset = 0
+    with open(track_file, "rb") as tf:
+        for line in tf:
+            if not line.startswith(b"#"):
+                break
+            offset += len(line)
+            word = line.split(None, 1)
+            if len(word) == 2 and word[0] in keys:
+                info[keys[word[0]]] = word[1].rstrip(b"\r\n").decode("utf-8")
+    if "start" not in info:
+        raise ValueError("{}: no start position in the header (written by an older version, score it again).".format(track_file))
+    info["start"] = int(info["start"])
+    info["offset"] = offset
+    return info
+
+def bedgraphChunks(track_file, info=None):
+    """
+    To read the run-length encoded track and expand it into scores a chunk at a time.
+    :param track_file: The .bedgraph file of the track.
+    :param info: The header (return value of bedgraphInfo). If None, the header is read.
+    :return: Generator of numpy.ndarray of scores.
+    """
+
+    if info is None:
+        info = bedgraphInfo(track_file)
+    for values in pairChunks(track_file, info["offset"]):
+        yield np.repeat(values[1::2], values[0::2].astype(np.int64))
+
+def bedgraphRead(track_file, info=None):
+    """
+    To read the run-length encoded track and expand it into an array of scores.
+    :param track_file: The .bedgraph file of the track.
+    :param info: The header (return value of bedgraphInfo). If None, the header is read.
+    :return: The position of the first score, numpy.ndarray of scores.
+    """
+
+    if info is None:
+        info = bedgraphInfo(track_file)
+    parts = list(bedgraphChunks(track_file, info))
+    score = np.concatenate(parts) if len(parts) > 0 else np.zeros(0)
+    return info["start"], score
+
+def pairChunks(track_file, offset):
+    """
+    To read the lines of two numbers (text and run-length encoded formats) a chunk at a time.
+    The lines are converted into numbers a chunk (TEXT_CHUNK_SIZE) at a time, not line by line.
+    :param track_file: The track.
+    :param offset: The byte offset of the first line.
+    :return: Generator of numpy.ndarray of the numbers (the first and the second numbers of the lines alternately).
+    """
+
+    rest = b""
+    with open(track_file, "rb") as tf:
+        tf.seek(offset)
+        while True:
+            chunk = tf.read(TEXT_CHUNK_SIZE)
+            data = rest + chunk
+            cut = data.rfind(b"\n") + 1 if chunk != b"" else len(data)
+            rest = data[cut:]
+            #An incomplete last line is parsed with the next chunk.
+            text = data[:cut].decode("ascii")
+            values = np.fromstring(text, sep=" ") if text.strip() != "" else np.zeros(0)
+            #(numpy.fromstring returns [-1.] for blank lines.)
+            if values.size % 2 != 0:
+                raise ValueError("{}: a line without a score.".format(track_file))
+            if values.size > 0:
+                yield values
+            if chunk == b"":
+                break
+
+def textInfo(track_file):
+    """
+    To read the header of the track of the text format.
+    :param track_file: The text file of the track (output of chrom_scan.py --format text).
+    :return: dict of chromosome, score, strand, offset (the byte offset of the first score line)
+             and start (the position of the first score, if any).
+    """
+
+    info = {}
+    keys = {b"Chromosome:": "chromosome", b"Score:": "score", b"Strand:": "strand"}
+    offset = 0
+    with open(track_file, "rb") as tf:
+        for line in tf:
+            if line[:1].isdigit():
+                info["start"] = int(line.split()[0])
+                break
+                #The first line of "Position<TAB>Score".
+            offset += len(line)
+            word = line.split(None, 1)
+            if len(word) == 2 and word[0] in keys:
+                info[keys[word[0]]] = word[1].rstrip(b"\r\n").decode("utf-8")
+    info["offset"] = offset
+    return info
+
+def textChunks(track_file, info=None):
+    """
+    To read the scores of the track of the text format a chunk at a time.
+    :param track_file: The text file of the track.
+    :param info: The header (return value of textInfo). If None, the header is read.
+    :return: Generator of numpy.ndarray of scores.
+    """
+
+    if info is None:
+        info = textInfo(track_file)
+    for values in pairChunks(track_file, info["offset"]):
+        yield values[1::2].copy()
+
+def textRead(track_file, info=None):
+    """
+    To read the scores of the track of the text format.
+    :param track_file: The text file of the track.
+    :param info: The header (return value of textInfo). If None, the header is read.
+    :return: The position of the first score, numpy.ndarray of scores.
+    """
+
+    if info is None:
+        info = textInfo(track_file)
+    parts = list(textChunks(track_file, info))
+    score = np.concatenate(parts) if len(parts) > 0 else np.zeros(0)
+    return info.get("start", ""), score
+
+def trackInfo(track_file):
+    """
+    To read the header of the track (.npy, .bedgraph or the text format).
+    :param track_file: The track (output of chrom_scan.py).
+    :return: dict of chromosome, score and strand (and the others of the format).
+    """
+
+    if track_file.endswith(".npy"):
+        return npyInfo(track_file)
+    if track_file.endswith(".bedgraph"):
+        return bedgraphInfo(track_file)
+    return textInfo(track_file)
+
+def trackRead(track_file, info=None):
+    """
+    To read the scores of the track (.npy, .bedgraph or the text format).
+    :param track_file: The track (output of chrom_scan.py).
+    :param info: The header (return value of trackInfo), so that the text format is not parsed again. If None, it is read.
+    :return: The position of the first score, numpy.ndarray (float64) of scores.
+    """
+
+    if track_file.endswith(".npy"):
+        start, score = npyRead(track_file)
+        return start, np.array(score, dtype=np.float64)
+        #Read through a memory map.
+    if track_file.endswith(".bedgraph"):
+        return bedgraphRead(track_file, info)
+        #Expanded into one score per position.
+    return textRead(track_file, info)
+
+def trackChunks(track_file, info=None, size=1 << 20):
+    """
+    To read the scores of the track (.npy, .bedgraph or the text format) a chunk at a time.
+    :param track_file: The track (output of chrom_scan.py).
+    :param info: The header of the text or .bedgraph format (return value of trackInfo). If None, it is read.
+    :param size: The number of scores in a chunk of the .npy file. (The chunks of the other formats are of any size.)
+    :return: Generator of numpy.ndarray (float64) of scores.
+    """
+
+    if track_file.endswith(".npy"):
+        start, score = npyRead(track_file)
+        for first in range(0, score.size, size):
+            yield np.array(score[first:first + size], dtype=np.float64)
+    elif track_file.endswith(".bedgraph"):
+        yield from bedgraphChunks(track_file, info)
+    else:
+        yield from textChunks(track_file, info)
+
+def trackBlocks(track_file, block, halo, info=None):
+    """
+    To read the track in blocks, each with the scores around it (halo).
+    Only the scores of one block and its halo (and one chunk) are kept in memory.
+    :param track_file: The track (output of chrom_scan.py).
+    :param block: The number of scores in a block.
+    :param halo: The number of scores added on each side of the block.
+    :param info: The header of the text or .bedgraph format (return value of trackInfo). If None, it is read.
+    :return: Generator of (index of the first score of the window, index of the first score of the block,
+             index of the end of the block, numpy.ndarray of the window).
+             The window is the scores from (block start - halo) to (block end + halo), cut at the ends of the track.
+             The indexes are counted from the first score of the track.
+    """
+
+    chunks = trackChunks(track_file, info)
+    buffer = np.zeros(0)
+    offset = 0
+    #buffer holds the scores from index "offset".
+    end = False
+    first = 0
+    while True:
+        last = first + block
+        while not end and offset + buffer.size < last + halo:
+            chunk = next(chunks, None)
+            if chunk is None:
+                end = True
+            else:
+                buffer = np.concatenate((buffer, chunk))
+        if end:
+            last = min(last, offset + buffer.size)
+        if first >= last:
+            break
+
+        lower = max(0, first - halo)
+        upper = min(last + halo, offset + buffer.size)
+        yield lower, first, last, buffer[lower - offset:upper - offset]
+        first = last
+        cut = max(0, first - halo) - offset
+        buffer = buffer[cut:]
+        offset += cut
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+#
+"""
+READ manual.txt BEFORE USE.
+
+Input: FASTA, two IGI files, one PRI file and 5'UTR score files
+Output: The position and value of the detected PRI peak (same as peak_find_SG.py)
+        and both ends of the 5'UTR peak (same as peak_find_SG_5UTR_edge_both.py)
+
+At the command prompt, enter the following.
+    python3 tss_predict.py [FASTA file] [IGI file 1] [IGI file 2] [PRI file] [5'UTR file]...
+
+For example,
+    python3 tss_predict.py Chr1_for_test.con IGI200_60_forChr1-2.txt IGI750_450_forChr1-2.txt PRI200_60-750_450_forChr1-2.txt 5UTR-IGI750_450_forChr1-2.txt
+
+This runs chrom_scan.py, peak_find_SG.py and peak_find_SG_5UTR_edge_both.py in one process.
+The scores of each chromosome are kept in memory, and only the peak and edge files are written.
+The parameters of peak detection are those of peak_find_SG.py (N, D, th_PRI, th_IGI)
+and peak_find_SG_5UTR_edge_both.py (N, D, th).
+With "--tracks text", "--tracks npy" or "--tracks bedgraph", the scan tracks of chrom_scan.py are also written.
+With "--bed [BED file]", only the intervals in the BED file (and their flanks, see flank_calc) are scored,
+and the peaks and edges in each interval are written to its own files ([name]_peak_forward.txt etc.).
+The peaks are the same as those of the whole chromosome in the interval. The edges are those of the whole chromosome
+overlapping the interval, except the edges reaching beyond the flanks, which are not written (check with bed_check.py).
+
+The IGI files are recognized by "IGI", the PRI file by "PRI" and the 5'UTR files by "5UTR" in the file name.
+The PRI is the first IGI minus the second IGI, so the order of the IGI files must be the same as in calc_igi_pri.py.
+
+
+If a file with the same name as the output file already exists, it will be overwritten without warning.
+If you want to change the output directory, enter the variable ("save_dir") below, or give "--out DIR" on the command line.
+"""
+
+save_dir = r""
+#The directory for saving output files
+#If blank, the output file will be in the directory where this script is located.
+
+chunk_size = 10000000
+#The number of bases encoded at once.
+
+
+
+import os
+import time
+import argparse
+import numpy as np
+import chrom_scan
+import peak_find_SG as pf
+import peak_find_SG_5UTR_edge_both as ue
+from score_table import table_load, text_exceptions, index_text
+from fasta_io import bed_read, region_extract
+from kmer_code import seq_encode, kmer_index
+from track_io import npyWrite, npyAppend, npyClose, bedgraphWrite, bedgraphAppend
+
+t1=time.time()
+#Get start time.
+
+if save_dir == "":
+    save_dir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+    #Get the absolute path of the directory where this script is located.
+
+
+def flank_calc():
+    """
+    To calculate the flanks (bases) scored on both sides of each interval with "--bed".
+    The peaks need the margin of peak_find_SG.py (peak_margin, with peakUnite of N bases as below),
+    and the edges are searched (N - 1) bases inside the scored window of peak_find_SG_5UTR_edge_both.py.
+    :return: The flanks (bases).
+    """
+
+    return max(pf.peak_margin(pf.N, pf.N), (ue.N - 1) * 2)
+
+def trackSave(track_format, save_name, chrom, strand, offset, table, idx, *arg):
+    """
+    To write the scan track of a table (the same file as chrom_scan.py).
+    :param track_format: "text", "npy" or "bedgraph".
+    :param save_name: The name at the head of the output file (chromosome number or the name of the region).
+    :param chrom: Chromosome number.
+    :param strand: The chain.（forward or reverse）
+    :param offset: The position of the first score.
+    :param table: dict of the score table (file, name, values, header).
+    :param idx: numpy.ndarray of k-mer indices.
+    :param *arg: The source files of the track.
+    """
+
+    if track_format == "npy":
+        save = chrom_scan.save_generate(save_dir, save_name, table["name"], ".npy")[strand == "reverse"]
+        npyWrite(save, chrom, table["name"], strand, offset, *arg)
+        npyAppend(save, table["values"][idx], 0)
+        npyClose(save, idx.size)
+        return
+
+    if "exceptions" not in table:
+        table["exceptions"] = text_exceptions(table["header"])
+    texts = index_text(table["values"], idx, table["exceptions"])
+    #Only the scores of the indices are converted into text.
+    if track_format == "bedgraph":
+        save = chrom_scan.save_generate(save_dir, save_name, table["name"], ".bedgraph")[strand == "reverse"]
+        bedgraphWrite(save, chrom, table["name"], strand, offset, *arg)
+        bedgraphAppend(save, texts)
+    else:
+        save = chrom_scan.save_generate(save_dir, save_name, table["name"])[strand == "reverse"]
+        chrom_scan.saveWrite(save, chrom, table["name"], strand, *arg)
+        chrom_scan.scoreWrite(save, texts, offset)
+
+def peakSave(save_name, chrom, strand, offset, pri, igi1, igi2, idx, seqFile, region=None):
+    """
+    To detect the PRI peaks and write them (the same file as peak_find_SG.py).
+    :param save_name: The name at the head of the output file (chromosome number or the name of the region).
+    :param chrom: Chromosome number.
+    :param strand: The chain.（forward or reverse）
+    :param offset: The position of the first score.
+    :param pri: dict of the PRI table.
+    :param igi1: dict of the first IGI table.
+    :param igi2: dict of the second IGI table.
+    :param idx: numpy.ndarray of k-mer indices.
+    :param seqFile: FASTA file.
+    :param region: (start, end) of the BED interval. Only the peaks in the interval are written.
+    """
+
+    save = pf.save_generate(save_dir, save_name, strand)
+    pf.saveWrite(save, chrom, pri["name"], strand, pf.N, pf.D, pf.th_PRI, pf.th_IGI, pf.tougou,
+                 __file__, seqFile, pri["file"], igi1["file"], igi2["file"])
+    if idx.size < pf.N:
+        return
+        #The sequence is shorter than the smoothing width.
+
+    PRI = np.asarray(pri["values"][idx], dtype=np.float64)
+    IGI1 = pf.sgfilter(np.asarray(igi1["values"][idx], dtype=np.float64), pf.N, pf.D)
+    IGI2 = pf.sgfilter(np.asarray(igi2["values"][idx], dtype=np.float64), pf.N, pf.D)
+
+    peakPos, peak = pf.peakFind(PRI, IGI1, IGI2, pf.N, pf.D, pf.th_PRI, pf.th_IGI, offset)
+    del PRI, IGI1, IGI2
+    peakPos, peak = pf.peakUnite(peakPos, peak, pf.N)
+    #The same parameters as peak_find_SG.py.
+    if region is not None:
+        inside = (region[0] < peakPos) & (peakPos <= region[1])
+        peakPos, peak = peakPos[inside], peak[inside]
+
+    with open(save, "at") as s:
+        for pos, p in zip(peakPos, peak):
+            print(pos, p, sep="\t", file=s)
+
+def edgeSuffix(utrFiles):
+    """
+    To generate the suffixes of the edge files of the 5'UTR tables.
+    With more than one 5'UTR table, the name of each score is added, so that the edge files are not overwritten.
+    :param utrFiles: List of the 5'UTR files.
+    :return: {5'UTR file: suffix} ("" with one 5'UTR table, e.g. "_5UTR-IGI750_450" with more than one).
+    """
+
+    if len(utrFiles) < 2:
+        return {f: "" for f in utrFiles}
+    return {f: "_" + chrom_scan.score_name_extract(f) for f in utrFiles}
+
+def edgeSave(save_name, chrom, strand, offset, utr, idx, seqFile, region=None, partial=False, suffix=""):
+    """
+    To detect both ends of the 5'UTR peaks and write them (the same file as peak_find_SG_5UTR_edge_both.py).
+    :param save_name: The name at the head of the output file (chromosome number or the name of the region).
+    :param chrom: Chromosome number.
+    :param strand: The chain.（forward or reverse）
+    :param offset: The position of the first score.
+    :param utr: dict of the 5'UTR table.
+    :param idx: numpy.ndarray of k-mer indices.
+    :param seqFile: FASTA file.
+    :param region: (start, end) of the BED interval. Only the peaks overlapping the interval are written.
+    :param partial: If True, the scored window is a part of the chromosome (see edgeFind of peak_find_SG_5UTR_edge_both.py).
+    :param suffix: Added to the name of the output file (return value of edgeSuffix).
+    """
+
+    save = ue.save_generate(save_dir, save_name, strand, suffix)
+    ue.saveWrite(save, chrom, utr["name"], strand, ue.N, ue.D, ue.th, __file__, seqFile, utr["file"])
+    if idx.size < ue.N:
+        return
+        #The sequence is shorter than the smoothing width.
+
+    posL, posR, peaks = ue.edgeFind(np.asarray(utr["values"][idx], dtype=np.float64), ue.th, offset, partial)
+    if region is not None:
+        inside = (posL <= region[1]) & (posR > region[0])
+        posL, posR, peaks = posL[inside], posR[inside], peaks[inside]
+
+    with open(save, "at") as s:
+        for L, R, peak in zip(posL, posR, peaks):
+            print(L, R, peak, sep="\t", file=s)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prediction of TSS from the genome sequence. READ manual.txt BEFORE USE.")
+    parser.add_argument("files", nargs="*", help="One FASTA file, two IGI files, one PRI file and 5'UTR score files.")
+    parser.add_argument("--bed", help="BED file of the intervals to be scored (instead of the whole chromosomes).")
+    parser.add_argument("--tracks", choices=["none", "text", "npy", "bedgraph"], default="none", help="Also write the scan tracks.")
+    parser.add_argument("--out", default=save_dir, help="The directory for saving output files.")
+    args = parser.parse_args()
+    save_dir = os.path.join(args.out, "")
+    os.makedirs(save_dir, exist_ok=True)
+
+    igiFiles = []
+    priFiles = []
+    utrFiles = []
+    seqFile = None
+    for f in args.files:
+        fn = os.path.basename(f)
+        if "5UTR" in fn:
+            utrFiles.append(f)
+        elif "PRI" in fn:
+            priFiles.append(f)
+        elif "IGI" in fn:
+            igiFiles.append(f)
+        else:
+            seqFile = f
+
+    if seqFile is None or len(igiFiles) != 2 or len(priFiles) != 1:
+        print("Input one FASTA file, two IGI files, one PRI file and 5'UTR score files (optional) as command line arguments.")
+        quit()
+    suffixes = edgeSuffix(utrFiles)
+    if len(set(suffixes.values())) != len(utrFiles):
+        print("The 5'UTR files must have different score names (the names of the edge files).")
+        quit()
+
+    tables = {}
+    #{file: dict of the score table}
+    splens = {}
+    #{split length: [file, ...]}
+    for f in igiFiles + priFiles + utrFiles:
+        values, splen, header = table_load(f)
+        tables[f] = {"file": f, "name": chrom_scan.score_name_extract(f), "values": values, "header": header}
+        splens.setdefault(splen, []).append(f)
+
+    igi1, igi2, pri = tables[igiFiles[0]], tables[igiFiles[1]], tables[priFiles[0]]
+    if len({len(igi1["values"]), len(igi2["values"]), len(pri["values"])}) != 1:
+        print("The IGI and PRI files must have the same number of bases.")
+        quit()
+
+    for splen, files in splens.items():
+        offset = chrom_scan.offset_calc(splen)
+        print("-"*50)
+        for f in files:
+            print(os.path.basename(f))
+        print(os.path.basename(seqFile))
+
+        if args.bed is None:
+            records = ((chrom, chrom, None, False, offset, F_idx, R_idx)
+                       for chrom, F_idx, R_idx in chrom_scan.record_index(seqFile, splen, chunk_size))
+        else:
+            flank = flank_calc()
+            #The margin for smoothing and peak integration, so that the peaks in each interval are the same as those of the whole chromosome.
+            regions = [(chrom, start + 1 - flank - offset, end + flank - offset + splen, name, start, end)
+                       for chrom, start, end, name in bed_read(args.bed)]
+            #The windows of the positions from (start + 1 - flank) to (end + flank).
+            records = ((region[3], region[0], region[4:6], pos > 0, pos + offset) + kmer_index(seq_encode(seq), splen)
+                       for region, pos, seq in region_extract(seqFile, regions, chunk_size))
+            #A window clipped at the start of the chromosome is searched for edges as the whole chromosome (not partial).
+
+        for save_name, chrom, region, partial, start, F_idx, R_idx in records:
+            print(save_name)
+            for strand, idx in (("forward", F_idx), ("reverse", R_idx)):
+                if args.tracks != "none":
+                    for f in files:
+                        trackSave(args.tracks, save_name, chrom, strand, start, tables[f], idx, __file__, seqFile, f)
+
+                if pri["file"] in files:
+                    peakSave(save_name, chrom, strand, start, pri, igi1, igi2, idx, seqFile, region)
+                    print('"peakFind complete"', strand)
+
+                for f in files:
+                    if f in utrFiles:
+                        edgeSave(save_name, chrom, strand, start, tables[f], idx, seqFile, region, partial, suffixes[f])
+                        print('"edgeFind complete"', strand)
+            del F_idx, R_idx
+
+    print("-"*50)
+    t2=time.time()
+    t=t2-t1
+    if t > 60:
+        print('time:'+str(t/60)+'(min)')
+    else:
+        print('time:'+str(t)+'(s)')
+    #To display the time required for processing.